@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""
+Compare the default asyncio loop with uvloop on the bot's hot paths.
+
+Runs two workloads against local stand-ins for the Telegram clients:
+
+- command dispatch: group messages go through the registered handlers'
+  filters and the matching handler runs (!queue, !now, !help, !pause)
+- outbound messages: send_message round trips to a local TCP server,
+  standing in for the MTProto connection
+
+Usage:
+    python benchmarks/bench_event_loop.py [--requests 5000] [--concurrency 100]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from types import SimpleNamespace
+
+# Config validates credentials at import time, the stand-ins never use them
+for name, value in (("API_ID", "1"), ("API_HASH", "bench"), ("BOT_TOKEN", "bench"), ("SESSION_STRING", "bench")):
+    os.environ.setdefault(name, value)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyrogram.enums import ChatType
+
+from handlers import register_handlers
+from utils.event_loop import install_event_loop_policy
+from utils.events import PlaybackEvents
+from utils.history import PlayHistory
+from utils.search_cache import SearchCache
+from utils.track_index import TrackIndex
+
+CHAT_ID = -1001234567890
+COMMANDS = ("!queue", "!now", "!help", "!pause")
+
+class EchoServer:
+    """Local TCP server answering every length-prefixed frame with a short ack."""
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(4)
+                await reader.readexactly(int.from_bytes(header, "big"))
+                writer.write(b"\x00\x00\x00\x02ok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            writer.close()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+class FakeMessage:
+    """Stand-in for a pyrogram Message in a supergroup."""
+
+    def __init__(self, client, text):
+        self._client = client
+        self.text = text
+        self.caption = None
+        self.chat = SimpleNamespace(id=CHAT_ID, type=ChatType.SUPERGROUP)
+        self.from_user = SimpleNamespace(id=1)
+        self.command = None
+
+    async def reply_text(self, text, **kwargs):
+        return await self._client.send_message(self.chat.id, text)
+
+    async def edit(self, text, **kwargs):
+        return await self._client.send_message(self.chat.id, text)
+
+class FakeClient:
+    """Stand-in for the pyrogram bot Client; sends go to the echo server."""
+
+    def __init__(self, port, connections=4):
+        self.port = port
+        self.connections_count = connections
+        self.me = SimpleNamespace(username="benchbot", id=42)
+        self.is_connected = True
+        self.message_handlers = []
+        self._connections = []
+        self._next = 0
+
+    async def connect(self):
+        for _ in range(self.connections_count):
+            reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+            self._connections.append((reader, writer, asyncio.Lock()))
+
+    async def disconnect(self):
+        for _, writer, _ in self._connections:
+            writer.close()
+            await writer.wait_closed()
+        # Let the server notice the closed connections
+        await asyncio.sleep(0.1)
+
+    def on_message(self, filters=None):
+        def decorator(func):
+            self.message_handlers.append((filters, func))
+            return func
+        return decorator
+
+    def on_callback_query(self, filters=None):
+        return lambda func: func
+
+    def on_inline_query(self, filters=None):
+        return lambda func: func
+
+    async def send_message(self, chat_id, text, **kwargs):
+        reader, writer, lock = self._connections[self._next % len(self._connections)]
+        self._next += 1
+        payload = f"{chat_id}:{text}".encode()
+        async with lock:
+            writer.write(len(payload).to_bytes(4, "big") + payload)
+            await writer.drain()
+            header = await reader.readexactly(4)
+            await reader.readexactly(int.from_bytes(header, "big"))
+        return FakeMessage(self, text)
+
+    async def dispatch(self, message):
+        """Run the first handler whose filters match, like pyrogram's dispatcher."""
+        for filters, func in self.message_handlers:
+            if await filters(self, message):
+                await func(self, message)
+                return True
+        return False
+
+class FakeCalls:
+    """Stand-in for PyTgCalls."""
+
+    def on_stream_end(self):
+        return lambda func: func
+
+    async def pause_stream(self, chat_id):
+        await asyncio.sleep(0)
+
+    async def resume_stream(self, chat_id):
+        await asyncio.sleep(0)
+
+async def no_search(query):
+    return []
+
+def make_bot(client, index_path):
+    """Build a stand-in MusicBot with one chat playing and a short queue."""
+    song = {
+        'id': "bench", 'title': "Benchmark Song", 'uploader': "Bench",
+        'duration': 200, 'webpage_url': "https://youtu.be/bench", 'file_path': None
+    }
+    bot = SimpleNamespace(
+        bot=client, call_py=FakeCalls(), assistant=None,
+        assistant_id=None, assistant_name="benchassistant",
+        active_chats={CHAT_ID: {
+            "queue": [dict(song, id=f"bench{i}") for i in range(8)],
+            "current": song, "is_playing": True, "track_seq": 1,
+            "started_at": time.time(), "paused_at": None
+        }},
+        library=None, diagnostics=None, warmer=None,
+        track_index=TrackIndex(index_path, 100),
+        history=PlayHistory(10),
+        # None of the benchmarked commands searches
+        search_cache=SearchCache(no_search, 10, 60)
+    )
+    bot.events = PlaybackEvents(bot)
+    register_handlers(bot)
+    return bot
+
+async def measure(operation, requests, concurrency):
+    """Run an operation `requests` times with bounded concurrency."""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await operation(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "ops": requests / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+async def run_benchmark(requests, concurrency):
+    server = EchoServer()
+    await server.start()
+    client = FakeClient(server.port)
+    await client.connect()
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_bot(client, os.path.join(directory, "history.json"))
+
+        async def dispatch(i):
+            message = FakeMessage(client, COMMANDS[i % len(COMMANDS)])
+            if not await client.dispatch(message):
+                raise RuntimeError(f"No handler matched {message.text}")
+
+        async def send(i):
+            await client.send_message(CHAT_ID, f"🎵 Now Playing #{i}")
+
+        # Warm up the handlers before measuring
+        await measure(dispatch, 200, concurrency)
+        results = {
+            "command dispatch": await measure(dispatch, requests, concurrency),
+            "outbound messages": await measure(send, requests, concurrency),
+        }
+
+    await client.disconnect()
+    await server.stop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'loop':8} {'path':18} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for use_uvloop in (False, True):
+        loop_name = install_event_loop_policy(use_uvloop)
+        if use_uvloop and loop_name != "uvloop":
+            print("uvloop is not installed, skipping")
+            break
+        results = asyncio.run(run_benchmark(args.requests, args.concurrency))
+        for path, result in results.items():
+            print(f"{loop_name:8} {path:18} {result['ops']:>10.0f} {result['p50']:>8.2f} {result['p99']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+"""
+Measure the silence between tracks with and without gapless playback.
+
+A reader thread stands in for the call: it consumes the audio the bot
+hands over in 20 ms frames at (a multiple of) real time, recording how
+long it waits for data between tracks.
+
+- sequential: the real non-gapless path. A stand-in call decodes each
+  stream with ffmpeg like PyTgCalls does, and its stream end goes through
+  the playback worker to process_next_song and play_audio. The gap covers
+  the stream end, the membership check and join round trips (simulated
+  with --join-ms) and ffmpeg starting on the next file
+- gapless: one stream for the whole queue, the next decoder is pre-opened
+
+Usage:
+    python benchmarks/bench_gapless.py [--tracks 5] [--seconds 3] [--format raw|mp3] [--join-ms 300]
+"""
+import os
+import sys
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+import shlex
+import threading
+import statistics
+import subprocess
+from array import array
+from types import SimpleNamespace
+
+# Config validates credentials at import time, the stand-ins never use them
+for name, value in (("API_ID", "1"), ("API_HASH", "bench"), ("BOT_TOKEN", "bench"), ("SESSION_STRING", "bench")):
+    os.environ.setdefault(name, value)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from utils import gapless
+from utils.audio_cache import RAW_FORMAT, RAW_SAMPLE_RATE, RAW_CHANNELS, RAW_BYTES_PER_SECOND
+from utils.events import PlaybackEvents
+from utils.history import PlayHistory
+
+CHAT_ID = -1001234567890
+
+# The call consumes 20 ms frames
+FRAME_BYTES = RAW_BYTES_PER_SECOND // 50
+FRAME_SECONDS = 0.02
+
+def make_tracks(directory, count, seconds, fmt):
+    """Write sine wave tracks, a different pitch each."""
+    tracks = []
+    for i in range(count):
+        frequency = 220 * (i + 2)
+        path = os.path.join(directory, f"track{i}.raw")
+        samples = array('h')
+        for n in range(int(seconds * RAW_SAMPLE_RATE)):
+            value = int(8000 * math.sin(2 * math.pi * frequency * n / RAW_SAMPLE_RATE))
+            samples.extend((value, value))
+        with open(path, "wb") as f:
+            f.write(samples.tobytes())
+
+        if fmt == "mp3":
+            encoded = os.path.join(directory, f"track{i}.mp3")
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error", "-f", "s16le", "-ar", "48000", "-ac", "2",
+                 "-i", path, encoded],
+                check=True
+            )
+            os.remove(path)
+            path = encoded
+
+        # Everything a downloaded song carries, the now playing text needs it
+        tracks.append({
+            'id': f"track{i}",
+            'title': f"Track {i}",
+            'uploader': "Benchmark",
+            'duration': int(seconds),
+            'thumbnail': None,
+            'webpage_url': f"https://www.youtube.com/watch?v=track{i:06d}",
+            'file_path': path,
+        })
+    return tracks
+
+class Reader(threading.Thread):
+    """Consumes a stream like the call does and records the waits for data."""
+
+    def __init__(self, path, speed, process=None):
+        super().__init__(daemon=True)
+        self.path = path
+        self.speed = speed
+        # ffmpeg decoding the stream, read from its output instead of the path
+        self.process = process
+        self.first_byte_at = None
+        self.eof_at = None
+        self.stalls = []
+
+    def run(self):
+        fd = self.process.stdout.fileno() if self.process else os.open(self.path, os.O_RDONLY)
+        start = time.monotonic()
+        frames = 0
+        while True:
+            requested_at = time.monotonic()
+            data = b""
+            while len(data) < FRAME_BYTES:
+                chunk = os.read(fd, FRAME_BYTES - len(data))
+                if not chunk:
+                    break
+                data += chunk
+            if not data:
+                self.eof_at = time.monotonic()
+                break
+
+            now = time.monotonic()
+            if self.first_byte_at is None:
+                self.first_byte_at = now
+            elif now - requested_at > FRAME_SECONDS / self.speed:
+                self.stalls.append(now - requested_at)
+
+            frames += 1
+            time.sleep(max(0, start + frames * FRAME_SECONDS / self.speed - time.monotonic()))
+        if self.process:
+            self.process.stdout.close()
+            self.process.wait()
+        else:
+            os.close(fd)
+
+class StreamStandIn:
+    """What play_audio hands to the call: a file and ffmpeg's input options."""
+
+    def __init__(self, path, additional_ffmpeg_parameters=""):
+        self.path = path
+        self.parameters = additional_ffmpeg_parameters
+
+class CallStandIn:
+    """
+    PyTgCalls without Telegram.
+
+    Joining waits half the simulated round trips and starts ffmpeg on the
+    stream, read by a Reader. When the Reader reaches the end, the stream
+    end goes through the playback worker exactly like on_stream_end.
+    """
+
+    def __init__(self, bot, speed, join_ms):
+        self.bot = bot
+        self.speed = speed
+        self.join_ms = join_ms
+        self.readers = []
+
+    async def join_group_call(self, chat_id, stream, **kwargs):
+        await asyncio.sleep(self.join_ms / 2000)
+        process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", *shlex.split(stream.parameters), "-i", stream.path,
+             "-f", RAW_FORMAT, "-ar", str(RAW_SAMPLE_RATE), "-ac", str(RAW_CHANNELS), "pipe:1"],
+            stdout=subprocess.PIPE
+        )
+        reader = Reader(stream.path, self.speed, process)
+        reader.start()
+        self.readers.append(reader)
+        asyncio.create_task(self.watch(chat_id, reader))
+
+    async def leave_group_call(self, chat_id):
+        return None
+
+    async def watch(self, chat_id, reader):
+        # Imported here, only the sequential run needs the command handlers
+        from handlers.commands import process_next_song
+
+        await wait_for(reader)
+        await self.bot.events.end_track(chat_id, lambda: process_next_song(self.bot, chat_id))
+
+def make_bot(queue, speed=1, join_ms=0):
+    """Stand-in MusicBot with the state the playback code uses."""
+    async def send_message(chat_id, text, **kwargs):
+        return None
+
+    async def get_chat_member(chat_id, user_id):
+        # Membership check round trip before every join
+        await asyncio.sleep(join_ms / 2000)
+
+    bot = SimpleNamespace(
+        bot=SimpleNamespace(send_message=send_message),
+        assistant=SimpleNamespace(get_chat_member=get_chat_member),
+        assistant_id=1,
+        active_chats={CHAT_ID: {"queue": queue, "current": None, "is_playing": True, "track_seq": 1}},
+        history=PlayHistory(0)
+    )
+    bot.events = PlaybackEvents(bot)
+    bot.call_py = CallStandIn(bot, speed, join_ms)
+    return bot
+
+async def wait_for(reader):
+    while reader.is_alive():
+        await asyncio.sleep(0.01)
+
+async def run_sequential(tracks, speed, join_ms):
+    """One stream per track, played by process_next_song after each stream end."""
+    # Imported here, the command handlers need Pyrogram and PyTgCalls
+    from pytgcalls.types import input_stream
+    from handlers.commands import play_audio
+
+    # The stand-in call only needs the path and input options of the stream
+    input_stream.AudioPiped = StreamStandIn
+    Config.GAPLESS = False
+
+    bot = make_bot(list(tracks[1:]), speed, join_ms)
+    if not await play_audio(bot, CHAT_ID, tracks[0]):
+        raise RuntimeError("Could not start playback, is ffmpeg installed?")
+    while len(bot.call_py.readers) < len(tracks) or bot.call_py.readers[-1].is_alive():
+        if not bot.active_chats[CHAT_ID]["is_playing"]:
+            raise RuntimeError("Playback stopped before the queue ran out")
+        await asyncio.sleep(0.01)
+
+    readers = bot.call_py.readers
+    return [later.first_byte_at - earlier.eof_at for earlier, later in zip(readers, readers[1:])]
+
+async def run_gapless(tracks, speed):
+    """One stream for the whole queue."""
+    Config.GAPLESS = True
+    bot = make_bot(list(tracks[1:]))
+    path = await gapless.start_gapless(bot, CHAT_ID, tracks[0])
+    reader = Reader(path, speed)
+    reader.start()
+    await wait_for(reader)
+    gapless.stop_gapless(CHAT_ID)
+    # Any wait longer than a frame is audible; between tracks there should be none
+    return reader.stalls or [0.0]
+
+def describe(gaps):
+    return f"mean {statistics.mean(gaps) * 1000:8.2f} ms   max {max(gaps) * 1000:8.2f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--format", choices=("raw", "mp3"), default="raw",
+                        help="raw: pre-decoded cache files, mp3: decoded by ffmpeg")
+    parser.add_argument("--speed", type=float, default=10, help="consume the stream this many times faster than real time")
+    parser.add_argument("--join-ms", type=float, default=300, help="simulated membership check and join time")
+    parser.add_argument("--crossfade", type=float, default=0, help="crossfade seconds in gapless mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Tracks outside the download folder, so finished ones are never cleaned up
+        Config.DOWNLOAD_PATH = os.path.join(directory, "downloads") + os.sep
+        os.makedirs(Config.DOWNLOAD_PATH)
+        Config.AUDIO_CACHE = False
+        Config.CROSSFADE_SECONDS = args.crossfade
+        tracks = make_tracks(directory, args.tracks, args.seconds, args.format)
+
+        sequential = asyncio.run(run_sequential(tracks, args.speed, args.join_ms))
+        print(f"sequential  gap between tracks  {describe(sequential)}")
+        sequential = asyncio.run(run_sequential(tracks, args.speed, 0))
+        print(f"sequential  without join time   {describe(sequential)}")
+        stalls = asyncio.run(run_gapless(tracks, args.speed))
+        print(f"gapless     stall in stream     {describe(stalls)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 import os
-import sys
 import logging
 import asyncio
 from pyrogram.client import Client
@@ -10,27 +9,35 @@ from pyrogram.enums import ParseMode
 
 from config import Config
 from handlers import register_handlers
+from utils.events import PlaybackEvents
+from utils.library import MediaLibrary
+from utils.track_index import TrackIndex
+from utils.chat_settings import chat_settings
+from utils.history import PlayHistory
+from utils.health import HealthMonitor
+from utils.diagnostics import BlockingDetector
+from utils.handoff import RestartHandoff
+from utils.warmup import CacheWarmer
+from utils.youtube import search
+from utils.search_cache import SearchCache
 
-# Configure detailed logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
 class MusicBot:
     def __init__(self):
         """Initialize the Music Bot with Pyrogram and PyTgCalls clients"""
+        # Sessions handed over by a previous process, if this is a graceful restart
+        self.handoff = RestartHandoff(self)
+        
         # Initialize Bot client
+        # While handing over, the old process still holds the session file
         self.bot = Client(
             "MusicBot",
             api_id=Config.API_ID,
             api_hash=Config.API_HASH,
             bot_token=Config.BOT_TOKEN,
-            parse_mode=ParseMode.MARKDOWN
+            parse_mode=ParseMode.MARKDOWN,
+            in_memory=bool(self.handoff.pending)
         )
         
         # Initialize Assistant client (for voice chats)
@@ -54,9 +61,43 @@ class MusicBot:
         self.call_py = PyTgCalls(self.assistant)
         
         # Dictionary to store active voice chats and queues
-        # Structure: {chat_id: {"queue": [], "current": None, "is_playing": False}}
+        # Structure: {chat_id: {"queue": [], "current": None, "is_playing": False, "track_seq": 0,
+        #                       "started_at": None, "paused_at": None}}
         self.active_chats = {}
         
+        # Per-chat serialization of playback state transitions
+        self.events = PlaybackEvents(self)
+        
+        # Liveness/readiness endpoint and stuck chat watchdog
+        self.health = HealthMonitor(self)
+        
+        # Blocking call detector, only when diagnostics are enabled
+        self.diagnostics = BlockingDetector(Config.BLOCKING_THRESHOLD_MS) if Config.DIAGNOSTICS else None
+        
+        # History of resolved tracks for instant lookup of repeated queries
+        self.track_index = TrackIndex(Config.HISTORY_INDEX_PATH, Config.HISTORY_INDEX_SIZE)
+        
+        # Recently played tracks per chat, kept on disk for "Previous"
+        self.history = PlayHistory(Config.TRACK_HISTORY_SIZE)
+        
+        # Inline search results shared by everyone
+        self.search_cache = SearchCache(
+            lambda query: search(query, Config.INLINE_RESULTS),
+            Config.INLINE_CACHE_SIZE,
+            Config.INLINE_CACHE_TTL
+        )
+        
+        # Per-chat quality tier and limits, read from memory on the command path
+        chat_settings.load()
+        
+        # Local media library, searched before YouTube
+        self.library = None
+        if Config.LIBRARY_PATH:
+            self.library = MediaLibrary(Config.LIBRARY_PATH, Config.LIBRARY_INDEX_PATH)
+        
+        # Downloads trending tracks ahead of requests, only when warm-up is enabled
+        self.warmer = CacheWarmer(self) if Config.WARMUP else None
+        
         # Store assistant info
         self.assistant_id = None
         self.assistant_name = None
@@ -88,6 +129,28 @@ class MusicBot:
             register_handlers(self)
             logger.info("Command handlers registered")
             
+            # Watch for stuck chats and event loop stalls
+            await self.health.start()
+            
+            if self.diagnostics:
+                self.diagnostics.start()
+                if Config.DIAGNOSTICS_REPORT_INTERVAL:
+                    asyncio.create_task(self.diagnostics.run_reporter(Config.DIAGNOSTICS_REPORT_INTERVAL, Config.DIAGNOSTICS_TOP_N))
+            
+            # Keep the library index up to date in the background
+            if self.library:
+                asyncio.create_task(self.library.run_scanner())
+                logger.info(f"Library scanner started for {Config.LIBRARY_PATH}")
+            
+            if self.warmer:
+                asyncio.create_task(self.warmer.run())
+                logger.info(f"Cache warm-up started (top {Config.WARMUP_TOP_K}, {Config.WARMUP_BUDGET_MB} MB)")
+            
+            # Rejoin the calls of the process we replace, then let it go
+            await self.handoff.restore()
+            if Config.HANDOFF:
+                self.handoff.install()
+            
             # Keep the bot running
             await idle()
             
@@ -113,7 +176,14 @@ class MusicBot:
     async def shutdown(self):
         """Properly shut down the bot and PyTgCalls client"""
         try:
-            if hasattr(self, 'call_py'):
+            if hasattr(self, 'health'):
+                await self.health.stop()
+            
+            if getattr(self, 'diagnostics', None):
+                self.diagnostics.stop()
+            
+            # After a handoff the calls belong to the new process
+            if hasattr(self, 'call_py') and not self.handoff.handed_off:
                 try:
                     await self.call_py.stop()
                 except:
@@ -124,6 +194,10 @@ class MusicBot:
                 
             if hasattr(self, 'bot') and self.bot.is_connected:
                 await self.bot.stop()
+            
+            # Flush pending play history changes
+            if hasattr(self, 'track_index'):
+                self.track_index.save()
                 
             logger.info("Bot shut down gracefully")
         except Exception as e:
@@ -13,15 +13,113 @@ class Config:
     
     # Bot settings
     PREFIX = "!"  # Command prefix
-    ADMINS = list(map(int, os.environ.get("ADMINS", "").split())) if os.environ.get("ADMINS") else []
+    ADMINS = list(map(int, os.environ.get("ADMINS", "").replace(",", " ").split())) if os.environ.get("ADMINS") else []  # Comma or space separated user IDs
     
     # Music settings
     MAX_PLAYLIST_SIZE = 10
     DURATION_LIMIT = 120  # In minutes
+    TARGET_AUDIO_BITRATE = int(os.environ.get("TARGET_AUDIO_BITRATE", 64))  # In kbps, smallest audio format at or above it is fetched
+    PREFETCH_DEPTH = int(os.environ.get("PREFETCH_DEPTH", 3))  # Queued tracks pre-decoded ahead (with AUDIO_CACHE)
+
+    # Per-chat overrides of the quality tier and the limits above, changed with the settings command
+    DEFAULT_QUALITY_TIER = os.environ.get("DEFAULT_QUALITY_TIER", "standard")  # low, standard, high or premium
+    CHAT_SETTINGS_PATH = os.environ.get("CHAT_SETTINGS_PATH", "chat_settings.json")
     
     # Paths
     DOWNLOAD_PATH = "downloads/"
-    
+
+    # Run on uvloop when it is installed (falls back to the default asyncio loop)
+    USE_UVLOOP = os.environ.get("USE_UVLOOP", "false").lower() in ("1", "true", "yes")
+
+    # Audio cache settings (tracks pre-decoded into the raw format used by the call)
+    AUDIO_CACHE = os.environ.get("AUDIO_CACHE", "false").lower() in ("1", "true", "yes")
+    AUDIO_CACHE_MAX_MB = int(os.environ.get("AUDIO_CACHE_MAX_MB", 2048))
+
+    # Progressive playback settings (start playing while the track is still downloading)
+    PROGRESSIVE_PLAYBACK = os.environ.get("PROGRESSIVE_PLAYBACK", "false").lower() in ("1", "true", "yes")
+    PROGRESSIVE_BUFFER_SECONDS = int(os.environ.get("PROGRESSIVE_BUFFER_SECONDS", 3))
+    PROGRESSIVE_START_TIMEOUT = int(os.environ.get("PROGRESSIVE_START_TIMEOUT", 15))  # In seconds
+
+    # Gapless playback: the next track's decoder is opened before the current one ends
+    GAPLESS = os.environ.get("GAPLESS", "false").lower() in ("1", "true", "yes")
+    GAPLESS_PRELOAD_SECONDS = int(os.environ.get("GAPLESS_PRELOAD_SECONDS", 15))
+    CROSSFADE_SECONDS = float(os.environ.get("CROSSFADE_SECONDS", 0))  # 0 switches at the sample boundary
+    # Chats starting the same track within SHARED_JOIN_SECONDS share one decoder (gapless streams only)
+    SHARED_DECODE = os.environ.get("SHARED_DECODE", "false").lower() in ("1", "true", "yes")
+    SHARED_JOIN_SECONDS = int(os.environ.get("SHARED_JOIN_SECONDS", 5))
+    SHARED_MAX_LAG_SECONDS = int(os.environ.get("SHARED_MAX_LAG_SECONDS", 30))  # Slower chats get their own decoder
+
+    # Admission control for downloads and ffmpeg work shared by all chats
+    MAX_CONCURRENT_DOWNLOADS = int(os.environ.get("MAX_CONCURRENT_DOWNLOADS", 3))
+    MAX_CONCURRENT_TRANSCODES = int(os.environ.get("MAX_CONCURRENT_TRANSCODES", 2))  # MP3 conversion and pre-decoding
+    MAX_CONCURRENT_LOOKUPS = int(os.environ.get("MAX_CONCURRENT_LOOKUPS", 4))  # Per batch !play
+
+    # Failure handling for the next-track loop and the YouTube extractor
+    TRACK_RETRIES = int(os.environ.get("TRACK_RETRIES", 2))
+    RETRY_BACKOFF = float(os.environ.get("RETRY_BACKOFF", 2))  # In seconds, doubled on each retry
+    MAX_PLAY_FAILURES = int(os.environ.get("MAX_PLAY_FAILURES", 3))
+    EXTRACTOR_FAILURE_THRESHOLD = int(os.environ.get("EXTRACTOR_FAILURE_THRESHOLD", 5))
+    EXTRACTOR_RESET_TIMEOUT = int(os.environ.get("EXTRACTOR_RESET_TIMEOUT", 60))  # In seconds
+
+    # Local media library, searched before YouTube when set
+    LIBRARY_PATH = os.environ.get("LIBRARY_PATH", None)
+    LIBRARY_INDEX_PATH = os.environ.get("LIBRARY_INDEX_PATH", "library.db")
+    LIBRARY_RESCAN_INTERVAL = int(os.environ.get("LIBRARY_RESCAN_INTERVAL", 600))  # In seconds
+
+    # Play history used to answer repeated queries without a YouTube search
+    HISTORY_INDEX_PATH = os.environ.get("HISTORY_INDEX_PATH", "history.json")
+    HISTORY_INDEX_SIZE = int(os.environ.get("HISTORY_INDEX_SIZE", 5000))
+    HISTORY_MATCH_THRESHOLD = float(os.environ.get("HISTORY_MATCH_THRESHOLD", 0.8))
+
+    # Played tracks per chat kept on disk for "Previous"
+    TRACK_HISTORY_SIZE = int(os.environ.get("TRACK_HISTORY_SIZE", 10))
+
+    # Inline search: results per query, cached per normalized query, and the typing debounce
+    INLINE_RESULTS = int(os.environ.get("INLINE_RESULTS", 8))
+    INLINE_CACHE_SIZE = int(os.environ.get("INLINE_CACHE_SIZE", 500))
+    INLINE_CACHE_TTL = int(os.environ.get("INLINE_CACHE_TTL", 900))  # In seconds
+    INLINE_DEBOUNCE = float(os.environ.get("INLINE_DEBOUNCE", 0.6))  # In seconds
+
+    # Popularity-driven warm-up: trending tracks are downloaded while no download is running
+    WARMUP = os.environ.get("WARMUP", "false").lower() in ("1", "true", "yes")
+    WARMUP_TOP_K = int(os.environ.get("WARMUP_TOP_K", 10))
+    WARMUP_BUDGET_MB = int(os.environ.get("WARMUP_BUDGET_MB", 500))
+    WARMUP_INTERVAL = int(os.environ.get("WARMUP_INTERVAL", 60))  # In seconds
+    WARMUP_WINDOWS = list(map(int, os.environ.get("WARMUP_WINDOWS", "3600,86400").replace(",", " ").split()))  # Sliding windows in seconds
+    WARMUP_MIN_REQUESTS = float(os.environ.get("WARMUP_MIN_REQUESTS", 2))  # Requests in the longest window to count as trending
+
+    # Health endpoint (disabled when HEALTH_PORT is 0) and watchdog
+    HEALTH_HOST = os.environ.get("HEALTH_HOST", "127.0.0.1")
+    HEALTH_PORT = int(os.environ.get("HEALTH_PORT", 0))
+    WATCHDOG_INTERVAL = int(os.environ.get("WATCHDOG_INTERVAL", 5))  # In seconds
+    WATCHDOG_GRACE = int(os.environ.get("WATCHDOG_GRACE", 15))  # Seconds past the expected track end
+    WATCHDOG_MAX_RECOVERIES = int(os.environ.get("WATCHDOG_MAX_RECOVERIES", 3))
+    LOOP_STALL_THRESHOLD = float(os.environ.get("LOOP_STALL_THRESHOLD", 1.0))  # In seconds
+
+    # Opt-in event loop lag and blocking call diagnostics
+    DIAGNOSTICS = os.environ.get("DIAGNOSTICS", "false").lower() in ("1", "true", "yes")
+    BLOCKING_THRESHOLD_MS = int(os.environ.get("BLOCKING_THRESHOLD_MS", 100))
+    DIAGNOSTICS_REPORT_INTERVAL = int(os.environ.get("DIAGNOSTICS_REPORT_INTERVAL", 300))  # In seconds, 0 disables
+    DIAGNOSTICS_TOP_N = int(os.environ.get("DIAGNOSTICS_TOP_N", 10))
+    TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", 1))  # Frames kept per allocation by the admin memory commands
+
+    # Graceful restart: on HANDOFF_SIGNAL the sessions are handed to a new process
+    HANDOFF = os.environ.get("HANDOFF", "false").lower() in ("1", "true", "yes")
+    HANDOFF_PATH = os.environ.get("HANDOFF_PATH", "handoff.json")
+    HANDOFF_SIGNAL = os.environ.get("HANDOFF_SIGNAL", "SIGUSR2")
+    HANDOFF_SPAWN = os.environ.get("HANDOFF_SPAWN", "true").lower() in ("1", "true", "yes")  # Start the new process ourselves
+    HANDOFF_TIMEOUT = int(os.environ.get("HANDOFF_TIMEOUT", 60))  # Seconds to wait for the new process
+    HANDOFF_MAX_AGE = int(os.environ.get("HANDOFF_MAX_AGE", 120))  # Older handoff files are not resumed
+
+    # Logging: level, per-logger overrides ("pyrogram=WARNING,handlers=DEBUG"),
+    # "json" or "text" output, and at most LOG_SAMPLE_BURST repeats of the same
+    # warning or error per LOG_SAMPLE_WINDOW seconds
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+    LOG_SAMPLE_BURST = int(os.environ.get("LOG_SAMPLE_BURST", 5))
+    LOG_SAMPLE_WINDOW = int(os.environ.get("LOG_SAMPLE_WINDOW", 60))  # In seconds
+
     @classmethod
     def validate(cls):
         """Validate required configuration variables"""
@@ -0,0 +1,205 @@
+import os
+import logging
+import asyncio
+from pyrogram import filters
+from pyrogram.types import Message
+
+from config import Config
+# Use absolute imports for better compatibility with Heroku
+from utils.introspection import (
+    MemoryTracer, chat_memory, object_memory, task_counts, executor_stats,
+    open_fds, directory_usage, format_bytes
+)
+from utils.shared_decode import shared_stats
+from utils.chat_settings import chat_settings, QUALITY_TIERS, SETTINGS
+from utils.diagnostics import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4096
+
+# Lines shown per section unless a count is given
+DEFAULT_TOP = 10
+
+def format_frame(frame) -> str:
+    """Source location of a traced allocation, relative to the project when inside it."""
+    filename = frame.filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    return f"{filename}:{frame.lineno}"
+
+def truncate(text: str) -> str:
+    if len(text) <= MAX_MESSAGE_LENGTH:
+        return text
+    return text[:MAX_MESSAGE_LENGTH - 2] + "\n…"
+
+def parse_count(message: Message, index: int = 1) -> int:
+    """Optional line count argument of a command."""
+    try:
+        return max(1, int(message.command[index]))
+    except (IndexError, ValueError):
+        return DEFAULT_TOP
+
+def format_settings(chat_id) -> str:
+    """Effective settings of a chat, marking the overridden ones."""
+    settings = chat_settings.get(chat_id)
+    overrides = chat_settings.overrides.get(chat_id, {})
+    source_bitrate, mp3_bitrate = QUALITY_TIERS.get(settings["tier"], QUALITY_TIERS["standard"])
+    text = f"⚙️ **Settings of** `{chat_id}`:\n"
+    for key in SETTINGS:
+        text += f"`{key}` {settings[key]}{'' if key in overrides else ' (default)'}\n"
+    text += f"\nTier {settings['tier']}: fetches ~{source_bitrate} kbps audio, stored as {mp3_bitrate} kbps MP3."
+    return text
+
+def register_admin_handlers(bot):
+    """Register the admin-only introspection and settings commands to the Pyrogram client"""
+
+    tracer = MemoryTracer(Config.TRACEMALLOC_FRAMES)
+    # Nobody is an admin when ADMINS is empty, the commands are then ignored
+    admins = filters.user(Config.ADMINS)
+
+    @bot.bot.on_message(filters.command("stats", prefixes=Config.PREFIX) & admins)
+    async def stats_command(_, message: Message):
+        """Handler for the stats command: memory per chat, tasks, pools, fds and disk"""
+        top = parse_count(message)
+
+        chats = chat_memory(bot.active_chats)
+        total = sum(size for _, size, _ in chats)
+        text = f"📊 **Chats:** {len(chats)}, ~{format_bytes(total)} of state\n"
+        for chat_id, size, queued in chats[:top]:
+            text += f"`{chat_id}` ~{format_bytes(size)}, {queued} queued\n"
+
+        # Long-lived caches, bounded but large when full
+        caches = [
+            ("track index", bot.track_index, f"{len(bot.track_index.tracks)} track(s)"),
+            ("play history", bot.history, f"{len(bot.history)} entry(ies)"),
+            ("inline search cache", bot.search_cache, f"{len(bot.search_cache)} query(ies)"),
+        ]
+        if bot.warmer:
+            caches.append(("popularity tracker", bot.warmer.tracker, f"{len(bot.warmer.tracker.songs)} video(s)"))
+        text += "\n**Caches:**\n"
+        for name, cache, entries in caches:
+            text += f"{name}: ~{format_bytes(object_memory(cache))}, {entries}\n"
+
+        count, names = task_counts()
+        text += f"\n**Tasks:** {count}\n"
+        for name, tasks in names[:top]:
+            text += f"`{name}` × {tasks}\n"
+
+        text += "\n**Executors and pools:**\n"
+        for name, stats in executor_stats().items():
+            text += f"{name}: " + ", ".join(f"{key} {value}" for key, value in stats.items()) + "\n"
+        shared = shared_stats()
+        if shared["sources"]:
+            text += f"shared decoders: {shared['sources']}, {shared['listeners']} listener(s)\n"
+
+        # Both walk the filesystem, which can take a while on a big downloads directory
+        loop = asyncio.get_event_loop()
+        fds = await loop.run_in_executor(None, open_fds)
+        if fds:
+            text += f"\n**Open fds:** {sum(fds.values())} (" + ", ".join(f"{kind} {n}" for kind, n in sorted(fds.items())) + ")\n"
+
+        files, size = await loop.run_in_executor(None, directory_usage, Config.DOWNLOAD_PATH)
+        text += f"\n**Downloads:** {files} file(s), {format_bytes(size)}\n"
+
+        if bot.warmer:
+            text += f"\n**Warm-up:** {bot.warmer.format_report()}\n"
+
+        if bot.diagnostics:
+            text += f"\n{bot.diagnostics.format_report(3)}\n"
+
+        text += f"\nAllocation tracing is {'on' if tracer.tracing else 'off'}."
+        await message.reply_text(truncate(text))
+
+    @bot.bot.on_message(filters.command("memtrace", prefixes=Config.PREFIX) & admins)
+    async def memtrace_command(_, message: Message):
+        """Handler for the memtrace command: turn allocation tracing on or off"""
+        action = message.command[1].lower() if len(message.command) > 1 else ""
+        if action == "on":
+            tracer.start()
+            await message.reply_text("✅ Allocation tracing started. It slows the bot down, turn it off when done.")
+        elif action == "off":
+            tracer.stop()
+            await message.reply_text("✅ Allocation tracing stopped, snapshots discarded.")
+        else:
+            await message.reply_text(f"Usage: `{Config.PREFIX}memtrace on|off`")
+
+    @bot.bot.on_message(filters.command("memtop", prefixes=Config.PREFIX) & admins)
+    async def memtop_command(_, message: Message):
+        """Handler for the memtop command: largest allocators since tracing started"""
+        try:
+            statistics = await tracer.top(parse_count(message))
+        except RuntimeError:
+            await message.reply_text(f"❌ Allocation tracing is off. Start it with `{Config.PREFIX}memtrace on`.")
+            return
+
+        text = "🧠 **Top allocators:**\n"
+        for stat in statistics:
+            text += f"`{format_frame(stat.traceback[0])}` {format_bytes(stat.size)} in {stat.count} block(s)\n"
+        await message.reply_text(truncate(text))
+
+    @bot.bot.on_message(filters.command("snapshot", prefixes=Config.PREFIX) & admins)
+    async def snapshot_command(_, message: Message):
+        """Handler for the snapshot command: store the current allocations under a name"""
+        name = await tracer.snapshot(message.command[1] if len(message.command) > 1 else None)
+        await message.reply_text(
+            f"📸 Snapshot `{name}` taken ({len(tracer.snapshots)} kept: {', '.join(tracer.snapshots)}).\n"
+            f"Compare with `{Config.PREFIX}memdiff {name}`."
+        )
+
+    @bot.bot.on_message(filters.command("memdiff", prefixes=Config.PREFIX) & admins)
+    async def memdiff_command(_, message: Message):
+        """Handler for the memdiff command: allocation growth between two snapshots"""
+        # memdiff [old [new]], the oldest snapshot and the current allocations by default
+        args = message.command[1:3]
+        try:
+            differences = await tracer.diff(*args, n=DEFAULT_TOP)
+        except KeyError as e:
+            await message.reply_text(f"❌ Unknown snapshot: {e}. Take one with `{Config.PREFIX}snapshot`.")
+            return
+        except RuntimeError:
+            await message.reply_text(f"❌ Allocation tracing is off. Start it with `{Config.PREFIX}memtrace on`.")
+            return
+
+        text = f"🔍 **Allocation changes since `{args[0] if args else next(iter(tracer.snapshots))}`:**\n"
+        for stat in differences:
+            text += (
+                f"`{format_frame(stat.traceback[0])}` {'+' if stat.size_diff >= 0 else '-'}{format_bytes(abs(stat.size_diff))} "
+                f"({stat.count_diff:+d} blocks), now {format_bytes(stat.size)}\n"
+            )
+        await message.reply_text(truncate(text))
+
+    @bot.bot.on_message(filters.command("settings", prefixes=Config.PREFIX) & admins)
+    async def settings_command(_, message: Message):
+        """Handler for the settings command: show or change a chat's quality tier and limits"""
+        # settings [chat ID] [reset [key] | key value], the current chat by default
+        args = message.command[1:]
+        chat_id = message.chat.id
+        if args and args[0].lstrip("-").isdigit():
+            chat_id = int(args.pop(0))
+
+        if not args:
+            await message.reply_text(format_settings(chat_id))
+            return
+
+        if args[0].lower() == "reset":
+            chat_settings.reset(chat_id, args[1] if len(args) > 1 else None)
+            await message.reply_text(format_settings(chat_id))
+            return
+
+        if len(args) != 2:
+            await message.reply_text(
+                f"Usage: `{Config.PREFIX}settings [chat ID] [{'|'.join(SETTINGS)}] [value]` "
+                f"or `{Config.PREFIX}settings [chat ID] reset [setting]`\n"
+                f"Tiers: {', '.join(QUALITY_TIERS)}"
+            )
+            return
+
+        try:
+            chat_settings.set(chat_id, args[0].lower(), args[1])
+        except ValueError as e:
+            await message.reply_text(f"❌ {e}")
+            return
+        logger.info(f"Settings of chat {chat_id} changed by {message.from_user.id}: {args[0]}={args[1]}")
+        await message.reply_text(format_settings(chat_id))
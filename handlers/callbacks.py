@@ -3,6 +3,7 @@ from pyrogram import filters
 from pyrogram.types import CallbackQuery
 # Use absolute imports for better compatibility with Heroku
 from utils.helpers import create_player_keyboard, get_now_playing_text, get_queue_text, create_queue_keyboard
+from utils.position import mark_paused, mark_resumed, get_position
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,7 @@ def register_callback_handlers(bot):
             # Handle different player controls
             if data == "pause":
                 await bot.call_py.pause_stream(chat_id)
+                mark_paused(bot.active_chats[chat_id])
                 await callback_query.answer("Paused the music")
                 
                 # Update keyboard to show resume button instead
@@ -34,6 +36,7 @@ def register_callback_handlers(bot):
                 
             elif data == "resume":
                 await bot.call_py.resume_stream(chat_id)
+                mark_resumed(bot.active_chats[chat_id])
                 await callback_query.answer("Resumed the music")
                 
                 # Update keyboard to show pause button instead
@@ -41,38 +44,15 @@ def register_callback_handlers(bot):
                 await callback_query.message.edit_reply_markup(keyboard)
                 
             elif data == "skip":
-                # Skip logic - stop current stream, which will trigger stream end handler
-                await bot.call_py.leave_group_call(chat_id)
+                # Skip through the playback worker so it cannot race with a stream end
+                from handlers.commands import skip_current
+                bot.events.end_track(chat_id, lambda: skip_current(bot, chat_id))
                 await callback_query.answer("Skipped to the next song")
                 
-                # Process next song - imported function
-                from handlers.commands import process_next_song
-                await process_next_song(bot, chat_id)
-                
             elif data == "stop":
-                # Clear queue
-                current_song = bot.active_chats[chat_id]["current"]
-                
-                # Clean up current song file
-                if current_song and current_song.get("file_path"):
-                    from utils.youtube import cleanup_file
-                    cleanup_file(current_song["file_path"])
-                
-                # Clean up queued song files
-                for song in bot.active_chats[chat_id]["queue"]:
-                    if song.get("file_path"):
-                        from utils.youtube import cleanup_file
-                        cleanup_file(song["file_path"])
-                
-                # Reset chat info
-                bot.active_chats[chat_id] = {
-                    "queue": [],
-                    "current": None,
-                    "is_playing": False
-                }
-                
-                # Stop playing
-                await bot.call_py.leave_group_call(chat_id)
+                # Clear queue, clean up files and leave through the playback worker
+                from handlers.commands import stop_playback
+                await bot.events.submit(chat_id, lambda: stop_playback(bot, chat_id))
                 await callback_query.answer("Stopped the music")
                 
                 # Update message
@@ -84,7 +64,7 @@ def register_callback_handlers(bot):
             elif data == "refresh":
                 # Just refresh the player display
                 current_song = bot.active_chats[chat_id]["current"]
-                now_playing = get_now_playing_text(current_song)
+                now_playing = get_now_playing_text(current_song, get_position(bot.active_chats[chat_id]))
                 
                 await callback_query.message.edit_text(
                     now_playing,
@@ -165,5 +145,24 @@ def register_callback_handlers(bot):
 
     @bot.bot.on_callback_query(filters.regex(r"^previous$"))
     async def handle_previous_callback(_, callback_query: CallbackQuery):
-        """Handler for previous song callback - not implemented yet"""
-        await callback_query.answer("Previous song function not implemented yet", show_alert=True)
+        """Handler for previous song callback"""
+        chat_id = callback_query.message.chat.id
+        
+        # Check if there's an active session
+        if chat_id not in bot.active_chats or not bot.active_chats[chat_id]["current"]:
+            await callback_query.answer("No active music session!", show_alert=True)
+            return
+        
+        if not bot.history.songs(chat_id):
+            await callback_query.answer("No previous song in this chat", show_alert=True)
+            return
+        
+        try:
+            # Go back through the playback worker so it cannot interleave with a stream end
+            from handlers.commands import play_previous
+            bot.events.submit(chat_id, lambda: play_previous(bot, chat_id))
+            await callback_query.answer("Playing the previous song")
+            
+        except Exception as e:
+            logger.error(f"Error in previous callback: {e}", exc_info=True)
+            await callback_query.answer(f"Error: {str(e)}", show_alert=True)
@@ -33,18 +33,30 @@ except ImportError:
 
 from config import Config
 # Use absolute imports for better compatibility with Heroku
-from utils.youtube import download_audio, cleanup_file
-from utils.helpers import create_player_keyboard, get_now_playing_text, get_queue_text
+from utils.youtube import download_audio, cleanup_file, extractor_breaker, check_playable, get_tier, TrackRejected
+from utils.audio_cache import is_raw_file, raw_input_parameters, schedule_conversion, get_cached_path, song_key
+from utils.progressive import download_audio_progressive, is_growing, follow_parameters, start_monitor
+from utils.events import next_track_seq
+from utils.gapless import start_gapless, stop_gapless, skip_gapless
+from utils.position import mark_started, mark_paused, mark_resumed, get_position
+from utils.scheduler import PRIORITY_NEXT_UP, PRIORITY_USER
+from utils.chat_settings import get_settings, meets_tier
+from utils.logging_setup import bind_track
+from utils.helpers import create_player_keyboard, get_now_playing_text, get_queue_text, parse_timestamp, format_duration
 
 logger = logging.getLogger(__name__)
 
-async def ensure_assistant_in_chat(bot, chat_id):
+# Minimum seconds between progress edits of a batch play status message
+BATCH_EDIT_INTERVAL = 2
+
+async def ensure_assistant_in_chat(bot, chat_id, notify=True):
     """
     Ensure that the assistant user is in the chat.
     
     Args:
         bot: The MusicBot instance
         chat_id: Chat ID to check
+        notify: Whether to tell the chat when the assistant is missing
         
     Returns:
         True if assistant is in chat or joined successfully, False otherwise
@@ -57,6 +69,9 @@ async def ensure_assistant_in_chat(bot, chat_id):
         await bot.assistant.get_chat_member(chat_id, bot.assistant_id)
         return True
     except UserNotParticipant:
+        if not notify:
+            return False
+        
         # Assistant is not in the chat, inform user to add it
         chat = await bot.bot.get_chat(chat_id)
         chat_title = chat.title
@@ -71,7 +86,7 @@ async def ensure_assistant_in_chat(bot, chat_id):
         logger.error(f"Error checking assistant in chat: {e}", exc_info=True)
         return False
 
-async def play_audio(bot, chat_id, audio_info):
+async def play_audio(bot, chat_id, audio_info, position=0, notify=True):
     """
     Play audio in a voice chat.
     
@@ -79,6 +94,8 @@ async def play_audio(bot, chat_id, audio_info):
         bot: The MusicBot instance
         chat_id: Chat ID to play in
         audio_info: Audio information dictionary
+        position: Position in seconds to start playing from
+        notify: Whether to tell the chat why playing failed, off while retrying
     
     Returns:
         True if successful, False otherwise
@@ -91,36 +108,59 @@ async def play_audio(bot, chat_id, audio_info):
             return False
             
         # Check if assistant is in the chat
-        if not await ensure_assistant_in_chat(bot, chat_id):
+        if not await ensure_assistant_in_chat(bot, chat_id, notify):
             return False
         
+        bind_track(audio_info.get('id'))
+        
+        stream_path = audio_info['file_path']
+        if Config.GAPLESS:
+            # The call plays a continuous stream, the player switches tracks in it
+            stream_path = await start_gapless(bot, chat_id, audio_info, position)
+            stream_start = 0
+        else:
+            stream_start = position
+        
         # Try to join voice chat using PyTgCalls with different versions
         success = False
         
         # Method 1: Latest PyTgCalls API version
         try:
-            logger.info(f"Trying to join voice chat with method 1 (latest API), file: {audio_info['file_path']}")
+            logger.debug(f"Trying to join voice chat with method 1 (latest API), file: {stream_path}")
             
             # Create audio input (newer PyTgCalls versions)
             from pytgcalls.types.input_stream import AudioPiped
-            audio_stream = AudioPiped(audio_info['file_path'])
+            input_parameters = f"-ss {stream_start:.1f}" if stream_start else ""
+            if is_raw_file(stream_path):
+                # Pre-decoded file: ffmpeg only has to copy the samples
+                input_parameters = f"{input_parameters} {raw_input_parameters()}".strip()
+                if is_growing(stream_path):
+                    # Still downloading: keep reading as the file grows
+                    input_parameters += f" {follow_parameters()}"
+            if input_parameters:
+                audio_stream = AudioPiped(
+                    stream_path,
+                    additional_ffmpeg_parameters=input_parameters
+                )
+            else:
+                audio_stream = AudioPiped(stream_path)
             
             await bot.call_py.join_group_call(
                 chat_id,
                 audio_stream
             )
             success = True
-            logger.info("Successfully joined with method 1")
+            logger.debug("Joined with method 1")
         except Exception as method1_error:
-            logger.warning(f"Method 1 failed: {method1_error}")
+            logger.debug(f"Method 1 failed: {method1_error}")
         
         # Method 2: Legacy PyTgCalls API with InputAudioStream
         if not success:
             try:
-                logger.info(f"Trying method 2 (InputAudioStream)")
+                logger.debug("Trying method 2 (InputAudioStream)")
                 # Older PyTgCalls versions
                 from pytgcalls.types.input_stream import InputAudioStream
-                audio_stream = InputAudioStream(audio_info['file_path'])
+                audio_stream = InputAudioStream(stream_path)
                 
                 await bot.call_py.join_group_call(
                     chat_id,
@@ -128,50 +168,129 @@ async def play_audio(bot, chat_id, audio_info):
                     stream_type=0
                 )
                 success = True
-                logger.info("Successfully joined with method 2")
+                if stream_start:
+                    position = 0  # Seeking needs the AudioPiped parameters
+                logger.debug("Joined with method 2")
             except Exception as method2_error:
-                logger.warning(f"Method 2 failed: {method2_error}")
+                logger.debug(f"Method 2 failed: {method2_error}")
         
         # Method 3: Oldest PyTgCalls API with dictionary format
         if not success:
             try:
-                logger.info(f"Trying method 3 (dictionary format)")
+                logger.debug("Trying method 3 (dictionary format)")
                 await bot.call_py.join_group_call(
                     chat_id,
                     {
-                        'path': audio_info['file_path'],
+                        'path': stream_path,
                         'stream_type': 'local'
                     }
                 )
                 success = True
-                logger.info("Successfully joined with method 3")
+                if stream_start:
+                    position = 0  # Seeking needs the AudioPiped parameters
+                logger.debug("Joined with method 3")
             except Exception as method3_error:
                 logger.warning(f"Method 3 failed: {method3_error}")
                 raise method3_error  # Raise the last error if all methods fail
         
+        logger.info(f"Playing {audio_info.get('title', audio_info['file_path'])}")
+        
         # Update active chat info
         bot.active_chats[chat_id]["is_playing"] = True
         bot.active_chats[chat_id]["current"] = audio_info
+        next_track_seq(bot.active_chats[chat_id])
+        mark_started(bot.active_chats[chat_id], position)
+        
+        # Decode the track once so that replays skip the transcode
+        schedule_conversion(audio_info, chat_id)
+        
+        # Watch for buffer underruns while a progressive download is in flight
+        start_monitor(bot, chat_id, audio_info['file_path'])
         
         return True
     except NoActiveGroupCall:
-        await bot.bot.send_message(
-            chat_id,
-            "❌ No active voice chat found. Please start a voice chat first!"
-        )
+        stop_gapless(chat_id)
+        if notify:
+            await bot.bot.send_message(
+                chat_id,
+                "❌ No active voice chat found. Please start a voice chat first!"
+            )
         return False
     except Exception as e:
+        stop_gapless(chat_id)
         logger.error(f"Error playing audio: {e}", exc_info=True)
-        await bot.bot.send_message(
-            chat_id,
-            f"❌ Error playing audio: {str(e)}"
-        )
+        if notify:
+            await bot.bot.send_message(
+                chat_id,
+                f"❌ Error playing audio: {str(e)}"
+            )
         return False
 
+async def fetch_with_retry(song, chat_id):
+    """
+    Download a queued song, retrying with backoff.
+    
+    Args:
+        song: Queued song information
+        chat_id: Chat ID the song is queued in
+    
+    Returns:
+        Downloaded song information or None if all attempts failed
+    """
+    if not song.get('webpage_url'):
+        # Local library file that disappeared, nothing to download it from
+        return None
+    
+    for attempt in range(Config.TRACK_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(Config.RETRY_BACKOFF * 2 ** (attempt - 1))
+        
+        # Don't keep hammering the extractor while it is failing
+        if extractor_breaker.is_open:
+            return None
+        
+        try:
+            if Config.PROGRESSIVE_PLAYBACK:
+                result = await download_audio_progressive(song['webpage_url'], PRIORITY_NEXT_UP, chat_id)
+            else:
+                result = await download_audio(song['webpage_url'], PRIORITY_NEXT_UP, chat_id)
+        except TrackRejected as e:
+            # Retrying cannot change the verdict
+            logger.info(f"Skipping {song['webpage_url']}: {e}")
+            return None
+        
+        if result:
+            return result
+        logger.warning(f"Download attempt {attempt + 1} failed for {song['webpage_url']}")
+    
+    return None
+
+def prefetch_queue(chat_id, chat_info):
+    """Pre-decode the queued songs within the chat's prefetch depth."""
+    for song in chat_info["queue"][:get_settings(chat_id)["prefetch_depth"]]:
+        schedule_conversion(song, chat_id)
+
+async def report_skipped(bot, chat_id, skipped):
+    """Send a single summary of the songs skipped while advancing the queue."""
+    if not skipped:
+        return
+    
+    text = f"⚠️ Skipped {len(skipped)} song(s) that could not be played:\n"
+    text += "\n".join(f"• {title}" for title in skipped[:10])
+    if len(skipped) > 10:
+        text += f"\n…and {len(skipped) - 10} more"
+    if extractor_breaker.is_open:
+        text += "\n\nYouTube is currently failing, please try again in a minute."
+    
+    await bot.bot.send_message(chat_id, text)
+
 async def process_next_song(bot, chat_id):
     """
     Process the next song in the queue.
     
+    Songs that fail to download or play are skipped until one plays or the
+    queue runs out, and reported in a single summary message.
+    
     Args:
         bot: The MusicBot instance
         chat_id: Chat ID to play in
@@ -183,60 +302,104 @@ async def process_next_song(bot, chat_id):
             "current": None,
             "is_playing": False
         })
-        
-        # If queue is empty, reset
-        if not chat_info["queue"]:
-            chat_info["is_playing"] = False
-            chat_info["current"] = None
-            bot.active_chats[chat_id] = chat_info
-            
-            # Leave the voice chat
-            await bot.call_py.leave_group_call(chat_id)
-            await bot.bot.send_message(
-                chat_id,
-                "✅ Queue finished. Left the voice chat."
-            )
-            return
-        
-        # Get next song from queue
-        next_song = chat_info["queue"].pop(0)
         bot.active_chats[chat_id] = chat_info
         
-        # Download if not already downloaded
-        if not next_song.get('file_path') or not os.path.exists(next_song.get('file_path')):
-            await bot.bot.send_message(
-                chat_id,
-                f"🔄 Downloading: {next_song['title']}"
-            )
-            next_song = await download_audio(next_song['webpage_url'])
+        previous_song = chat_info["current"]
+        skipped = []
+        play_failures = 0
+        extractor_down = False
+        
+        while chat_info["queue"]:
+            # Get next song from queue
+            next_song = chat_info["queue"].pop(0)
+            
+            # Download if not already downloaded
+            if not next_song.get('file_path') or not os.path.exists(next_song.get('file_path')):
+                if extractor_breaker.is_open:
+                    # Every download would fail right away, keep the queue for later
+                    chat_info["queue"].insert(0, next_song)
+                    extractor_down = True
+                    break
+                
+                await bot.bot.send_message(
+                    chat_id,
+                    f"🔄 Downloading: {next_song['title']}"
+                )
+                downloaded = await fetch_with_retry(next_song, chat_id)
+                
+                if not downloaded:
+                    if extractor_breaker.is_open:
+                        # Failed because YouTube is down, not because of the song
+                        chat_info["queue"].insert(0, next_song)
+                        extractor_down = True
+                        break
+                    skipped.append(next_song['title'])
+                    continue
+                next_song = downloaded
             
-            if not next_song:
+            # Play the song
+            if await play_audio(bot, chat_id, next_song):
+                await report_skipped(bot, chat_id, skipped)
+                
+                # Send now playing message
                 await bot.bot.send_message(
                     chat_id,
-                    "❌ Failed to download the song. Skipping..."
+                    get_now_playing_text(next_song),
+                    reply_markup=create_player_keyboard(),
+                    disable_web_page_preview=True
                 )
-                # Process next song
-                await process_next_song(bot, chat_id)
+                
+                # Keep the previous file for "Previous", the oldest one leaves the history
+                bot.history.push(chat_id, previous_song, in_use=next_song['file_path'])
+                
+                # The next song within the prefetch depth starts pre-decoding
+                prefetch_queue(chat_id, chat_info)
                 return
+            
+            skipped.append(next_song['title'])
+            play_failures += 1
+            if play_failures >= Config.MAX_PLAY_FAILURES:
+                # The call itself is broken, the remaining songs would fail the same way
+                break
+        
+        await report_skipped(bot, chat_id, skipped)
+        bot.history.push(chat_id, previous_song)
         
-        # Play the song
-        success = await play_audio(bot, chat_id, next_song)
+        # Nothing left to play, reset
+        chat_info["is_playing"] = False
+        chat_info["current"] = None
+        next_track_seq(chat_info)
         
-        if success:
-            # Send now playing message
+        # Leave the voice chat
+        stop_gapless(chat_id)
+        try:
+            await bot.call_py.leave_group_call(chat_id)
+        except Exception as e:
+            # Possibly never joined, the retry below must still be scheduled
+            logger.debug(f"Could not leave the call in chat {chat_id}: {e}")
+        if extractor_down:
+            retry_in = max(extractor_breaker.retry_in, 1)
             await bot.bot.send_message(
                 chat_id,
-                get_now_playing_text(next_song),
-                reply_markup=create_player_keyboard(),
-                disable_web_page_preview=True
+                f"⚠️ YouTube is not responding. {len(chat_info['queue'])} song(s) kept in the queue, "
+                f"trying again in {retry_in:.0f}s."
+            )
+            # Dropped if anything else plays or stops in the meantime
+            track_seq = chat_info["track_seq"]
+            asyncio.get_running_loop().call_later(
+                retry_in,
+                lambda: bot.events.submit(chat_id, lambda: process_next_song(bot, chat_id), track_seq=track_seq)
+            )
+        elif chat_info["queue"]:
+            await bot.bot.send_message(
+                chat_id,
+                f"⏹ Stopped after repeated playback errors. {len(chat_info['queue'])} song(s) left in the queue."
             )
-            
-            # Clean up previous file if exists
-            if chat_info["current"] and chat_info["current"].get("file_path"):
-                cleanup_file(chat_info["current"]["file_path"])
         else:
-            # Failed to play, try next song
-            await process_next_song(bot, chat_id)
+            await bot.bot.send_message(
+                chat_id,
+                "✅ Queue finished. Left the voice chat."
+            )
             
     except Exception as e:
         logger.error(f"Error processing next song: {e}", exc_info=True)
@@ -248,6 +411,491 @@ async def process_next_song(bot, chat_id):
         except:
             pass
 
+async def resolve_song(bot, chat_id, query, allow_progressive=True):
+    """
+    Find and fetch the song for a play query.
+    
+    Tries the local library, then the play history, and only then searches
+    and downloads from YouTube.
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID the song is requested in
+        query: Song name or YouTube URL
+        allow_progressive: Whether the song may start playing before it is fully downloaded
+    
+    Returns:
+        Song information dictionary or None if nothing could be fetched
+    
+    Raises:
+        TrackRejected: If the song is longer than the chat's duration limit
+    """
+    duration_limit = get_settings(chat_id)["duration_limit"]
+    tier = get_tier(chat_id)
+    
+    # Local library first: no network and no download needed
+    if bot.library:
+        song_info = await bot.library.resolve(query)
+        if song_info:
+            reason = check_playable(song_info, duration_limit)
+            if reason:
+                raise TrackRejected(reason)
+            logger.info(f"Playing {song_info['file_path']} from the local library")
+            return song_info
+    
+    # Songs played before: skip the search, and the download if still on disk
+    url = query
+    if not query.startswith("http"):
+        known = bot.track_index.lookup(query)
+        if known:
+            reason = check_playable(known, duration_limit)
+            if reason:
+                raise TrackRejected(reason)
+            # Files fetched at a lower tier than the chat's are downloaded again
+            if meets_tier(known.get('tier'), tier):
+                cached_path = get_cached_path(song_key(known))
+                if cached_path:
+                    known['file_path'] = cached_path
+                    return record_request(bot, known, cold=False)
+                if known.get('file_path') and os.path.exists(known['file_path']):
+                    return record_request(bot, known, cold=False)
+            url = known['webpage_url']
+    
+    # Trending tracks downloaded ahead of time
+    if bot.warmer:
+        song_info = bot.warmer.lookup(url, tier)
+        if song_info:
+            reason = check_playable(song_info, duration_limit)
+            if reason:
+                raise TrackRejected(reason)
+            if not query.startswith("http"):
+                bot.track_index.record(query, song_info)
+            return record_request(bot, song_info, cold=False)
+    
+    # Download and extract info, starting early if it will play right away
+    if Config.PROGRESSIVE_PLAYBACK and allow_progressive and not bot.active_chats[chat_id]["is_playing"]:
+        song_info = await download_audio_progressive(url, PRIORITY_USER, chat_id)
+    else:
+        song_info = await download_audio(url, PRIORITY_USER, chat_id)
+    
+    if song_info and not query.startswith("http"):
+        bot.track_index.record(query, song_info)
+    if song_info:
+        # Cold only when it came over the network, not from a copy already on disk
+        record_request(bot, song_info, cold=song_info.get('fetched', False))
+    return song_info
+
+def record_request(bot, song_info, cold):
+    """Count a resolved play request for the cache warm-up, and return the song."""
+    if bot.warmer:
+        bot.warmer.record(song_info, cold)
+    return song_info
+
+def split_queries(text):
+    """Split the text of a play command into one query per line or ";"."""
+    queries = [query.strip() for line in text.splitlines() for query in line.split(";")]
+    return [query for query in queries if query]
+
+def discard_resolved(task):
+    """Cancel a song lookup, or remove its download if it already finished."""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled() and not task.exception() and task.result():
+        cleanup_file(task.result()['file_path'])
+
+async def play_batch(bot, chat_id, queries, status_message, ignored=0):
+    """
+    Resolve several play queries concurrently and queue them in order.
+    
+    Lookups run in parallel (at most MAX_CONCURRENT_LOOKUPS at a time); each
+    song is queued as soon as it and all songs before it are resolved. The
+    progress is shown by editing a single status message.
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID to play in
+        queries: Song names or YouTube URLs, in the order to queue them
+        status_message: Message to report progress in
+        ignored: Number of further queries left out for lack of room in the queue
+    """
+    semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_LOOKUPS)
+    lines = [f"⏳ {query}" for query in queries]
+    if ignored:
+        lines.append(
+            f"\n⚠️ {ignored} more song(s) ignored, only {len(queries)} fit in the queue "
+            f"(limit {get_settings(chat_id)['queue_limit']})."
+        )
+    last_edit = 0
+    
+    async def resolve(index, query):
+        async with semaphore:
+            # Only the first song can start playing right away
+            return await resolve_song(bot, chat_id, query, allow_progressive=index == 0)
+    
+    async def report(final=False):
+        nonlocal last_edit
+        # Telegram rate-limits edits, intermediate updates are throttled
+        if not final and asyncio.get_running_loop().time() - last_edit < BATCH_EDIT_INTERVAL:
+            return
+        last_edit = asyncio.get_running_loop().time()
+        try:
+            await status_message.edit("\n".join(lines), disable_web_page_preview=True)
+        except Exception as e:
+            logger.debug(f"Could not update batch status: {e}")
+    
+    await report(final=True)
+    tasks = [asyncio.create_task(resolve(i, query)) for i, query in enumerate(queries)]
+    queued = 0
+    
+    for i, task in enumerate(tasks):
+        try:
+            song_info = await task
+        except TrackRejected as e:
+            lines[i] = f"❌ {queries[i]}: {e}"
+            await report()
+            continue
+        except Exception as e:
+            logger.error(f"Error resolving {queries[i]}: {e}", exc_info=True)
+            song_info = None
+        
+        if not song_info:
+            lines[i] = f"❌ {queries[i]}: not found"
+            await report()
+            continue
+        
+        result = await bot.events.submit(chat_id, lambda song_info=song_info: enqueue_or_play(bot, chat_id, song_info))
+        if result == "played":
+            lines[i] = f"▶️ **{song_info['title']}**"
+            queued += 1
+        elif result == "queued":
+            lines[i] = f"✅ **{song_info['title']}** (#{len(bot.active_chats[chat_id]['queue'])})"
+            queued += 1
+        elif result == "full":
+            cleanup_file(song_info['file_path'])
+            # The rest would not fit either
+            for j in range(i, len(tasks)):
+                discard_resolved(tasks[j])
+                lines[j] = f"❌ {queries[j]}: queue full ({get_settings(chat_id)['queue_limit']})"
+            break
+        else:
+            lines[i] = f"❌ **{song_info['title']}**: failed to play"
+            cleanup_file(song_info['file_path'])
+        await report()
+    
+    lines.append(f"\nAdded {queued} of {len(queries)} song(s).")
+    await report(final=True)
+
+async def enqueue_or_play(bot, chat_id, song_info):
+    """
+    Add a song to the queue, or play it if nothing is playing.
+    
+    Must run through the chat's playback worker (bot.events).
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID to play in
+        song_info: Song information dictionary
+    
+    Returns:
+        "queued", "full", "played" or "failed"
+    """
+    chat_info = bot.active_chats[chat_id]
+    
+    if chat_info["is_playing"]:
+        if len(chat_info["queue"]) >= get_settings(chat_id)["queue_limit"]:
+            return "full"
+        
+        chat_info["queue"].append(song_info)
+        
+        # Pre-decode while waiting in the queue
+        prefetch_queue(chat_id, chat_info)
+        return "queued"
+    
+    if await play_audio(bot, chat_id, song_info):
+        return "played"
+    return "failed"
+
+async def skip_current(bot, chat_id):
+    """
+    Skip the current song and play the next one.
+    
+    Must run through the chat's playback worker (bot.events).
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID to skip in
+    """
+    if Config.GAPLESS and await skip_gapless(chat_id):
+        # The stream switches to the next track in place, advance_gapless follows
+        return
+    
+    stop_gapless(chat_id)
+    await bot.call_py.leave_group_call(chat_id)
+    await process_next_song(bot, chat_id)
+
+async def recover_stuck(bot, chat_id):
+    """
+    Drop a track that never ended and play the next one.
+    
+    Unlike skip_current, the gapless player is stopped rather than asked to
+    switch, it may be what hangs. Must run through the chat's playback
+    worker (bot.events).
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID to recover
+    """
+    stop_gapless(chat_id)
+    try:
+        await bot.call_py.leave_group_call(chat_id)
+    except Exception as e:
+        # The call itself may be gone, joining again is all it takes
+        logger.debug(f"Could not leave the call in chat {chat_id}: {e}")
+    await process_next_song(bot, chat_id)
+
+async def advance_gapless(bot, chat_id, song):
+    """
+    Update a chat's state after its gapless stream switched to the next track.
+    
+    Must run through the chat's playback worker (bot.events).
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID the switch happened in
+        song: Song information of the track now playing
+    """
+    chat_info = bot.active_chats.get(chat_id)
+    if not chat_info:
+        return
+    
+    if chat_info["queue"] and chat_info["queue"][0] is song:
+        chat_info["queue"].pop(0)
+    
+    previous_song = chat_info["current"]
+    chat_info["current"] = song
+    chat_info["is_playing"] = True
+    next_track_seq(chat_info)
+    mark_started(chat_info)
+    bind_track(song.get('id'))
+    
+    schedule_conversion(song, chat_id)
+    prefetch_queue(chat_id, chat_info)
+    bot.history.push(chat_id, previous_song, in_use=song['file_path'])
+    
+    await bot.bot.send_message(
+        chat_id,
+        get_now_playing_text(song),
+        reply_markup=create_player_keyboard(),
+        disable_web_page_preview=True
+    )
+
+async def play_previous(bot, chat_id):
+    """
+    Replay the track that played before the current one.
+    
+    The current track goes back to the front of the queue. Must run through
+    the chat's playback worker (bot.events).
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID to go back in
+    
+    Returns:
+        True if the previous track is playing, False if there is none
+    """
+    previous = bot.history.pop(chat_id)
+    if not previous:
+        return False
+    
+    chat_info = bot.active_chats[chat_id]
+    current_song = chat_info["current"]
+    
+    # Played before, so normally still on disk
+    cached_path = get_cached_path(song_key(previous)) if previous.get('id') else None
+    if cached_path:
+        previous['file_path'] = cached_path
+    elif not previous.get('file_path') or not os.path.exists(previous['file_path']):
+        downloaded = await fetch_with_retry(previous, chat_id)
+        if not downloaded:
+            await bot.bot.send_message(chat_id, f"❌ Could not play {previous['title']} again")
+            return False
+        previous = downloaded
+    
+    if current_song:
+        chat_info["queue"].insert(0, current_song)
+    
+    try:
+        await bot.call_py.leave_group_call(chat_id)
+    except Exception as e:
+        # The call may already be lost, joining again is all it takes
+        logger.debug(f"Could not leave the call in chat {chat_id}: {e}")
+    if not await play_audio(bot, chat_id, previous):
+        # Keep the entry for another try, and carry on with the queue from the
+        # track we went back from without recording that one as played
+        bot.history.push(chat_id, previous)
+        chat_info["current"] = None
+        await process_next_song(bot, chat_id)
+        return False
+    
+    await bot.bot.send_message(
+        chat_id,
+        get_now_playing_text(previous),
+        reply_markup=create_player_keyboard(),
+        disable_web_page_preview=True
+    )
+    return True
+
+async def resume_at(bot, chat_id, position, leave=True, notify=True):
+    """
+    Play the current track again from a position.
+    
+    The pre-decoded copy is used when there is one, so ffmpeg's input seek
+    jumps straight to the position instead of decoding up to it. A paused
+    track stays paused. Must run through the chat's playback worker
+    (bot.events).
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID to play in
+        position: Position in seconds to play from
+        leave: Whether to leave the call first, False when it was already lost
+        notify: Whether to tell the chat why playing failed
+    
+    Returns:
+        True if the track is playing (or paused) at the position
+    """
+    chat_info = bot.active_chats[chat_id]
+    current = chat_info["current"]
+    paused = bool(chat_info.get("paused_at"))
+    
+    cached_path = get_cached_path(song_key(current)) if current.get('id') else None
+    if cached_path:
+        current = dict(current, file_path=cached_path)
+    elif not current.get('file_path') or not os.path.exists(current['file_path']):
+        downloaded = await fetch_with_retry(current, chat_id)
+        if not downloaded:
+            return False
+        current = downloaded
+    
+    if leave:
+        try:
+            await bot.call_py.leave_group_call(chat_id)
+        except Exception as e:
+            # Not in the call anymore, joining again is all it takes
+            logger.debug(f"Could not leave the call in chat {chat_id}: {e}")
+    if not await play_audio(bot, chat_id, current, position, notify):
+        return False
+    
+    if paused:
+        await bot.call_py.pause_stream(chat_id)
+        mark_paused(chat_info)
+    return True
+
+async def seek_current(bot, chat_id, position):
+    """
+    Jump to a position of the current track.
+    
+    Must run through the chat's playback worker (bot.events).
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID to seek in
+        position: Position in seconds
+    
+    Returns:
+        True if playing from the position, False if the track could not be restarted
+    """
+    if await resume_at(bot, chat_id, position):
+        return True
+    
+    # Left the call for nothing, carry on with the queue
+    await process_next_song(bot, chat_id)
+    return False
+
+async def rejoin_call(bot, chat_id):
+    """
+    Rejoin a call that was lost while playing, at the last position.
+    
+    Retries with backoff; gives up if the chat moved on in the meantime.
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID whose call was lost
+    """
+    chat_info = bot.active_chats.get(chat_id)
+    if not chat_info or not chat_info.get("is_playing") or not chat_info.get("current"):
+        # We left on purpose: stopped or the queue ended
+        return
+    
+    track_seq = chat_info.get("track_seq")
+    
+    async def rejoin(attempt):
+        # A seek, skip or stop since the call was lost already took care of it
+        if chat_info.get("track_seq") != track_seq or not chat_info.get("is_playing"):
+            return True
+        position = get_position(chat_info)
+        logger.warning(f"Lost the call in chat {chat_id}, rejoining at {position:.0f}s (attempt {attempt + 1})")
+        # A single message when giving up rather than one per attempt
+        return await resume_at(bot, chat_id, position, leave=False, notify=False)
+    
+    async def give_up():
+        if chat_info.get("track_seq") != track_seq or not chat_info.get("is_playing"):
+            return
+        logger.error(f"Could not rejoin the call in chat {chat_id}")
+        chat_info["is_playing"] = False
+        next_track_seq(chat_info)
+        stop_gapless(chat_id)
+        await bot.bot.send_message(
+            chat_id,
+            f"❌ Lost the voice chat and could not rejoin. Use `{Config.PREFIX}resume` to try again."
+        )
+    
+    for attempt in range(Config.TRACK_RETRIES + 1):
+        await asyncio.sleep(Config.RETRY_BACKOFF * 2 ** attempt)
+        try:
+            if await bot.events.submit(chat_id, lambda: rejoin(attempt)):
+                return
+        except Exception as e:
+            logger.warning(f"Rejoin attempt {attempt + 1} failed in chat {chat_id}: {e}")
+    
+    await bot.events.submit(chat_id, give_up)
+
+async def stop_playback(bot, chat_id):
+    """
+    Stop playing, clear the queue and remove the downloaded files.
+    
+    Must run through the chat's playback worker (bot.events).
+    
+    Args:
+        bot: The MusicBot instance
+        chat_id: Chat ID to stop in
+    """
+    chat_info = bot.active_chats[chat_id]
+    current_song = chat_info["current"]
+    queued_songs = chat_info["queue"]
+    
+    # Clear queue
+    chat_info["queue"] = []
+    chat_info["current"] = None
+    chat_info["is_playing"] = False
+    next_track_seq(chat_info)
+    
+    # Stop playing
+    stop_gapless(chat_id)
+    await bot.call_py.leave_group_call(chat_id)
+    
+    # Forget the history and clean up its files
+    bot.history.clear(chat_id)
+    
+    # Clean up current song file
+    if current_song and current_song.get("file_path"):
+        cleanup_file(current_song["file_path"])
+    
+    # Clean up queued song files
+    for song in queued_songs:
+        if song.get("file_path"):
+            cleanup_file(song["file_path"])
+
 def register_command_handlers(bot):
     """Register command handlers to the Pyrogram client"""
     
@@ -255,12 +903,13 @@ def register_command_handlers(bot):
     @bot.call_py.on_stream_end()
     async def on_stream_end(_, update):
         chat_id = update.chat_id
-        await process_next_song(bot, chat_id)
-
-    @bot.call_py.on_stream_end()
-    async def on_stream_end(_, update):
-        chat_id = update.chat_id
-        await process_next_song(bot, chat_id)
+        bot.events.end_track(chat_id, lambda: process_next_song(bot, chat_id))
+    
+    # Call dropped under us: rejoin at the last position instead of from the start
+    if hasattr(bot.call_py, "on_left"):
+        @bot.call_py.on_left()
+        async def on_left(_, chat_id):
+            asyncio.create_task(rejoin_call(bot, chat_id))
     
     @bot.bot.on_message(filters.command("start", prefixes=Config.PREFIX) & filters.group)
     async def start_command(_, message: Message):
@@ -276,13 +925,16 @@ def register_command_handlers(bot):
         help_text = (
             "📋 **Available Commands:**\n\n"
             f"`{Config.PREFIX}play [song name/YouTube URL]` - Play a song in voice chat\n"
+            f"`{Config.PREFIX}play song one; song two` - Queue several songs at once (or one per line)\n"
             f"`{Config.PREFIX}pause` - Pause the current song\n"
             f"`{Config.PREFIX}resume` - Resume the paused song\n"
+            f"`{Config.PREFIX}seek [mm:ss]` - Jump to a position in the song (or `+30`/`-10` seconds)\n"
             f"`{Config.PREFIX}skip` - Skip to the next song\n"
             f"`{Config.PREFIX}stop` - Stop playing and clear queue\n"
             f"`{Config.PREFIX}queue` - Show the current song queue\n"
             f"`{Config.PREFIX}now` - Show currently playing song\n"
             f"`{Config.PREFIX}help` - Show this help message\n"
+            "\nType my username followed by a song name to pick from several search results.\n"
         )
         
         # Add info about assistant
@@ -326,13 +978,28 @@ def register_command_handlers(bot):
         
         # Get query
         query = message.text.split(None, 1)[1]
+        queries = split_queries(query)
         
         # Send processing message
         status_message = await message.reply_text("🔍 Searching...")
         
+        if len(queries) > 1:
+            try:
+                limit = get_settings(chat_id)["queue_limit"]
+                chat_info = bot.active_chats[chat_id]
+                # Songs already waiting count against the limit, an idle chat plays the first one
+                room = max(0, limit - len(chat_info["queue"])) + (0 if chat_info["is_playing"] else 1)
+                if not room:
+                    await status_message.edit(f"❌ Maximum queue size ({limit}) reached.")
+                    return
+                await play_batch(bot, chat_id, queries[:room], status_message, max(0, len(queries) - room))
+            except Exception as e:
+                logger.error(f"Error in batch play command: {e}", exc_info=True)
+                await status_message.edit(f"❌ Error: {str(e)}")
+            return
+        
         try:
-            # Download and extract info
-            song_info = await download_audio(query)
+            song_info = await resolve_song(bot, chat_id, query)
             
             if not song_info:
                 await status_message.edit(
@@ -340,47 +1007,41 @@ def register_command_handlers(bot):
                 )
                 return
             
-            # Check if currently playing
-            if bot.active_chats[chat_id]["is_playing"]:
-                # Add to queue
-                if len(bot.active_chats[chat_id]["queue"]) >= Config.MAX_PLAYLIST_SIZE:
-                    await status_message.edit(
-                        f"❌ Maximum queue size ({Config.MAX_PLAYLIST_SIZE}) reached."
-                    )
-                    # Clean up downloaded file if not used
-                    cleanup_file(song_info['file_path'])
-                    return
-                
-                # Add to queue
-                bot.active_chats[chat_id]["queue"].append(song_info)
-                
+            if not bot.active_chats[chat_id]["is_playing"]:
+                await status_message.edit(
+                    f"🔄 Processing **{song_info['title']}**..."
+                )
+            
+            # Queue or play through the chat's playback worker
+            result = await bot.events.submit(chat_id, lambda: enqueue_or_play(bot, chat_id, song_info))
+            
+            if result == "queued":
                 # Update status message
                 queue_position = len(bot.active_chats[chat_id]["queue"])
                 await status_message.edit(
                     f"✅ **{song_info['title']}** added to queue at position {queue_position}."
                 )
+            elif result == "full":
+                await status_message.edit(
+                    f"❌ Maximum queue size ({get_settings(chat_id)['queue_limit']}) reached."
+                )
+                # Clean up downloaded file if not used
+                cleanup_file(song_info['file_path'])
+            elif result == "played":
+                # Update status message
+                await status_message.edit(
+                    get_now_playing_text(song_info),
+                    reply_markup=create_player_keyboard(),
+                    disable_web_page_preview=True
+                )
             else:
-                # Play immediately
                 await status_message.edit(
-                    f"🔄 Processing **{song_info['title']}**..."
+                    "❌ Failed to play the song."
                 )
-                
-                # Play the song
-                success = await play_audio(bot, chat_id, song_info)
-                
-                if success:
-                    # Update status message
-                    await status_message.edit(
-                        get_now_playing_text(song_info),
-                        reply_markup=create_player_keyboard(),
-                        disable_web_page_preview=True
-                    )
-                else:
-                    await status_message.edit(
-                        "❌ Failed to play the song."
-                    )
-                    # Clean up downloaded file
-                    cleanup_file(song_info['file_path'])
+                # Clean up downloaded file
+                cleanup_file(song_info['file_path'])
+        except TrackRejected as e:
+            await status_message.edit(f"❌ {e}")
         except Exception as e:
             logger.error(f"Error in play command: {e}", exc_info=True)
             await status_message.edit(
@@ -398,6 +1059,7 @@ def register_command_handlers(bot):
         
         try:
             await bot.call_py.pause_stream(chat_id)
+            mark_paused(bot.active_chats[chat_id])
             await message.reply_text("⏸ Paused the current song.")
         except Exception as e:
             logger.error(f"Error pausing stream: {e}", exc_info=True)
@@ -407,16 +1069,85 @@ def register_command_handlers(bot):
     async def resume_command(_, message: Message):
         """Handler for the resume command"""
         chat_id = message.chat.id
+        chat_info = bot.active_chats.get(chat_id)
         
-        if chat_id not in bot.active_chats or not bot.active_chats[chat_id]["is_playing"]:
+        if not chat_info or not chat_info["current"]:
             await message.reply_text("❌ Nothing is paused to resume.")
             return
         
+        if chat_info["is_playing"]:
+            try:
+                await bot.call_py.resume_stream(chat_id)
+                mark_resumed(chat_info)
+                await message.reply_text("▶️ Resumed the current song.")
+                return
+            except Exception as e:
+                # Most likely the call was lost, rejoin below
+                logger.warning(f"Error resuming stream in chat {chat_id}: {e}")
+        
+        async def rejoin():
+            # Rejoin where the track was instead of replaying it from the start
+            chat_info = bot.active_chats.get(chat_id)
+            if not chat_info or not chat_info["current"]:
+                # Stopped while the command waited for the worker
+                return None, False
+            mark_resumed(chat_info)
+            position = get_position(chat_info)
+            return position, await resume_at(bot, chat_id, position, leave=False)
+        
         try:
-            await bot.call_py.resume_stream(chat_id)
-            await message.reply_text("▶️ Resumed the current song.")
+            result = await bot.events.submit(chat_id, rejoin)
+            if result is None:
+                # The worker logged the error and resolves failed actions to None
+                await message.reply_text(f"❌ Could not rejoin the voice chat. Use `{Config.PREFIX}resume` to try again.")
+                return
+            position, rejoined = result
+            if position is None:
+                await message.reply_text("❌ Nothing is paused to resume.")
+            elif rejoined:
+                await message.reply_text(f"▶️ Rejoined at {format_duration(int(position))}.")
+            else:
+                await message.reply_text(f"❌ Could not rejoin the voice chat. Use `{Config.PREFIX}resume` to try again.")
         except Exception as e:
-            logger.error(f"Error resuming stream: {e}", exc_info=True)
+            logger.error(f"Error rejoining in chat {chat_id}: {e}", exc_info=True)
+            await message.reply_text(f"❌ Error: {str(e)}")
+    
+    @bot.bot.on_message(filters.command("seek", prefixes=Config.PREFIX) & filters.group)
+    async def seek_command(_, message: Message):
+        """Handler for the seek command: !seek mm:ss, or !seek +30 / -10 to jump relative"""
+        chat_id = message.chat.id
+        chat_info = bot.active_chats.get(chat_id)
+        
+        if not chat_info or not chat_info["is_playing"] or not chat_info["current"]:
+            await message.reply_text("❌ Nothing is playing to seek in.")
+            return
+        
+        text = message.command[1] if len(message.command) > 1 else ""
+        relative = text[:1] in ("+", "-")
+        position = parse_timestamp(text[1:] if relative else text)
+        if position is None:
+            await message.reply_text(
+                f"❌ Please give a position.\n"
+                f"Example: `{Config.PREFIX}seek 1:30`, `{Config.PREFIX}seek +30` or `{Config.PREFIX}seek -10`"
+            )
+            return
+        if relative:
+            position = get_position(chat_info) + (position if text[0] == "+" else -position)
+        position = max(0, position)
+        
+        current = chat_info["current"]
+        if current.get('duration') and position >= current['duration']:
+            await message.reply_text(f"❌ The song is only {format_duration(current['duration'])} long.")
+            return
+        if is_growing(current['file_path']):
+            await message.reply_text("⏳ The song is still downloading, try again in a moment.")
+            return
+        
+        try:
+            if await bot.events.submit(chat_id, lambda: seek_current(bot, chat_id, position)):
+                await message.reply_text(f"⏩ Jumped to {format_duration(int(position))}.")
+        except Exception as e:
+            logger.error(f"Error seeking in chat {chat_id}: {e}", exc_info=True)
             await message.reply_text(f"❌ Error: {str(e)}")
     
     @bot.bot.on_message(filters.command("skip", prefixes=Config.PREFIX) & filters.group)
@@ -428,14 +1159,11 @@ def register_command_handlers(bot):
             await message.reply_text("❌ Nothing is playing to skip.")
             return
         
-        # Skip logic - stop current stream, which will trigger stream end handler
+        # Skip through the playback worker so it cannot race with a stream end
         try:
-            await bot.call_py.leave_group_call(chat_id)
+            bot.events.end_track(chat_id, lambda: skip_current(bot, chat_id))
             await message.reply_text("⏭ Skipped the current song.")
             
-            # Process next song
-            await process_next_song(bot, chat_id)
-            
         except Exception as e:
             logger.error(f"Error skipping song: {e}", exc_info=True)
             await message.reply_text(f"❌ Error: {str(e)}")
@@ -450,25 +1178,7 @@ def register_command_handlers(bot):
             return
         
         try:
-            # Clear queue
-            current_song = bot.active_chats[chat_id]["current"]
-            bot.active_chats[chat_id] = {
-                "queue": [],
-                "current": None,
-                "is_playing": False
-            }
-            
-            # Stop playing
-            await bot.call_py.leave_group_call(chat_id)
-            
-            # Clean up current song file
-            if current_song and current_song.get("file_path"):
-                cleanup_file(current_song["file_path"])
-            
-            # Clean up queued song files
-            for song in bot.active_chats[chat_id]["queue"]:
-                if song.get("file_path"):
-                    cleanup_file(song["file_path"])
+            await bot.events.submit(chat_id, lambda: stop_playback(bot, chat_id))
             
             await message.reply_text("⏹ Stopped playing and cleared the queue.")
             
@@ -503,7 +1213,7 @@ def register_command_handlers(bot):
             return
         
         current_song = bot.active_chats[chat_id]["current"]
-        now_playing = get_now_playing_text(current_song)
+        now_playing = get_now_playing_text(current_song, get_position(bot.active_chats[chat_id]))
         
         await message.reply_text(
             now_playing,
@@ -0,0 +1,73 @@
+import logging
+import asyncio
+from pyrogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+
+from config import Config
+# Use absolute imports for better compatibility with Heroku
+from utils.helpers import format_duration
+
+logger = logging.getLogger(__name__)
+
+# Queries shorter than this are not searched
+MIN_QUERY_LENGTH = 3
+
+# Seconds Telegram may cache the answer to a query, for all users
+ANSWER_CACHE_TIME = 300
+
+def register_inline_handlers(bot):
+    """Register inline query handlers to the Pyrogram client"""
+
+    search_cache = bot.search_cache
+    # {user ID: latest inline query ID}, to drop queries superseded while typing
+    latest_queries = {}
+
+    @bot.bot.on_inline_query()
+    async def handle_inline_query(_, inline_query: InlineQuery):
+        """Handler for inline search: @bot <song name>"""
+        query = inline_query.query.strip()
+        if len(query) < MIN_QUERY_LENGTH:
+            await inline_query.answer(
+                [],
+                cache_time=ANSWER_CACHE_TIME,
+                switch_pm_text="Type a song name to search",
+                switch_pm_parameter="help"
+            )
+            return
+
+        user_id = inline_query.from_user.id
+        results = search_cache.get(query)
+
+        if results is None:
+            # Wait for the user to stop typing before searching
+            latest_queries[user_id] = inline_query.id
+            await asyncio.sleep(Config.INLINE_DEBOUNCE)
+            if latest_queries.get(user_id) != inline_query.id:
+                return
+            latest_queries.pop(user_id, None)
+            results = await search_cache.search(query)
+
+        if bot.warmer:
+            # Searches hint at what will be played next
+            bot.warmer.record_search(results)
+
+        try:
+            await inline_query.answer(
+                [
+                    InlineQueryResultArticle(
+                        title=song['title'],
+                        description=f"{song['uploader']} • {format_duration(song['duration'])}",
+                        thumb_url=song['thumbnail'],
+                        id=song['id'],
+                        # Picking a result plays that exact video, no second search
+                        input_message_content=InputTextMessageContent(
+                            f"{Config.PREFIX}play {song['webpage_url']}",
+                            disable_web_page_preview=True
+                        )
+                    )
+                    for song in results
+                ],
+                cache_time=ANSWER_CACHE_TIME
+            )
+        except Exception as e:
+            # Expired queries can't be answered anymore
+            logger.debug(f"Could not answer inline query {query!r}: {e}")
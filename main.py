@@ -2,13 +2,9 @@ import os
 import asyncio
 import logging
 from bot import MusicBot
+from utils.event_loop import install_event_loop_policy
+from utils.logging_setup import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 async def main():
@@ -23,10 +19,10 @@ async def main():
         except Exception as e:
             if "FLOOD_WAIT" in str(e):
                 wait_time = int(str(e).split()[8])  # Extract wait time from error
-                logging.warning(f"Hit rate limit, waiting {wait_time} seconds")
+                logger.warning(f"Hit rate limit, waiting {wait_time} seconds")
                 await asyncio.sleep(wait_time)
             else:
-                logging.error(f"Error occurred: {e}")
+                logger.error(f"Error occurred: {e}")
                 if attempt < max_retries - 1:
                     await asyncio.sleep(retry_delay)
                     retry_delay *= 2  # Exponential backoff
@@ -34,4 +30,7 @@ async def main():
                     raise
 
 if __name__ == "__main__":
+    setup_logging()
+    loop_name = install_event_loop_policy()
+    logger.info(f"Using {loop_name} event loop")
     asyncio.run(main())
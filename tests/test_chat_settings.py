@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from utils.chat_settings import ChatSettings, parse_setting, tiers_at_least, meets_tier, default_settings
+
+
+def test_parse_setting_accepts_tiers_and_ranges():
+    assert parse_setting("tier", "Premium") == "premium"
+    assert parse_setting("queue_limit", "25") == 25
+
+
+@pytest.mark.parametrize("key, value", [
+    ("tier", "ultra"),
+    ("queue_limit", "0"),
+    ("queue_limit", "many"),
+    ("volume", "5"),
+])
+def test_parse_setting_rejects_invalid(key, value):
+    with pytest.raises(ValueError):
+        parse_setting(key, value)
+
+
+def test_get_without_overrides_returns_defaults(tmp_path):
+    settings = ChatSettings(str(tmp_path / "settings.json"))
+    assert settings.get(1) == default_settings()
+    assert settings.get(None) == default_settings()
+
+
+def test_set_overrides_and_writes_through(tmp_path):
+    path = tmp_path / "settings.json"
+    settings = ChatSettings(str(path))
+    settings.set(1, "tier", "high")
+
+    assert settings.get(1)["tier"] == "high"
+    assert settings.get(2)["tier"] == default_settings()["tier"]
+    assert json.loads(path.read_text()) == {"1": {"tier": "high"}}
+
+    reloaded = ChatSettings(str(path))
+    reloaded.load()
+    assert reloaded.get(1)["tier"] == "high"
+
+
+def test_set_invalidates_resolved_settings(tmp_path):
+    settings = ChatSettings(str(tmp_path / "settings.json"))
+    settings.set(1, "queue_limit", "5")
+    assert settings.get(1)["queue_limit"] == 5
+    settings.set(1, "queue_limit", "7")
+    assert settings.get(1)["queue_limit"] == 7
+
+
+def test_reset_one_and_all(tmp_path):
+    settings = ChatSettings(str(tmp_path / "settings.json"))
+    settings.set(1, "tier", "low")
+    settings.set(1, "queue_limit", "5")
+
+    settings.reset(1, "tier")
+    assert settings.overrides == {1: {"queue_limit": 5}}
+    assert settings.get(1)["tier"] == default_settings()["tier"]
+
+    settings.reset(1)
+    assert settings.overrides == {}
+    assert settings.get(1) == default_settings()
+
+
+def test_load_skips_invalid_values(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"1": {"tier": "ultra", "queue_limit": 3}, "2": {"tier": "ultra"}}))
+    settings = ChatSettings(str(path))
+    settings.load()
+    assert settings.overrides == {1: {"queue_limit": 3}}
+
+
+def test_stale_write_does_not_overwrite_newer(tmp_path):
+    path = tmp_path / "settings.json"
+    settings = ChatSettings(str(path))
+    settings._write('{"new": {}}', 2)
+    settings._write('{"old": {}}', 1)
+    assert json.loads(path.read_text()) == {"new": {}}
+
+
+def test_tiers_at_least():
+    assert tiers_at_least("low") == ["low", "standard", "high", "premium"]
+    assert tiers_at_least("premium") == ["premium"]
+    assert tiers_at_least(None) == ["standard", "high", "premium"]
+
+
+@pytest.mark.parametrize("have, want, ok", [
+    ("premium", "low", True),
+    ("standard", "standard", True),
+    ("low", "premium", False),
+    ("standard", "high", False),
+    (None, "standard", True),
+    (None, "high", False),
+])
+def test_meets_tier(have, want, ok):
+    assert meets_tier(have, want) is ok
@@ -0,0 +1,73 @@
+import time
+
+from utils.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+def open_breaker(reset_timeout=60):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+def expire(breaker):
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+def test_half_open_allows_a_single_trial():
+    breaker = open_breaker()
+    expire(breaker)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+def test_trial_success_closes():
+    breaker = open_breaker()
+    expire(breaker)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+def test_trial_failure_reopens():
+    breaker = open_breaker()
+    expire(breaker)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+def test_cancelled_trial_lets_the_next_call_probe():
+    breaker = open_breaker()
+    expire(breaker)
+    assert breaker.allow()
+    breaker.cancel_trial()
+    assert breaker.allow()
+
+def test_cancel_outside_half_open_changes_nothing():
+    breaker = open_breaker()
+    breaker.cancel_trial()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+def test_retry_in_counts_down_while_open():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    assert breaker.retry_in == 0
+    breaker.record_failure()
+    breaker.record_failure()
+    assert 59 < breaker.retry_in <= 60
+    expire(breaker)
+    assert breaker.retry_in == 0
@@ -0,0 +1,29 @@
+import pytest
+
+# The keyboard helpers live in the same module
+pytest.importorskip("pyrogram")
+
+from utils.helpers import parse_timestamp, format_duration
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("45", 45),
+    ("0", 0),
+    ("1:30", 90),
+    ("01:05", 65),
+    ("90:00", 5400),
+    ("1:02:03", 3723),
+    (" 2:00 ", 120),
+])
+def test_parse_timestamp(text, seconds):
+    assert parse_timestamp(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["", "abc", "1:", ":30", "1:2:3:4", "-5", "1.5", "1:3o"])
+def test_parse_timestamp_rejects(text):
+    assert parse_timestamp(text) is None
+
+
+def test_format_duration():
+    assert format_duration(0) == "00:00"
+    assert format_duration(125) == "02:05"
@@ -0,0 +1,97 @@
+import sys
+import types
+
+import pytest
+
+from utils import history
+from utils.history import PlayHistory, pin_file, unpin_file, is_pinned
+
+
+@pytest.fixture
+def removed(monkeypatch):
+    """Paths passed to cleanup_file, which honours the pins like the real one."""
+    paths = []
+    youtube = types.ModuleType("utils.youtube")
+    youtube.cleanup_file = lambda file_path: is_pinned(file_path) or paths.append(file_path)
+    monkeypatch.setitem(sys.modules, "utils.youtube", youtube)
+    monkeypatch.setattr(history, "_pins", {})
+    return paths
+
+
+def song(n):
+    return {"id": f"id{n}", "title": f"Song {n}", "file_path": f"/downloads/{n}.mp3", "extra": n}
+
+
+def test_push_keeps_history_fields_and_pins(removed):
+    played = PlayHistory(2)
+    played.push(1, song(1))
+
+    assert played.songs(1) == [{"id": "id1", "title": "Song 1", "file_path": "/downloads/1.mp3"}]
+    assert is_pinned("/downloads/1.mp3")
+    assert removed == []
+
+
+def test_push_evicts_oldest(removed):
+    played = PlayHistory(2)
+    for n in range(3):
+        played.push(1, song(n))
+
+    assert [entry["id"] for entry in played.songs(1)] == ["id1", "id2"]
+    assert not is_pinned("/downloads/0.mp3")
+    assert removed == ["/downloads/0.mp3"]
+
+
+def test_evicted_file_in_use_is_kept(removed):
+    played = PlayHistory(1)
+    played.push(1, song(1))
+    played.push(1, song(2), in_use="/downloads/1.mp3")
+
+    assert removed == []
+
+
+def test_disabled_history_removes_played_file(removed):
+    played = PlayHistory(0)
+    played.push(1, song(1))
+    played.push(1, song(2), in_use="/downloads/2.mp3")
+
+    assert played.songs(1) == []
+    assert removed == ["/downloads/1.mp3"]
+
+
+def test_disabled_history_keeps_pinned_file(removed):
+    pin_file("/downloads/1.mp3")
+    PlayHistory(0).push(1, song(1))
+
+    assert removed == []
+    assert is_pinned("/downloads/1.mp3")
+
+
+def test_pop_unpins_without_removing(removed):
+    played = PlayHistory(2)
+    played.push(1, song(1))
+    played.push(1, song(2))
+
+    assert played.pop(1)["id"] == "id2"
+    assert not is_pinned("/downloads/2.mp3")
+    assert removed == []
+    assert played.pop(2) is None
+
+
+def test_shared_file_stays_pinned_until_last_release(removed):
+    played = PlayHistory(2)
+    played.push(1, song(1))
+    played.push(2, song(1))
+
+    played.clear(1)
+    assert is_pinned("/downloads/1.mp3")
+    assert removed == []
+
+    played.clear(2)
+    assert removed == ["/downloads/1.mp3"]
+
+
+def test_unpin_reports_last_pin():
+    pin_file("/downloads/x.mp3")
+    pin_file("/downloads/x.mp3")
+    assert not unpin_file("/downloads/x.mp3")
+    assert unpin_file("/downloads/x.mp3")
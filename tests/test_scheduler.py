@@ -0,0 +1,100 @@
+import asyncio
+
+from utils.scheduler import ResourcePool, PRIORITY_NEXT_UP, PRIORITY_USER, PRIORITY_PREFETCH
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def run_jobs(pool, jobs):
+    """Queue jobs behind a held slot and return the order they were admitted in."""
+    order = []
+
+    async def job(name, priority, chat_id):
+        async with pool.slot(priority, chat_id):
+            order.append(name)
+
+    async def main():
+        await pool.acquire()
+        tasks = []
+        for name, priority, chat_id in jobs:
+            tasks.append(asyncio.create_task(job(name, priority, chat_id)))
+            await settle()
+        pool.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    return order
+
+
+def test_acquire_within_limit_does_not_wait():
+    async def main():
+        pool = ResourcePool("test", 2)
+        await pool.acquire()
+        await pool.acquire()
+        assert pool.stats() == {"active": 2, "waiting": 0, "limit": 2}
+        pool.release()
+        pool.release()
+        assert pool.active == 0
+
+    asyncio.run(main())
+
+
+def test_limit_is_at_least_one():
+    assert ResourcePool("test", 0).limit == 1
+
+
+def test_higher_priority_is_served_first():
+    order = run_jobs(ResourcePool("test", 1), [
+        ("prefetch", PRIORITY_PREFETCH, 1),
+        ("user", PRIORITY_USER, 1),
+        ("next up", PRIORITY_NEXT_UP, 2),
+    ])
+    assert order == ["next up", "user", "prefetch"]
+
+
+def test_chats_are_served_round_robin():
+    order = run_jobs(ResourcePool("test", 1), [
+        ("a1", PRIORITY_USER, "a"),
+        ("a2", PRIORITY_USER, "a"),
+        ("a3", PRIORITY_USER, "a"),
+        ("b1", PRIORITY_USER, "b"),
+    ])
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def main():
+        pool = ResourcePool("test", 1)
+        await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await settle()
+        assert pool.waiting == 1
+
+        waiter.cancel()
+        await settle()
+        assert pool.waiting == 0
+
+        pool.release()
+        assert pool.active == 0
+
+    asyncio.run(main())
+
+
+def test_slot_granted_while_cancelled_is_released():
+    async def main():
+        pool = ResourcePool("test", 1)
+        await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await settle()
+
+        # Hand the slot over and cancel before the waiter runs
+        pool.release()
+        waiter.cancel()
+        await settle()
+        assert waiter.cancelled()
+        assert pool.active == 0
+
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+import json
+import random
+import time
+
+import pytest
+
+from utils.track_index import TrackIndex, normalize, word_coverage, edit_distance
+
+
+def song(track_id, title):
+    return {
+        "id": track_id,
+        "title": title,
+        "uploader": "Someone",
+        "duration": 200,
+        "webpage_url": f"https://www.youtube.com/watch?v={track_id}",
+        "file_path": f"/downloads/{track_id}_standard.mp3",
+        "tier": "standard",
+        "stream_url": "https://example.invalid/stream",
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TrackIndex(str(tmp_path / "history.json"), max_tracks=10)
+    index.record("believer", song("believer000", "Believer"))
+    index.record("shape of you ed sheeran", song("shapeofyou0", "Shape of You"))
+    return index
+
+
+def test_normalize():
+    assert normalize("  Beyoncé -- HALO!! ") == "beyonce halo"
+
+
+def test_exact_query_and_title(index):
+    assert index.lookup("Believer")["id"] == "believer000"
+    assert index.lookup("shape of you")["id"] == "shapeofyou0"
+
+
+def test_misspelled_query(index):
+    assert index.lookup("belever")["id"] == "believer000"
+    assert index.lookup("shpe of you")["id"] == "shapeofyou0"
+
+
+def test_extra_query_word_is_not_a_match(index):
+    assert index.lookup("believer live") is None
+    assert index.lookup("shape of you acoustic") is None
+
+
+def test_single_word_of_longer_title_is_not_a_match(index):
+    assert index.lookup("shape") is None
+
+
+def test_lookup_returns_stored_fields_only(index):
+    known = index.lookup("believer")
+    assert "stream_url" not in known
+    assert known["tier"] == "standard"
+
+
+def test_ambiguous_match_falls_back(tmp_path):
+    index = TrackIndex(str(tmp_path / "history.json"), max_tracks=10)
+    index.record("halo", song("halo0000001", "Halo"))
+    index.record("hallo", song("hallo000001", "Hallo"))
+    assert index.lookup("halo")["id"] == "halo0000001"
+    assert index.lookup("hal0") is None
+
+
+def test_eviction_and_persistence(tmp_path):
+    path = tmp_path / "history.json"
+    index = TrackIndex(str(path), max_tracks=1)
+    index.record("first song", song("first000001", "First"))
+    index.record("second song", song("second00001", "Second"))
+
+    assert list(index.tracks) == ["second00001"]
+    assert index.lookup("first song") is None
+    assert list(json.loads(path.read_text())) == ["second00001"]
+    assert TrackIndex(str(path), max_tracks=1).lookup("second song")["id"] == "second00001"
+
+
+def test_word_coverage():
+    assert word_coverage("believer", "believer") == 1
+    assert word_coverage("believer live", "believer") == 0.5
+    assert word_coverage("belever", "believer") == 1
+    assert word_coverage("yuo", "shape of you") == 1
+
+
+def test_edit_distance():
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("yuo", "you") == 1
+    assert edit_distance("", "abc") == 3
+
+
+def test_lookup_stays_fast_with_hundreds_of_tracks(tmp_path):
+    rng = random.Random(1)
+    words = ["love", "night", "heart", "dance", "fire", "dream", "light", "baby", "world", "time",
+             "summer", "rain", "blue", "gold", "crazy", "wild", "star", "home", "sky", "forever"]
+    index = TrackIndex(str(tmp_path / "history.json"), max_tracks=1000)
+    queries = []
+    for n in range(300):
+        artist = " ".join(rng.choice(words) for _ in range(2))
+        name = " ".join(rng.choice(words) for _ in range(rng.randint(2, 5)))
+        index.record(f"{name} {artist}", song(f"track{n:06d}", f"{artist.title()} - {name.title()} (Official Video)"))
+        # Misspelled, with a word the track does not have: the slow path for every candidate
+        queries.append(f"{name.replace('e', 'a', 1)} live")
+
+    start = time.perf_counter()
+    for query in queries[:50]:
+        index.lookup(query)
+    per_lookup = (time.perf_counter() - start) / 50
+
+    # Well under a millisecond on a desktop, the margin absorbs slow CI machines
+    assert per_lookup < 0.01
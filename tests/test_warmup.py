@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+# The warmer downloads through the extractor
+pytest.importorskip("yt_dlp")
+
+from utils import warmup
+from utils.warmup import PopularityTracker, CacheWarmer, video_id_from_url
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(warmup.time, "monotonic", clock)
+    return clock
+
+
+def song(video_id, **extra):
+    return dict({
+        "id": video_id,
+        "title": f"Song {video_id}",
+        "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+        "file_path": f"/downloads/{video_id}_standard.mp3",
+        "tier": "standard",
+    }, **extra)
+
+
+def test_video_id_from_url():
+    assert video_id_from_url("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=1") == "dQw4w9WgXcQ"
+    assert video_id_from_url("https://youtu.be/dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+    assert video_id_from_url("never gonna give you up") is None
+
+
+def test_record_ignores_songs_without_url(clock):
+    tracker = PopularityTracker([3600])
+    tracker.record({"id": "local", "title": "Local file"})
+    assert tracker.top(5, 0) == []
+
+
+def test_record_keeps_metadata_without_file_or_tier(clock):
+    tracker = PopularityTracker([3600])
+    tracker.record(song("aaaaaaaaaaa"))
+    assert "file_path" not in tracker.songs["aaaaaaaaaaa"]
+    assert "tier" not in tracker.songs["aaaaaaaaaaa"]
+
+
+def test_score_averages_rates_over_windows(clock):
+    tracker = PopularityTracker([600, 3600])
+    tracker.record(song("aaaaaaaaaaa"))
+    # 1 request in 10 minutes is 6/h, in an hour 1/h
+    assert tracker.score("aaaaaaaaaaa") == pytest.approx((6 + 1) / 2)
+
+    clock.now += 1200
+    assert tracker.score("aaaaaaaaaaa") == pytest.approx(1 / 2)
+
+
+def test_top_ranks_recent_waves_first(clock):
+    tracker = PopularityTracker([600, 3600])
+    for _ in range(3):
+        tracker.record(song("steady00000"))
+    clock.now += 1800
+    for _ in range(2):
+        tracker.record(song("wave0000000"))
+
+    assert [video_id for video_id, _ in tracker.top(5, 1)] == ["wave0000000", "steady00000"]
+
+
+def test_top_needs_min_weighted_requests(clock):
+    tracker = PopularityTracker([3600])
+    tracker.record(song("once0000000"), 0.5)
+    tracker.record(song("searched000"), 0.5)
+    tracker.record(song("searched000"), 0.5)
+    tracker.record(song("twice000000"))
+    tracker.record(song("twice000000"))
+
+    assert {video_id for video_id, _ in tracker.top(5, 1.0)} == {"searched000", "twice000000"}
+    assert [video_id for video_id, _ in tracker.top(1, 1.0)] == ["twice000000"]
+
+
+def test_top_forgets_expired_requests(clock):
+    tracker = PopularityTracker([600, 3600])
+    tracker.record(song("aaaaaaaaaaa"))
+    clock.now += 3601
+
+    assert tracker.top(5, 0) == []
+    assert "aaaaaaaaaaa" not in tracker.songs
+
+
+def test_warmer_counts_hits_by_where_the_file_came_from(clock):
+    warmer = CacheWarmer(SimpleNamespace(active_chats={}))
+    warmer.warm["warm0000000"] = song("warm0000000")
+
+    warmer.record(song("fetched0000", fetched=True), cold=True)
+    warmer.record(song("warm0000000"), cold=False)
+    warmer.record(song("ondisk00000"), cold=False)
+
+    report = warmer.report()
+    assert (report["requests"], report["cold"], report["warm_hits"]) == (3, 1, 1)
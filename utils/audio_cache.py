@@ -0,0 +1,184 @@
+import os
+import logging
+import asyncio
+from typing import Optional, Dict, Any
+
+from config import Config
+from utils.scheduler import transcode, PRIORITY_PREFETCH
+from utils.history import is_pinned
+
+logger = logging.getLogger(__name__)
+
+# Raw format consumed by PyTgCalls: signed 16-bit little-endian PCM, 48 kHz, stereo
+RAW_FORMAT = "s16le"
+RAW_SAMPLE_RATE = 48000
+RAW_CHANNELS = 2
+RAW_BYTES_PER_SECOND = RAW_SAMPLE_RATE * RAW_CHANNELS * 2
+RAW_EXTENSION = ".raw"
+
+# Conversions currently running, keyed by cache path
+_pending: Dict[str, asyncio.Task] = {}
+
+def track_key(track_id: str, tier: Optional[str] = None) -> str:
+    """
+    Key of a track's files: the video id and the quality tier it was fetched at.
+
+    The tier keeps a low tier download from being played to a premium chat,
+    and downloads of one video at two tiers from writing the same file.
+    Library tracks have no tier.
+    """
+    return f"{track_id}_{tier}" if tier else track_id
+
+def song_key(song: Dict[str, Any]) -> str:
+    """Key of the files of a song, see track_key."""
+    return track_key(song['id'], song.get('tier'))
+
+def get_cache_path(key: str) -> str:
+    """Get the path of the pre-decoded file for a track key."""
+    return f"{Config.DOWNLOAD_PATH}{key}{RAW_EXTENSION}"
+
+def is_raw_file(file_path: Optional[str]) -> bool:
+    """Check whether a path points to a pre-decoded raw file."""
+    return bool(file_path) and file_path.endswith(RAW_EXTENSION)
+
+def raw_input_parameters() -> str:
+    """
+    Get the ffmpeg input parameters describing a raw file.
+
+    Returns:
+        Parameters to place before the input so ffmpeg copies the samples
+        instead of probing and decoding them
+    """
+    return f"-f {RAW_FORMAT} -ar {RAW_SAMPLE_RATE} -ac {RAW_CHANNELS}"
+
+def get_cached_path(key: str) -> Optional[str]:
+    """
+    Look up the pre-decoded file for a track.
+
+    Args:
+        key: Track key, from track_key or song_key
+
+    Returns:
+        Path to the raw file or None if the track is not cached
+    """
+    if not Config.AUDIO_CACHE:
+        return None
+
+    cache_path = get_cache_path(key)
+    if cache_path in _pending or not os.path.exists(cache_path):
+        return None
+
+    # Refresh the mtime so that pruning evicts the least recently used files first
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return cache_path
+
+async def convert_to_raw(source_path: str, cache_path: str) -> bool:
+    """
+    Decode a file into the raw format used by the call.
+
+    Args:
+        source_path: Path of the downloaded file
+        cache_path: Destination of the raw file
+
+    Returns:
+        True if successful, False otherwise
+    """
+    temp_path = f"{cache_path}.part"
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", source_path,
+            "-f", RAW_FORMAT, "-ar", str(RAW_SAMPLE_RATE), "-ac", str(RAW_CHANNELS),
+            temp_path,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+
+        if process.returncode != 0:
+            logger.warning(f"ffmpeg failed to cache {source_path}: {stderr.decode(errors='ignore').strip()}")
+            cleanup_partial(temp_path)
+            return False
+
+        os.replace(temp_path, cache_path)
+        logger.info(f"Cached {source_path} as {cache_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Error caching {source_path}: {e}", exc_info=True)
+        cleanup_partial(temp_path)
+        return False
+
+def cleanup_partial(temp_path: str):
+    """Remove a partially written cache file."""
+    try:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    except OSError:
+        pass
+
+def schedule_conversion(audio_info: Dict[str, Any], chat_id: Optional[int] = None) -> Optional[asyncio.Task]:
+    """
+    Start caching a downloaded track in the background.
+
+    Args:
+        audio_info: Audio information dictionary
+        chat_id: Chat the track was requested in, used for fair queuing
+
+    Returns:
+        The conversion task, or None if there is nothing to convert
+    """
+    if not Config.AUDIO_CACHE or not audio_info:
+        return None
+
+    source_path = audio_info.get('file_path')
+    if not source_path or is_raw_file(source_path) or not audio_info.get('id'):
+        return None
+
+    cache_path = get_cache_path(song_key(audio_info))
+    if cache_path in _pending:
+        return _pending[cache_path]
+    if os.path.exists(cache_path):
+        return None
+
+    async def run():
+        try:
+            # Nobody waits on the cache, so it yields to downloads of playing chats
+            async with transcode.slot(PRIORITY_PREFETCH, chat_id):
+                converted = await convert_to_raw(source_path, cache_path)
+            if converted:
+                prune_cache()
+        finally:
+            _pending.pop(cache_path, None)
+
+    task = asyncio.create_task(run())
+    _pending[cache_path] = task
+    return task
+
+def prune_cache():
+    """Evict the least recently used raw files until the cache fits its size limit."""
+    max_bytes = Config.AUDIO_CACHE_MAX_MB * 1024 * 1024
+    try:
+        entries = []
+        for name in os.listdir(Config.DOWNLOAD_PATH):
+            # Only complete cache entries ("<key>.raw"), not files still being written
+            if not name.endswith(RAW_EXTENSION) or name.count(".") != 1:
+                continue
+            path = os.path.join(Config.DOWNLOAD_PATH, name)
+            if is_pinned(path):
+                # Kept for "Previous" until it leaves the chat's history
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            logger.info(f"Evicted {path} from the audio cache")
+    except Exception as e:
+        logger.error(f"Error pruning audio cache: {e}", exc_info=True)
@@ -0,0 +1,203 @@
+import os
+import json
+import logging
+import asyncio
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Quality tiers: (kbps of the audio format fetched, kbps of the MP3 it is converted to)
+QUALITY_TIERS: Dict[str, Tuple[int, int]] = {
+    "low": (48, 96),
+    "standard": (Config.TARGET_AUDIO_BITRATE, 192),
+    "high": (128, 192),
+    "premium": (160, 320),
+}
+
+# Numeric settings a chat can override, with their allowed range
+SETTING_RANGES: Dict[str, Tuple[int, int]] = {
+    "queue_limit": (1, 100),
+    "duration_limit": (1, 600),  # In minutes
+    "prefetch_depth": (0, 20),  # Queued tracks pre-decoded ahead
+}
+
+SETTINGS = ("tier",) + tuple(SETTING_RANGES)
+
+def tiers_at_least(tier: Optional[str]) -> List[str]:
+    """
+    A quality tier and every better one, worst first.
+
+    Files fetched at any of them are good enough for a chat on the tier.
+    Unknown tiers, and files fetched before tiers existed, count as standard.
+    """
+    names = list(QUALITY_TIERS)
+    return names[names.index(tier if tier in QUALITY_TIERS else "standard"):]
+
+def meets_tier(have: Optional[str], want: Optional[str]) -> bool:
+    """Check whether a file fetched at one tier can be played to a chat on another."""
+    return (have if have in QUALITY_TIERS else "standard") in tiers_at_least(want)
+
+def default_settings() -> Dict[str, Any]:
+    """Settings of a chat without overrides, from the global configuration."""
+    return {
+        "tier": Config.DEFAULT_QUALITY_TIER,
+        "queue_limit": Config.MAX_PLAYLIST_SIZE,
+        "duration_limit": Config.DURATION_LIMIT,
+        "prefetch_depth": Config.PREFETCH_DEPTH,
+    }
+
+def parse_setting(key: str, value: str) -> Any:
+    """
+    Validate a setting given as text.
+
+    Args:
+        key: Name of the setting
+        value: Value as typed
+
+    Returns:
+        The value to store
+
+    Raises:
+        ValueError: If the setting or the value is not valid; the message is shown to the user
+    """
+    if key == "tier":
+        value = value.lower()
+        if value not in QUALITY_TIERS:
+            raise ValueError(f"Unknown tier {value!r}, choose one of {', '.join(QUALITY_TIERS)}.")
+        return value
+
+    if key not in SETTING_RANGES:
+        raise ValueError(f"Unknown setting {key!r}, choose one of {', '.join(SETTINGS)}.")
+    low, high = SETTING_RANGES[key]
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a whole number.")
+    if not low <= number <= high:
+        raise ValueError(f"{key} must be between {low} and {high}.")
+    return number
+
+class ChatSettings:
+    """
+    Per-chat overrides of the global limits and audio quality.
+
+    Every override is loaded into memory at startup, so looking settings up
+    on the command path never touches the disk. Changes update the memory
+    first and are written through to the JSON file right away, off the
+    event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # {chat_id: {setting: value}}, only what differs from the defaults
+        self.overrides: Dict[int, Dict[str, Any]] = {}
+        # {chat_id: overrides merged with the defaults}
+        self._resolved: Dict[int, Dict[str, Any]] = {}
+        self._defaults = default_settings()
+        # Writes run in the executor, a slow older write must not win over a newer one
+        self._version = 0
+        self._written = 0
+        self._write_lock = threading.Lock()
+
+    def load(self):
+        """Load the overrides from disk."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+            for chat_id, overrides in stored.items():
+                valid = {}
+                for key, value in overrides.items():
+                    try:
+                        valid[key] = parse_setting(key, str(value))
+                    except ValueError as e:
+                        logger.warning(f"Ignoring stored setting of chat {chat_id}: {e}")
+                if valid:
+                    self.overrides[int(chat_id)] = valid
+            logger.info(f"Loaded settings of {len(self.overrides)} chat(s)")
+        except Exception as e:
+            logger.error(f"Error loading chat settings from {self.path}: {e}", exc_info=True)
+            self.overrides = {}
+        self._resolved.clear()
+
+    def get(self, chat_id: Optional[int]) -> Dict[str, Any]:
+        """
+        Effective settings of a chat.
+
+        Args:
+            chat_id: Chat ID, or None for the defaults
+
+        Returns:
+            Settings dictionary, shared and not to be modified
+        """
+        overrides = self.overrides.get(chat_id)
+        if not overrides:
+            return self._defaults
+        settings = self._resolved.get(chat_id)
+        if settings is None:
+            settings = {**self._defaults, **overrides}
+            self._resolved[chat_id] = settings
+        return settings
+
+    def set(self, chat_id: int, key: str, value: str) -> Any:
+        """
+        Override a setting of a chat.
+
+        Returns:
+            The stored value
+
+        Raises:
+            ValueError: If the setting or the value is not valid
+        """
+        value = parse_setting(key, value)
+        self.overrides.setdefault(chat_id, {})[key] = value
+        self._resolved.pop(chat_id, None)
+        self._save()
+        return value
+
+    def reset(self, chat_id: int, key: Optional[str] = None):
+        """Go back to the default of one setting, or of all settings of a chat."""
+        overrides = self.overrides.get(chat_id)
+        if not overrides:
+            return
+        if key:
+            overrides.pop(key, None)
+        if not key or not overrides:
+            self.overrides.pop(chat_id, None)
+        self._resolved.pop(chat_id, None)
+        self._save()
+
+    def _save(self):
+        """Write the overrides to disk, off the event loop when there is one."""
+        self._version += 1
+        data = json.dumps({str(chat_id): overrides for chat_id, overrides in self.overrides.items()})
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(data, self._version)
+            return
+        loop.run_in_executor(None, self._write, data, self._version)
+
+    def _write(self, data: str, version: int):
+        with self._write_lock:
+            if version <= self._written:
+                return
+            temp_path = f"{self.path}.tmp"
+            try:
+                with open(temp_path, "w") as f:
+                    f.write(data)
+                os.replace(temp_path, self.path)
+                self._written = version
+            except Exception as e:
+                logger.error(f"Error saving chat settings to {self.path}: {e}", exc_info=True)
+
+# Settings of every chat, loaded once at startup
+chat_settings = ChatSettings(Config.CHAT_SETTINGS_PATH)
+
+def get_settings(chat_id: Optional[int]) -> Dict[str, Any]:
+    """Effective settings of a chat, from memory."""
+    return chat_settings.get(chat_id)
@@ -0,0 +1,88 @@
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Fail fast while a dependency keeps erroring.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `reset_timeout` seconds. It then lets a single trial
+    call through: success closes it again, failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """Current state of the breaker."""
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently being rejected."""
+        return self.state == OPEN
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial call through, 0 if it is not open."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may go through.
+
+        Returns:
+            True if the call should be attempted, False to fail fast
+        """
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self.trial_running:
+            self.trial_running = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        """Record a successful call."""
+        if self.opened_at is not None:
+            logger.info(f"Circuit breaker '{self.name}' closed")
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def cancel_trial(self):
+        """Record a call that ended without an outcome, e.g. cancelled, so the next one can probe."""
+        if self.state == HALF_OPEN:
+            self.trial_running = False
+
+    def record_failure(self):
+        """Record a failed call."""
+        self.failures += 1
+        if self.trial_running or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.trial_running:
+                logger.warning(
+                    f"Circuit breaker '{self.name}' opened after {self.failures} failure(s), "
+                    f"rejecting calls for {self.reset_timeout}s"
+                )
+            self.opened_at = time.monotonic()
+        self.trial_running = False
@@ -0,0 +1,103 @@
+import asyncio
+from typing import Optional, Dict, Any
+
+from utils.audio_cache import RAW_FORMAT, RAW_SAMPLE_RATE, RAW_CHANNELS, RAW_BYTES_PER_SECOND, is_raw_file
+from utils.progressive import is_growing
+
+# Bytes per sample frame (16-bit samples for every channel)
+FRAME_BYTES = RAW_CHANNELS * 2
+
+# How often a raw file that is still being downloaded is checked for new data
+GROWING_POLL_INTERVAL = 0.1
+
+def frame_align(size: int) -> int:
+    """Round a byte count down to whole sample frames."""
+    return size - size % FRAME_BYTES
+
+class Decoder:
+    """
+    PCM source for one track, in the raw format used by the call.
+
+    Pre-decoded raw files are read directly; anything else goes through
+    ffmpeg. `prime` decodes the start of the track ahead of time so the
+    first read after a switch returns immediately.
+    """
+
+    def __init__(self, song: Dict[str, Any], position: float = 0):
+        self.song = song
+        self.path = song['file_path']
+        self.position = position
+        self.buffer = bytearray()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.file = None
+        self.closed = False
+
+    async def open(self):
+        """Start decoding the track."""
+        if is_raw_file(self.path):
+            self.file = open(self.path, "rb")
+            self.file.seek(frame_align(int(self.position * RAW_BYTES_PER_SECOND)))
+            return
+
+        args = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+        if self.position:
+            args += ["-ss", f"{self.position:.1f}"]
+        args += ["-i", self.path, "-f", RAW_FORMAT, "-ar", str(RAW_SAMPLE_RATE), "-ac", str(RAW_CHANNELS), "pipe:1"]
+        self.process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+
+    async def prime(self, size: int):
+        """Decode the start of the track into memory."""
+        while len(self.buffer) < size:
+            chunk = await self._read_source(size - len(self.buffer))
+            if not chunk:
+                break
+            self.buffer += chunk
+
+    async def read(self, size: int) -> bytes:
+        """Read up to `size` bytes; empty at the end of the track."""
+        if self.buffer:
+            chunk = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            return chunk
+        return await self._read_source(size)
+
+    async def read_exactly(self, size: int) -> bytes:
+        """Read `size` bytes, or fewer at the end of the track."""
+        data = bytearray()
+        while len(data) < size:
+            chunk = await self.read(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return bytes(data)
+
+    async def _read_source(self, size: int) -> bytes:
+        if self.closed:
+            return b""
+        if self.process:
+            return await self.process.stdout.read(size)
+
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                chunk = await loop.run_in_executor(None, self.file.read, size)
+            except ValueError:
+                # Closed by a skip while reading
+                return b""
+            if chunk or not is_growing(self.path) or self.closed:
+                return chunk
+            # Caught up with the download
+            await asyncio.sleep(GROWING_POLL_INTERVAL)
+
+    def close(self):
+        """Stop decoding; pending and later reads return the end of the track."""
+        self.closed = True
+        self.buffer.clear()
+        if self.process and self.process.returncode is None:
+            self.process.kill()
+        if self.file:
+            self.file.close()
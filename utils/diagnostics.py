@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import logging
+import asyncio
+import threading
+import traceback
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Interval of the heartbeat coroutine measuring loop lag
+HEARTBEAT_INTERVAL = 0.05
+
+# Number of recent lag samples kept for percentiles
+LAG_SAMPLES = 1200
+
+# Number of innermost project frames identifying a blocking call site
+SIGNATURE_DEPTH = 4
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class BlockingDetector:
+    """
+    Measures event loop lag and finds the code that blocks the loop.
+
+    A heartbeat coroutine stamps the time every HEARTBEAT_INTERVAL. A
+    watcher thread notices when the stamp gets older than the threshold,
+    which means a callback is holding the loop, and samples the loop
+    thread's stack while it is blocked. Samples are grouped by the
+    innermost frames of our own code and ranked by total blocked time.
+    """
+
+    def __init__(self, threshold_ms: int):
+        self.threshold = threshold_ms / 1000
+        self.lags = deque(maxlen=LAG_SAMPLES)
+        self.max_lag = 0.0
+        self.blocks = 0
+        # {signature: {"count", "total", "max", "stack"}}
+        self.sites: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start measuring; must be called from the event loop."""
+        self._loop_thread_id = threading.get_ident()
+        self._running = True
+        self._beat = time.monotonic()
+        self._heartbeat = asyncio.create_task(self._run_heartbeat())
+        threading.Thread(target=self._watch, name="loop-watcher", daemon=True).start()
+        logger.info(f"Blocking call detector started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        """Stop measuring."""
+        self._running = False
+        if self._heartbeat:
+            self._heartbeat.cancel()
+
+    async def _run_heartbeat(self):
+        """Stamp the time on every loop iteration we get."""
+        while True:
+            expected = time.monotonic() + HEARTBEAT_INTERVAL
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self):
+        """Sample the loop thread's stack while the heartbeat is overdue."""
+        interval = self.threshold / 2
+        blocked_since = None
+        while self._running:
+            time.sleep(interval)
+            beat = self._beat
+            overdue = time.monotonic() - beat
+
+            if overdue < self.threshold + HEARTBEAT_INTERVAL:
+                blocked_since = None
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            new_block = blocked_since != beat
+            blocked_since = beat
+            self._record(traceback.extract_stack(frame), interval, new_block, overdue)
+
+    def _record(self, stack: traceback.StackSummary, duration: float, new_block: bool, overdue: float):
+        """Add a stack sample to its call site."""
+        own_frames = [f for f in stack if f.filename.startswith(PROJECT_ROOT) and "diagnostics" not in f.filename]
+        frames = own_frames[-SIGNATURE_DEPTH:] or list(stack)[-SIGNATURE_DEPTH:]
+        signature = tuple(f"{os.path.relpath(f.filename, PROJECT_ROOT)}:{f.lineno} {f.name}" for f in frames)
+
+        with self._lock:
+            site = self.sites.setdefault(signature, {
+                "count": 0, "total": 0.0, "max": 0.0,
+                "stack": "".join(traceback.format_list(list(stack)[-8:]))
+            })
+            if new_block:
+                self.blocks += 1
+                site["count"] += 1
+            site["total"] += duration
+            site["max"] = max(site["max"], overdue)
+
+    def lag_stats(self) -> Dict[str, float]:
+        """Loop lag percentiles over the recent samples, in milliseconds."""
+        samples = sorted(self.lags)
+        if not samples:
+            return {"p50": 0, "p99": 0, "max": 0}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 1)
+
+        return {"p50": percentile(0.5), "p99": percentile(0.99), "max": round(self.max_lag * 1000, 1)}
+
+    def top(self, n: int = 5) -> List[Dict[str, Any]]:
+        """
+        Get the call sites that blocked the loop the longest.
+
+        Args:
+            n: Number of call sites
+
+        Returns:
+            List of call sites, longest total blocking time first
+        """
+        with self._lock:
+            ranked = sorted(self.sites.items(), key=lambda item: item[1]["total"], reverse=True)[:n]
+            return [
+                {
+                    "site": " <- ".join(reversed(signature)),
+                    "count": site["count"],
+                    "total_ms": round(site["total"] * 1000),
+                    "max_ms": round(site["max"] * 1000),
+                    "stack": site["stack"],
+                }
+                for signature, site in ranked
+            ]
+
+    def report(self, n: int = 5) -> Dict[str, Any]:
+        """Loop lag statistics and the top blocking call sites."""
+        return {"lag_ms": self.lag_stats(), "blocks": self.blocks, "top": self.top(n)}
+
+    def format_report(self, n: int = 5) -> str:
+        """Human-readable version of the report."""
+        lag = self.lag_stats()
+        text = (
+            f"Loop lag p50 {lag['p50']}ms, p99 {lag['p99']}ms, max {lag['max']}ms; "
+            f"{self.blocks} block(s) over {self.threshold * 1000:.0f}ms"
+        )
+        for i, site in enumerate(self.top(n), start=1):
+            text += f"\n{i}. {site['site']} - {site['count']}x, {site['total_ms']}ms total, {site['max_ms']}ms max"
+        return text
+
+    async def run_reporter(self, interval: int, n: int = 5):
+        """Log the report periodically."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.blocks:
+                logger.warning(f"Blocking call report:\n{self.format_report(n)}")
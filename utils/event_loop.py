@@ -0,0 +1,30 @@
+import asyncio
+import logging
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def install_event_loop_policy(use_uvloop: bool = None) -> str:
+    """
+    Select the event loop implementation for asyncio.run().
+
+    Args:
+        use_uvloop: Whether to try uvloop, defaults to Config.USE_UVLOOP
+
+    Returns:
+        Name of the loop implementation in use ("uvloop" or "asyncio")
+    """
+    if use_uvloop is None:
+        use_uvloop = Config.USE_UVLOOP
+
+    if use_uvloop:
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            return "uvloop"
+        except ImportError:
+            logger.warning("uvloop was requested but is not installed, using the default asyncio loop")
+
+    asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
+    return "asyncio"
@@ -0,0 +1,105 @@
+import logging
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set, Tuple, Any
+
+from utils.logging_setup import bind_chat
+
+logger = logging.getLogger(__name__)
+
+def current_track_seq(bot, chat_id) -> int:
+    """Get the sequence number of the track currently loaded in a chat."""
+    return bot.active_chats.get(chat_id, {}).get("track_seq", 0)
+
+def next_track_seq(chat_info: Dict[str, Any]) -> int:
+    """
+    Advance the track sequence number of a chat.
+
+    Every playback state transition bumps the number so that events
+    raised for an earlier track can be recognised as stale.
+    """
+    chat_info["track_seq"] = chat_info.get("track_seq", 0) + 1
+    return chat_info["track_seq"]
+
+class PlaybackEvents:
+    """
+    Serializes playback state transitions per chat.
+
+    Every transition (stream end, skip, stop, starting a track) is queued and
+    run by a single worker per chat, so they never interleave. Events that end
+    a track carry the track's sequence number: only the first one for a given
+    track runs, and events for a track that is no longer current are dropped.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._queues: Dict[int, Deque[Tuple[Callable[[], Awaitable[Any]], Optional[int], asyncio.Future]]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        # Track sequence numbers with an end event queued or already handled
+        self._ended: Dict[int, Set[int]] = {}
+
+    def submit(self, chat_id, action: Callable[[], Awaitable[Any]],
+               track_seq: Optional[int] = None) -> asyncio.Future:
+        """
+        Queue a state transition for a chat.
+
+        Args:
+            chat_id: Chat ID the transition applies to
+            action: Coroutine function performing the transition
+            track_seq: Sequence number of the track this event ends, if any
+
+        Returns:
+            Future resolving to the action's result, or None if the event was dropped
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        if track_seq is not None:
+            ended = self._ended.setdefault(chat_id, set())
+            if track_seq in ended:
+                logger.debug(f"Dropping duplicate end event for track {track_seq} in chat {chat_id}")
+                future.set_result(None)
+                return future
+            ended.add(track_seq)
+
+        self._queues.setdefault(chat_id, deque()).append((action, track_seq, future))
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+        return future
+
+    def end_track(self, chat_id, action: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Queue a transition that ends the track currently loaded in a chat."""
+        return self.submit(chat_id, action, track_seq=current_track_seq(self.bot, chat_id))
+
+    def pending(self, chat_id) -> int:
+        """Number of transitions waiting for a chat."""
+        return len(self._queues.get(chat_id, ()))
+
+    async def _drain(self, chat_id):
+        """Run queued transitions for a chat one at a time."""
+        queue = self._queues[chat_id]
+        bind_chat(chat_id)
+        try:
+            while queue:
+                action, track_seq, future = queue.popleft()
+
+                if track_seq is not None and track_seq != current_track_seq(self.bot, chat_id):
+                    logger.debug(f"Dropping stale end event for track {track_seq} in chat {chat_id}")
+                    future.set_result(None)
+                    continue
+
+                try:
+                    result = await action()
+                except Exception as e:
+                    logger.error(f"Error in playback transition for chat {chat_id}: {e}", exc_info=True)
+                    result = None
+
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._workers.pop(chat_id, None)
+            if not queue:
+                self._queues.pop(chat_id, None)
+            # Only sequence numbers at or after the current track can still arrive
+            seq = current_track_seq(self.bot, chat_id)
+            if chat_id in self._ended:
+                self._ended[chat_id] = {n for n in self._ended[chat_id] if n >= seq}
@@ -0,0 +1,269 @@
+import os
+import logging
+import asyncio
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any
+
+from config import Config
+from utils.audio_cache import RAW_BYTES_PER_SECOND
+from utils.decoder import Decoder, frame_align
+from utils.shared_decode import open_shared
+
+logger = logging.getLogger(__name__)
+
+# Bytes written to the call per iteration, 100 ms of audio
+CHUNK_BYTES = RAW_BYTES_PER_SECOND // 10
+
+# Audio decoded into memory when a decoder is opened, so a switch never waits for it
+PRIME_BYTES = RAW_BYTES_PER_SECOND
+
+# Gapless players by chat ID
+_players: Dict[int, "GaplessPlayer"] = {}
+
+def crossfade(tail: bytes, head: bytes) -> bytes:
+    """
+    Mix the end of a track into the start of the next with a linear fade.
+
+    Args:
+        tail: Last samples of the ending track
+        head: First samples of the next track, at least as long as the tail
+
+    Returns:
+        Mixed samples, as long as the tail
+    """
+    out = array('h', tail)
+    incoming = array('h', head[:len(tail)].ljust(len(tail), b"\0"))
+    count = len(out)
+    for i in range(count):
+        fade = i / count
+        mixed = int(out[i] * (1 - fade) + incoming[i] * fade)
+        out[i] = max(-32768, min(32767, mixed))
+    return out.tobytes()
+
+class GaplessPlayer:
+    """
+    Continuous PCM stream for one chat, fed from one track after the other.
+
+    The call plays a FIFO that never ends between tracks. The decoder of
+    the next queued track is opened and primed GAPLESS_PRELOAD_SECONDS
+    before the current one ends; when the current decoder runs dry the
+    writer carries on with the next one at the very next sample, optionally
+    crossfading over CROSSFADE_SECONDS, and reports the switch through the
+    chat's playback worker. When nothing is ready the FIFO is closed and the
+    call's stream ends as usual.
+    """
+
+    def __init__(self, bot, chat_id):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.path = f"{Config.DOWNLOAD_PATH}{chat_id}.gapless.raw"
+        self.current: Optional[Decoder] = None
+        self.next: Optional[Decoder] = None
+        self.fade_bytes = frame_align(int(Config.CROSSFADE_SECONDS * RAW_BYTES_PER_SECOND))
+        self.prime_bytes = max(PRIME_BYTES, self.fade_bytes)
+        self.stopped = False
+        self.written = 0
+        self._task: Optional[asyncio.Task] = None
+        self._preloading: Optional[asyncio.Task] = None
+        # Writes to the FIFO block while the call catches up, so they get their own thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"gapless-{chat_id}")
+        self._fd: Optional[int] = None
+
+    async def start(self, song: Dict[str, Any], position: float = 0) -> str:
+        """
+        Start streaming a track.
+
+        Returns:
+            Path of the FIFO the call should play
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.mkfifo(self.path)
+
+        self.current = await self.open_decoder(song, position)
+        self.written = int(position * RAW_BYTES_PER_SECOND)
+        self._task = asyncio.create_task(self._run())
+        return self.path
+
+    async def open_decoder(self, song: Dict[str, Any], position: float = 0) -> Decoder:
+        """Open and prime the decoder of a track."""
+        if Config.SHARED_DECODE and not position:
+            # Other chats starting the same track share its decoder
+            decoder = open_shared(song)
+        else:
+            decoder = Decoder(song, position)
+        await decoder.open()
+        await decoder.prime(self.prime_bytes)
+        return decoder
+
+    def upcoming(self) -> Optional[Dict[str, Any]]:
+        """The queued track that plays next, if it is on disk."""
+        queue = self.bot.active_chats.get(self.chat_id, {}).get("queue") or []
+        if queue and queue[0].get('file_path') and os.path.exists(queue[0]['file_path']):
+            return queue[0]
+        return None
+
+    async def preload(self) -> Optional[Decoder]:
+        """Open the decoder of the upcoming track, replacing a stale one."""
+        song = self.upcoming()
+        if self.next and self.next.song is song:
+            return self.next
+        if self.next:
+            self.next.close()
+            self.next = None
+        if song:
+            try:
+                self.next = await self.open_decoder(song)
+                logger.debug(f"Preloaded {song['title']} in chat {self.chat_id}")
+            except Exception as e:
+                logger.warning(f"Could not preload {song['title']} in chat {self.chat_id}: {e}")
+        return self.next
+
+    def _start_preload(self):
+        if not self._preloading or self._preloading.done():
+            self._preloading = asyncio.create_task(self.preload())
+
+    async def skip(self) -> bool:
+        """
+        Switch to the upcoming track right away.
+
+        Returns:
+            True if the upcoming track takes over, False if none is ready
+        """
+        if self.stopped or not await self.preload():
+            return False
+        self.current.close()
+        return True
+
+    def stop(self):
+        """Stop streaming; the call's stream ends."""
+        if self.stopped:
+            return
+        self.stopped = True
+        for decoder in (self.current, self.next):
+            if decoder:
+                decoder.close()
+        if self._task:
+            self._task.cancel()
+        self._release_writer()
+        self._executor.submit(self._close_blocking)
+        self._executor.shutdown(wait=False)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _release_writer(self):
+        """Unblock a writer waiting for the call to open the FIFO."""
+        try:
+            fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+            os.close(fd)
+        except OSError:
+            pass
+
+    async def _write(self, data: bytes):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write_blocking, data)
+
+    def _write_blocking(self, data: bytes):
+        if self._fd is None:
+            # Blocks until the call's ffmpeg opens the FIFO for reading
+            self._fd = os.open(self.path, os.O_WRONLY)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def _close_blocking(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    async def _run(self):
+        """Write the current track to the FIFO and switch tracks at their boundary."""
+        # The end of each track is held back so it can be crossfaded into the next
+        held = bytearray()
+        try:
+            while not self.stopped:
+                chunk = await self.current.read(CHUNK_BYTES)
+                if chunk:
+                    held += chunk
+                    self.written += len(chunk)
+                    if len(held) > self.fade_bytes:
+                        out = bytes(held[:len(held) - self.fade_bytes])
+                        del held[:len(out)]
+                        await self._write(out)
+
+                    duration = self.current.song.get('duration')
+                    if duration and duration - self.written / RAW_BYTES_PER_SECOND <= Config.GAPLESS_PRELOAD_SECONDS:
+                        self._start_preload()
+                    continue
+
+                # End of the current track
+                if self._preloading:
+                    await self._preloading
+                following = await self.preload()
+                if not following:
+                    await self._write(bytes(held))
+                    break
+
+                if held:
+                    head = await following.read_exactly(len(held))
+                    loop = asyncio.get_running_loop()
+                    await self._write(await loop.run_in_executor(None, crossfade, bytes(held), head))
+                    held = bytearray()
+
+                self.current.close()
+                self.current, self.next = following, None
+                self.written = 0
+                self._on_switch(following.song)
+        except asyncio.CancelledError:
+            pass
+        except (BrokenPipeError, OSError) as e:
+            # The call's ffmpeg went away: the call was left or failed
+            logger.debug(f"Gapless stream of chat {self.chat_id} closed: {e}")
+        except Exception as e:
+            logger.error(f"Error in gapless stream of chat {self.chat_id}: {e}", exc_info=True)
+        finally:
+            if not self.stopped:
+                # Nothing left to stream, closing the FIFO ends the call's stream
+                if _players.get(self.chat_id) is self:
+                    _players.pop(self.chat_id, None)
+                self.stop()
+
+    def _on_switch(self, song: Dict[str, Any]):
+        """Update the chat's state for the track that just took over."""
+        # Imported here to avoid a circular import with the handlers
+        from handlers.commands import advance_gapless
+        logger.info(f"Gapless switch to {song['title']} in chat {self.chat_id}")
+        self.bot.events.submit(self.chat_id, lambda: advance_gapless(self.bot, self.chat_id, song))
+
+async def start_gapless(bot, chat_id, song: Dict[str, Any], position: float = 0) -> str:
+    """
+    Start a gapless stream for a chat, replacing the previous one.
+
+    Returns:
+        Path of the FIFO the call should play
+    """
+    stop_gapless(chat_id)
+    player = GaplessPlayer(bot, chat_id)
+    _players[chat_id] = player
+    try:
+        return await player.start(song, position)
+    except Exception:
+        stop_gapless(chat_id)
+        raise
+
+def stop_gapless(chat_id):
+    """Stop the gapless stream of a chat, if any."""
+    player = _players.pop(chat_id, None)
+    if player:
+        player.stop()
+
+async def skip_gapless(chat_id) -> bool:
+    """
+    Switch a chat's gapless stream to the upcoming track.
+
+    Returns:
+        True if the switch happens in the stream, False if the caller must restart playback
+    """
+    player = _players.get(chat_id)
+    return bool(player) and await player.skip()
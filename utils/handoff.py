@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import asyncio
+import subprocess
+from typing import Dict, Any, Optional
+
+from config import Config
+from utils.audio_cache import get_cached_path, song_key
+from utils.position import get_position, mark_paused
+from utils.progressive import is_growing
+
+logger = logging.getLogger(__name__)
+
+HANDOFF_VERSION = 1
+
+# How often the old process checks for the new one's ready file
+READY_POLL_INTERVAL = 0.2
+
+def serialize_chats(bot) -> Dict[str, Any]:
+    """
+    Snapshot the playback sessions of all chats.
+
+    Returns:
+        JSON-serializable state with the queue, current track, position and
+        history of every chat that has something to play
+    """
+    chats = {}
+    for chat_id, chat_info in bot.active_chats.items():
+        current = chat_info.get("current")
+        if not current and not chat_info.get("queue"):
+            continue
+
+        if current and is_growing(current.get('file_path')):
+            # The download dies with this process, the new one fetches it again
+            current = dict(current, file_path=None)
+
+        chats[str(chat_id)] = {
+            "queue": chat_info.get("queue", []),
+            "current": current,
+            "position": get_position(chat_info),
+            "paused": bool(chat_info.get("paused_at")),
+            "history": bot.history.songs(chat_id),
+        }
+    return {"version": HANDOFF_VERSION, "saved_at": time.time(), "chats": chats}
+
+def write_handoff(bot, path: str) -> int:
+    """
+    Write the sessions of all chats to the handoff file.
+
+    Returns:
+        Number of chats written
+    """
+    state = serialize_chats(bot)
+    temp_path = f"{path}.part"
+    with open(temp_path, "w") as f:
+        json.dump(state, f, default=str)
+    os.replace(temp_path, path)
+    return len(state["chats"])
+
+def remove_handoff(path: str):
+    """Remove the handoff file, if any."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def load_handoff(path: str, max_age: int) -> Optional[Dict[str, Any]]:
+    """
+    Read the handoff file left by the previous process.
+
+    A usable file is kept until its sessions are restored, so a start that
+    fails before that (and is retried) still finds it. Unusable ones are
+    removed right away.
+
+    Returns:
+        The saved state, or None if there is none or it is too old to resume
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read handoff file {path}: {e}")
+        remove_handoff(path)
+        return None
+
+    if state.get("version") != HANDOFF_VERSION:
+        logger.warning(f"Ignoring handoff file with version {state.get('version')}")
+        remove_handoff(path)
+        return None
+    age = time.time() - state.get("saved_at", 0)
+    if age > max_age:
+        logger.warning(f"Ignoring handoff file saved {age:.0f}s ago")
+        remove_handoff(path)
+        return None
+    return state
+
+class RestartHandoff:
+    """
+    Graceful restart that keeps the calls going.
+
+    On HANDOFF_SIGNAL the old process writes every chat's session to the
+    handoff file and starts its replacement (unless HANDOFF_SPAWN is off and
+    the deploy tooling starts it). The new process reads the file on start,
+    rejoins the calls at the saved positions and writes the ready file; only
+    then does the old process shut down, without leaving the calls.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        # State left by the previous process, restored once the clients run
+        self.pending = load_handoff(Config.HANDOFF_PATH, Config.HANDOFF_MAX_AGE)
+        self.handed_off = False
+        self._restarting = False
+
+    @property
+    def ready_path(self) -> str:
+        return f"{Config.HANDOFF_PATH}.ready"
+
+    def install(self):
+        """Listen for the restart signal; must be called from the event loop."""
+        signum = getattr(signal, Config.HANDOFF_SIGNAL, None)
+        if signum is None:
+            logger.warning(f"Unknown handoff signal {Config.HANDOFF_SIGNAL}, graceful restart disabled")
+            return
+        asyncio.get_running_loop().add_signal_handler(signum, lambda: asyncio.create_task(self.restart()))
+        logger.info(f"Graceful restart enabled on {Config.HANDOFF_SIGNAL}")
+
+    async def restart(self):
+        """Hand the sessions over to a new process and stop once it is ready."""
+        if self._restarting:
+            return
+        self._restarting = True
+        child = None
+
+        try:
+            if os.path.exists(self.ready_path):
+                os.remove(self.ready_path)
+
+            # Let the new process start from an up to date play history
+            self.bot.track_index.save()
+            chats = write_handoff(self.bot, Config.HANDOFF_PATH)
+            logger.info(f"Wrote {chats} chat session(s) to {Config.HANDOFF_PATH}")
+
+            if Config.HANDOFF_SPAWN:
+                child = subprocess.Popen([sys.executable] + sys.argv, start_new_session=True)
+                logger.info(f"Started replacement process {child.pid}")
+
+            if not await self.wait_for_ready(Config.HANDOFF_TIMEOUT):
+                logger.error("Replacement process did not become ready, keeping this one running")
+                if child and child.poll() is None:
+                    child.terminate()
+                remove_handoff(Config.HANDOFF_PATH)
+                return
+
+            os.remove(self.ready_path)
+            logger.info("Replacement process is ready, shutting down")
+            self.handed_off = True
+            # Stops pyrogram's idle() like a normal shutdown
+            os.kill(os.getpid(), signal.SIGTERM)
+        except Exception as e:
+            logger.error(f"Error during graceful restart: {e}", exc_info=True)
+        finally:
+            self._restarting = False
+
+    async def wait_for_ready(self, timeout: float) -> bool:
+        """Wait for the new process to report that it took over."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.path.exists(self.ready_path):
+                return True
+            await asyncio.sleep(READY_POLL_INTERVAL)
+        return False
+
+    async def restore(self):
+        """Rejoin the calls of the previous process and report ready."""
+        if not self.pending:
+            return
+
+        state, self.pending = self.pending, None
+        elapsed = time.time() - state["saved_at"]
+        restores = [
+            self.bot.events.submit(int(chat_id), lambda chat_id=int(chat_id), session=session:
+                                   self.restore_chat(chat_id, session, elapsed))
+            for chat_id, session in state["chats"].items()
+        ]
+        restored = sum(1 for result in await asyncio.gather(*restores) if result)
+        logger.info(f"Restored {restored}/{len(restores)} chat session(s) from the previous process")
+        remove_handoff(Config.HANDOFF_PATH)
+
+        with open(self.ready_path, "w") as f:
+            f.write(str(os.getpid()))
+
+    async def restore_chat(self, chat_id, session: Dict[str, Any], elapsed: float) -> bool:
+        """
+        Resume one chat's session; runs through the chat's playback worker.
+
+        Args:
+            chat_id: Chat ID to resume
+            session: Session saved by the previous process
+            elapsed: Seconds since the session was saved
+
+        Returns:
+            True if the chat is playing again
+        """
+        # Imported here to avoid a circular import with the handlers
+        from handlers.commands import play_audio, process_next_song, fetch_with_retry
+
+        chat_info = self.bot.active_chats.setdefault(chat_id, {
+            "queue": [],
+            "current": None,
+            "is_playing": False
+        })
+        chat_info["queue"] = session["queue"]
+        for song in session.get("history", []):
+            self.bot.history.push(chat_id, song)
+
+        current = session.get("current")
+        if not current:
+            await process_next_song(self.bot, chat_id)
+            return chat_info["is_playing"]
+
+        # The old process kept playing until now
+        position = session["position"] + (0 if session["paused"] else elapsed)
+        if current.get('duration') and position >= current['duration']:
+            await process_next_song(self.bot, chat_id)
+            return chat_info["is_playing"]
+
+        cached_path = get_cached_path(song_key(current)) if current.get('id') else None
+        if cached_path:
+            current['file_path'] = cached_path
+        elif not current.get('file_path') or not os.path.exists(current['file_path']):
+            downloaded = await fetch_with_retry(current, chat_id)
+            if not downloaded:
+                await process_next_song(self.bot, chat_id)
+                return chat_info["is_playing"]
+            current = downloaded
+
+        if not await play_audio(self.bot, chat_id, current, position):
+            await process_next_song(self.bot, chat_id)
+            return chat_info["is_playing"]
+
+        if session["paused"]:
+            await self.bot.call_py.pause_stream(chat_id)
+            mark_paused(chat_info)
+        return True
@@ -0,0 +1,153 @@
+import json
+import time
+import logging
+import asyncio
+from typing import Dict, Any, Optional, Tuple
+
+from config import Config
+from utils.position import get_remaining
+
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """
+    Liveness/readiness HTTP endpoint and watchdog for stuck chats.
+
+    The watchdog wakes up every WATCHDOG_INTERVAL seconds. A wake-up that
+    comes late by more than LOOP_STALL_THRESHOLD means the event loop was
+    blocked. A chat still marked as playing WATCHDOG_GRACE seconds after its
+    track should have ended lost its stream-end event and is advanced.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.started_at = time.time()
+        self.last_tick = time.monotonic()
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_stall_at = None
+        self.recoveries = 0
+        # {chat_id: consecutive recoveries for the same track}
+        self.stuck_chats: Dict[int, int] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watchdog: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the watchdog and, if configured, the HTTP endpoint."""
+        self._watchdog = asyncio.create_task(self.run_watchdog())
+        if Config.HEALTH_PORT:
+            self._server = await asyncio.start_server(
+                self._handle_request, Config.HEALTH_HOST, Config.HEALTH_PORT
+            )
+            logger.info(f"Health endpoint listening on {Config.HEALTH_HOST}:{Config.HEALTH_PORT}")
+
+    async def stop(self):
+        """Stop the watchdog and the HTTP endpoint."""
+        if self._watchdog:
+            self._watchdog.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def run_watchdog(self):
+        """Check the event loop and every playing chat periodically."""
+        while True:
+            expected = time.monotonic() + Config.WATCHDOG_INTERVAL
+            await asyncio.sleep(Config.WATCHDOG_INTERVAL)
+            now = time.monotonic()
+            self.last_tick = now
+
+            self.last_lag = now - expected
+            self.max_lag = max(self.max_lag, self.last_lag)
+            if self.last_lag > Config.LOOP_STALL_THRESHOLD:
+                self.stalls += 1
+                self.last_stall_at = time.time()
+                logger.warning(f"Event loop stalled for {self.last_lag:.2f}s")
+
+            try:
+                self.check_chats()
+            except Exception as e:
+                logger.error(f"Error in watchdog: {e}", exc_info=True)
+
+    def check_chats(self):
+        """Advance chats whose track should have ended a while ago."""
+        # Imported here to avoid a circular import with the handlers
+        from handlers.commands import recover_stuck
+
+        for chat_id, chat_info in list(self.bot.active_chats.items()):
+            if not chat_info.get("is_playing") or chat_info.get("paused_at"):
+                self.stuck_chats.pop(chat_id, None)
+                continue
+
+            remaining = get_remaining(chat_info)
+            if remaining is None or remaining > -Config.WATCHDOG_GRACE:
+                self.stuck_chats.pop(chat_id, None)
+                continue
+
+            if self.bot.events.pending(chat_id):
+                # A transition is already on its way
+                continue
+
+            self.stuck_chats[chat_id] = self.stuck_chats.get(chat_id, 0) + 1
+            self.recoveries += 1
+            logger.warning(
+                f"Chat {chat_id} is {-remaining:.0f}s past the end of its track without a stream end, "
+                f"leaving the call and advancing the queue (attempt {self.stuck_chats[chat_id]})"
+            )
+            self.bot.events.end_track(chat_id, lambda chat_id=chat_id: recover_stuck(self.bot, chat_id))
+
+    def liveness(self) -> Tuple[bool, Dict[str, Any]]:
+        """The process is alive while the watchdog keeps ticking on time."""
+        since_tick = time.monotonic() - self.last_tick
+        alive = since_tick < Config.WATCHDOG_INTERVAL * 3 and self.last_lag <= Config.LOOP_STALL_THRESHOLD
+        return alive, {
+            "uptime": round(time.time() - self.started_at),
+            "seconds_since_watchdog": round(since_tick, 2),
+            "loop_lag": round(self.last_lag, 3),
+            "max_loop_lag": round(self.max_lag, 3),
+            "loop_stalls": self.stalls,
+        }
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """The bot is ready when its clients are connected and no chat stays stuck."""
+        bot_connected = bool(self.bot.bot.is_connected)
+        assistant_connected = bool(self.bot.assistant and self.bot.assistant.is_connected)
+        stuck = [chat_id for chat_id, attempts in self.stuck_chats.items()
+                 if attempts >= Config.WATCHDOG_MAX_RECOVERIES]
+        ready = bot_connected and assistant_connected and not stuck
+        return ready, {
+            "bot_connected": bot_connected,
+            "assistant_connected": assistant_connected,
+            "active_chats": sum(1 for info in self.bot.active_chats.values() if info.get("is_playing")),
+            "recoveries": self.recoveries,
+            "stuck_chats": stuck,
+        }
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve a single HTTP request."""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            parts = request_line.decode(errors="ignore").split()
+            path = parts[1] if len(parts) > 1 else "/"
+
+            if path in ("/livez", "/healthz"):
+                ok, body = self.liveness()
+            elif path == "/readyz":
+                ok, body = self.readiness()
+            elif path == "/debug/blocking" and self.bot.diagnostics:
+                ok, body = True, self.bot.diagnostics.report(Config.DIAGNOSTICS_TOP_N)
+            else:
+                ok, body = False, {"error": "not found"}
+
+            status = "200 OK" if ok else ("404 Not Found" if "error" in body else "503 Service Unavailable")
+            payload = json.dumps(body).encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Error serving health request: {e}")
+        finally:
+            writer.close()
@@ -11,6 +11,21 @@ def format_duration(seconds: int) -> str:
     seconds = seconds % 60
     return f"{minutes:02d}:{seconds:02d}"
 
+def parse_timestamp(text: str) -> Optional[int]:
+    """
+    Parse a position typed as SS, MM:SS or HH:MM:SS.
+    
+    Returns:
+        Position in seconds, or None if the text is not a timestamp
+    """
+    parts = text.strip().split(":")
+    if not 1 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds
+
 def create_player_keyboard() -> InlineKeyboardMarkup:
     """
     Create the player control keyboard.
@@ -101,12 +116,13 @@ def get_queue_text(queue: List[Dict[str, Any]], current: Optional[Dict[str, Any]
     
     return text
 
-def get_now_playing_text(song: Dict[str, Any]) -> str:
+def get_now_playing_text(song: Dict[str, Any], position: Optional[float] = None) -> str:
     """
     Format the currently playing song info as text.
     
     Args:
         song: Song information
+        position: Playback position in seconds, shown next to the duration if given
     
     Returns:
         Formatted now playing text
@@ -114,7 +130,10 @@ def get_now_playing_text(song: Dict[str, Any]) -> str:
     text = "🎵 **Now Playing**\n\n"
     text += f"🎧 **{song['title']}**\n"
     text += f"👤 Uploader: {song['uploader']}\n"
-    text += f"⏱ Duration: {format_duration(song['duration'])}\n"
+    if position is not None:
+        text += f"⏱ Position: {format_duration(int(position))} / {format_duration(song['duration'])}\n"
+    else:
+        text += f"⏱ Duration: {format_duration(song['duration'])}\n"
     if song.get('webpage_url'):
         text += f"🔗 [Link to Video]({song['webpage_url']})\n"
     
@@ -0,0 +1,112 @@
+import logging
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fields of a song kept in the history, the rest is dropped to bound memory
+HISTORY_FIELDS = ('id', 'title', 'uploader', 'duration', 'thumbnail', 'webpage_url', 'file_path', 'tier', 'source')
+
+# {file path: number of history entries pinning it}
+_pins: Dict[str, int] = {}
+
+def pin_file(file_path: str):
+    """Keep a file on disk until it is unpinned."""
+    _pins[file_path] = _pins.get(file_path, 0) + 1
+
+def unpin_file(file_path: str) -> bool:
+    """
+    Release a pin on a file.
+
+    Returns:
+        True if no pins are left on the file
+    """
+    count = _pins.get(file_path, 0) - 1
+    if count > 0:
+        _pins[file_path] = count
+        return False
+    _pins.pop(file_path, None)
+    return True
+
+def is_pinned(file_path: Optional[str]) -> bool:
+    """Check if a file is held by a history entry."""
+    return bool(file_path) and file_path in _pins
+
+class PlayHistory:
+    """
+    Bounded per-chat history of played tracks.
+
+    The files of the last `size` tracks of every chat stay pinned on disk so
+    "Previous" can replay them without downloading again. A track falling
+    out of the window releases its file.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._chats: Dict[int, Deque[Dict[str, Any]]] = {}
+
+    def push(self, chat_id, song: Optional[Dict[str, Any]], in_use: Optional[str] = None):
+        """
+        Add a track that finished playing.
+
+        Args:
+            chat_id: Chat ID the track played in
+            song: Song information dictionary
+            in_use: File path that must not be removed if an entry is evicted
+        """
+        if not song:
+            return
+        if self.size <= 0:
+            # History is off, the file goes as soon as the track is done
+            file_path = song.get('file_path')
+            if file_path and file_path != in_use:
+                # Imported here to avoid a circular import, cleanup_file checks the pins
+                from utils.youtube import cleanup_file
+                cleanup_file(file_path)
+            return
+
+        history = self._chats.setdefault(chat_id, deque())
+        entry = {key: song[key] for key in HISTORY_FIELDS if key in song}
+        if entry.get('file_path'):
+            pin_file(entry['file_path'])
+        history.append(entry)
+
+        while len(history) > self.size:
+            self._release(history.popleft(), in_use)
+
+    def pop(self, chat_id) -> Optional[Dict[str, Any]]:
+        """
+        Take the most recent track out of the history.
+
+        The file is unpinned but kept on disk, the caller is about to play it.
+        """
+        history = self._chats.get(chat_id)
+        if not history:
+            return None
+
+        entry = history.pop()
+        if entry.get('file_path'):
+            unpin_file(entry['file_path'])
+        return entry
+
+    def __len__(self) -> int:
+        """Entries kept over every chat."""
+        return sum(len(history) for history in self._chats.values())
+
+    def songs(self, chat_id) -> List[Dict[str, Any]]:
+        """Tracks in a chat's history, oldest first."""
+        return list(self._chats.get(chat_id, ()))
+
+    def clear(self, chat_id, in_use: Optional[str] = None):
+        """Forget a chat's history and release its files."""
+        for entry in self._chats.pop(chat_id, ()):
+            self._release(entry, in_use)
+
+    def _release(self, entry: Dict[str, Any], in_use: Optional[str]):
+        """Unpin an entry's file and remove it once nothing else holds it."""
+        # Imported here to avoid a circular import, cleanup_file checks the pins
+        from utils.youtube import cleanup_file
+
+        file_path = entry.get('file_path')
+        if file_path and unpin_file(file_path) and file_path != in_use:
+            cleanup_file(file_path)
@@ -0,0 +1,263 @@
+import os
+import sys
+import asyncio
+import logging
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Snapshots kept for diffing, the oldest is dropped beyond this
+MAX_SNAPSHOTS = 5
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    Estimate the memory used by an object and everything it contains.
+
+    Objects reachable twice are counted once. Only containers are followed,
+    so clients, tasks and other objects merely referenced are not included.
+
+    Args:
+        obj: Object to measure
+        seen: IDs of objects already counted
+
+    Returns:
+        Estimated size in bytes
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+def chat_memory(active_chats: Dict[int, Dict[str, Any]]) -> List[Tuple[int, int, int]]:
+    """
+    Estimate the memory held by each chat's state.
+
+    Args:
+        active_chats: The bot's active chats
+
+    Returns:
+        (chat ID, estimated bytes, queued songs) per chat, largest first
+    """
+    usage = [
+        (chat_id, deep_sizeof(chat_info), len(chat_info.get("queue") or []))
+        for chat_id, chat_info in list(active_chats.items())
+    ]
+    return sorted(usage, key=lambda item: item[1], reverse=True)
+
+def object_memory(obj: Any) -> int:
+    """Estimate the memory held by an object's attributes and everything they contain."""
+    return sys.getsizeof(obj) + deep_sizeof(vars(obj))
+
+def task_counts() -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Count the pending asyncio tasks, grouped by coroutine.
+
+    Returns:
+        Total number of tasks and (coroutine name, count) pairs, most common first
+    """
+    tasks = asyncio.all_tasks()
+    names = Counter(getattr(task.get_coro(), "__qualname__", repr(task.get_coro())) for task in tasks)
+    return len(tasks), names.most_common()
+
+def executor_depth(executor: Optional[ThreadPoolExecutor]) -> Dict[str, int]:
+    """Threads and queued work items of a thread pool."""
+    if not executor:
+        return {"threads": 0, "queued": 0}
+    return {"threads": len(executor._threads), "queued": executor._work_queue.qsize()}
+
+def executor_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Queue depths of the thread pools and resource pools in use.
+
+    Returns:
+        {name: stats} for the loop's default executor, every gapless
+        writer and the download and ffmpeg pools
+    """
+    # Imported here so the stats work whether or not gapless playback is enabled
+    from utils import gapless, scheduler
+
+    loop = asyncio.get_running_loop()
+    stats = {"default executor": executor_depth(getattr(loop, "_default_executor", None))}
+
+    writers = [executor_depth(player._executor) for player in list(gapless._players.values())]
+    if writers:
+        stats["gapless writers"] = {
+            "threads": sum(w["threads"] for w in writers),
+            "queued": sum(w["queued"] for w in writers),
+        }
+
+    for pool in (scheduler.network, scheduler.transcode):
+        stats[f"{pool.name} pool"] = pool.stats()
+    return stats
+
+def open_fds() -> Dict[str, int]:
+    """
+    Count the open file descriptors of the process, by kind.
+
+    Returns:
+        {kind: count}, empty where /proc is not available
+    """
+    fd_dir = "/proc/self/fd"
+    if not os.path.isdir(fd_dir):
+        return {}
+
+    kinds = Counter()
+    for fd in os.listdir(fd_dir):
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            # Closed while listing, e.g. the listing's own descriptor
+            continue
+        if target.startswith(("socket:", "pipe:", "anon_inode:")):
+            kinds[target.split(":")[0]] += 1
+        else:
+            kinds["file"] += 1
+    return dict(kinds)
+
+def directory_usage(path: str) -> Tuple[int, int]:
+    """
+    Measure a directory.
+
+    Args:
+        path: Directory to measure, including subdirectories
+
+    Returns:
+        Number of files and their total size in bytes
+    """
+    files = 0
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+                files += 1
+            except OSError:
+                # Removed while walking
+                continue
+    return files, total
+
+def format_bytes(size: float) -> str:
+    """Format a byte count with a binary unit."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class MemoryTracer:
+    """
+    Allocation tracing on demand, with named snapshots to diff.
+
+    Tracing slows every allocation down, so it only runs between start()
+    and stop(). Snapshots are filtered to leave out tracemalloc's own
+    allocations and the interpreter's import machinery. Taking, filtering
+    and comparing them walks every traced block, so that runs in the
+    default executor instead of on the event loop.
+    """
+
+    def __init__(self, frames: int):
+        self.frames = max(1, frames)
+        self.snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+        self._taken = 0
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """Start tracing allocations."""
+        if not self.tracing:
+            tracemalloc.start(self.frames)
+            logger.info(f"Allocation tracing started ({self.frames} frame(s) per traceback)")
+
+    def stop(self):
+        """Stop tracing and forget the snapshots."""
+        if self.tracing:
+            tracemalloc.stop()
+            logger.info("Allocation tracing stopped")
+        self.snapshots.clear()
+
+    async def snapshot(self, name: Optional[str] = None) -> str:
+        """
+        Take a snapshot, starting tracing if needed.
+
+        Args:
+            name: Name to store the snapshot under, numbered if not given
+
+        Returns:
+            Name of the snapshot
+        """
+        self.start()
+        self._taken += 1
+        name = name or str(self._taken)
+        taken = await asyncio.get_running_loop().run_in_executor(None, self._take)
+        self.snapshots.pop(name, None)
+        self.snapshots[name] = taken
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+        return name
+
+    def _take(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    async def top(self, n: int = 10) -> List[tracemalloc.Statistic]:
+        """
+        Largest allocators right now, by source line.
+
+        Raises:
+            RuntimeError: If tracing is not running
+        """
+        if not self.tracing:
+            raise RuntimeError("Allocation tracing is not running")
+        return await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self._take().statistics("lineno")[:n]
+        )
+
+    async def diff(self, old: Optional[str] = None, new: Optional[str] = None, n: int = 10) -> List[tracemalloc.StatisticDiff]:
+        """
+        Compare two snapshots, by source line.
+
+        Args:
+            old: Earlier snapshot, the oldest kept one if not given
+            new: Later snapshot, the current allocations if not given
+            n: Number of lines to return
+
+        Returns:
+            Lines whose allocations grew or shrank the most
+
+        Raises:
+            KeyError: If a named snapshot does not exist
+            RuntimeError: If tracing is not running
+        """
+        if old is None:
+            if not self.snapshots:
+                raise KeyError("no snapshot taken yet")
+            old = next(iter(self.snapshots))
+        if old not in self.snapshots:
+            raise KeyError(old)
+        if new is not None and new not in self.snapshots:
+            raise KeyError(new)
+        if not self.tracing:
+            raise RuntimeError("Allocation tracing is not running")
+        earlier = self.snapshots[old]
+        later = self.snapshots[new] if new is not None else None
+
+        def compare():
+            return (later or self._take()).compare_to(earlier, "lineno")[:n]
+
+        return await asyncio.get_running_loop().run_in_executor(None, compare)
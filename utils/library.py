@@ -0,0 +1,236 @@
+import os
+import re
+import hashlib
+import logging
+import asyncio
+import sqlite3
+import subprocess
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+from config import Config
+from utils.audio_cache import get_cached_path, song_key
+
+# mutagen is optional, without it tags are guessed from file names
+try:
+    import mutagen
+except ImportError:
+    mutagen = None
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".ogg", ".opus", ".flac", ".wav", ".aac", ".webm")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    duration INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    title, artist, tags, content='tracks', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts(rowid, title, artist, tags) VALUES (new.id, new.title, new.artist, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, tags) VALUES ('delete', old.id, old.title, old.artist, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, tags) VALUES ('delete', old.id, old.title, old.artist, old.tags);
+    INSERT INTO tracks_fts(rowid, title, artist, tags) VALUES (new.id, new.title, new.artist, new.tags);
+END;
+"""
+
+def read_metadata(path: str) -> Dict[str, Any]:
+    """
+    Read title, artist, tags and duration of an audio file.
+
+    Uses mutagen when it is installed, otherwise parses "Artist - Title"
+    from the file name and asks ffprobe for the duration.
+
+    Args:
+        path: Path to the audio file
+
+    Returns:
+        Dictionary with title, artist, tags and duration
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    artist, _, title = name.partition(" - ")
+    if not title:
+        artist, title = "", name
+    metadata = {'title': title.strip(), 'artist': artist.strip(), 'tags': "", 'duration': 0}
+
+    if mutagen:
+        try:
+            audio = mutagen.File(path, easy=True)
+            if audio is not None:
+                tags = audio.tags or {}
+                metadata['title'] = (tags.get('title') or [metadata['title']])[0]
+                metadata['artist'] = (tags.get('artist') or [metadata['artist']])[0]
+                metadata['tags'] = " ".join(tags.get('genre', []) + tags.get('album', []))
+                metadata['duration'] = int(audio.info.length)
+                return metadata
+        except Exception as e:
+            logger.warning(f"Could not read tags of {path}: {e}")
+
+    try:
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", path],
+            capture_output=True, text=True, timeout=10
+        )
+        metadata['duration'] = int(float(output.stdout.strip() or 0))
+    except Exception as e:
+        logger.warning(f"Could not probe duration of {path}: {e}")
+
+    return metadata
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn a free-text query into an FTS5 expression.
+
+    Every word must match, the last one as a prefix so partial input still finds tracks.
+    """
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+class MediaLibrary:
+    """Index of a local music library, searched before YouTube."""
+
+    def __init__(self, root: str, index_path: str):
+        self.root = root
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(index_path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def scan(self) -> Tuple[int, int]:
+        """
+        Bring the index up to date with the files on disk.
+
+        Only new files and files whose mtime changed are read again.
+
+        Returns:
+            Number of (indexed or updated, removed) files
+        """
+        with self._lock:
+            known = {
+                path: (track_id, mtime)
+                for track_id, path, mtime in self._db.execute("SELECT id, path, mtime FROM tracks")
+            }
+
+        updated = 0
+        seen = set()
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                path = os.path.join(directory, name)
+                seen.add(path)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                if path in known and known[path][1] == mtime:
+                    continue
+
+                metadata = read_metadata(path)
+                with self._lock:
+                    self._db.execute(
+                        "INSERT INTO tracks (path, mtime, title, artist, tags, duration) "
+                        "VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(path) DO UPDATE SET mtime=excluded.mtime, title=excluded.title, "
+                        "artist=excluded.artist, tags=excluded.tags, duration=excluded.duration",
+                        (path, mtime, metadata['title'], metadata['artist'], metadata['tags'], metadata['duration'])
+                    )
+                updated += 1
+
+        removed = [path for path in known if path not in seen]
+        with self._lock:
+            self._db.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path in removed])
+            self._db.commit()
+
+        logger.info(f"Library scan finished: {updated} indexed, {len(removed)} removed")
+        return updated, len(removed)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Search the index.
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+
+        Returns:
+            List of song information dictionaries, best match first
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT t.path, t.mtime, t.title, t.artist, t.duration FROM tracks_fts "
+                "JOIN tracks t ON t.id = tracks_fts.rowid "
+                "WHERE tracks_fts MATCH ? ORDER BY bm25(tracks_fts) LIMIT ?",
+                (match, limit)
+            ).fetchall()
+
+        return [
+            {
+                # Stable per file version, so the audio cache never serves an outdated decode
+                'id': "local-" + hashlib.sha1(f"{path}:{mtime}".encode()).hexdigest()[:16],
+                'title': f"{artist} - {title}" if artist else title,
+                'uploader': artist or 'Local library',
+                'duration': duration,
+                'thumbnail': None,
+                'webpage_url': None,
+                'file_path': path,
+                'source': 'local'
+            }
+            for path, mtime, title, artist, duration in rows
+        ]
+
+    async def resolve(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the best local match for a play query.
+
+        Args:
+            query: Free-text query
+
+        Returns:
+            Song information of the best match or None
+        """
+        if query.startswith("http"):
+            return None
+        try:
+            loop = asyncio.get_event_loop()
+            results = await loop.run_in_executor(None, lambda: self.search(query, limit=1))
+            if results and os.path.exists(results[0]['file_path']):
+                song_info = results[0]
+                cached_path = get_cached_path(song_key(song_info))
+                if cached_path:
+                    song_info['file_path'] = cached_path
+                return song_info
+        except Exception as e:
+            logger.error(f"Error searching the library: {e}", exc_info=True)
+        return None
+
+    async def run_scanner(self):
+        """Rescan the library periodically."""
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.scan)
+            except Exception as e:
+                logger.error(f"Error scanning the library: {e}", exc_info=True)
+            await asyncio.sleep(Config.LIBRARY_RESCAN_INTERVAL)
@@ -0,0 +1,171 @@
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+import logging.handlers
+from typing import Dict, Tuple, Optional
+
+from config import Config
+
+# Context attached to every record logged while handling a chat or track
+chat_id_var: contextvars.ContextVar = contextvars.ContextVar("chat_id", default=None)
+track_id_var: contextvars.ContextVar = contextvars.ContextVar("track_id", default=None)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def bind_chat(chat_id):
+    """Attach a chat ID to the records logged from the current task."""
+    chat_id_var.set(chat_id)
+
+def bind_track(track_id):
+    """Attach a track ID to the records logged from the current task."""
+    track_id_var.set(track_id)
+
+class ContextFilter(logging.Filter):
+    """Copy the chat and track context onto the record in the logging thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.chat_id = chat_id_var.get()
+        record.track_id = track_id_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limit repeated warnings and errors.
+
+    Records are grouped by their call site. The first `burst` records of a
+    group in each `window` seconds pass; the rest are dropped and counted,
+    and the count is reported on the next record of the group that passes.
+    """
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        # {call site: (window start, records passed, records dropped)}
+        self._sites: Dict[Tuple[str, int], Tuple[float, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            started, passed, dropped = self._sites.get(site, (now, 0, 0))
+            if now - started >= self.window:
+                started, passed = now, 0
+
+            if passed >= self.burst:
+                self._sites[site] = (started, passed, dropped + 1)
+                return False
+
+            self._sites[site] = (started, passed + 1, 0)
+
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves the formatting to the listener thread.
+
+    The stock QueueHandler renders the message and traceback in the caller,
+    which is the event loop. Records only travel through an in-process
+    queue here, so msg, args and the exception info are passed along as
+    is and rendered by the output's formatter on the listener thread.
+    Arguments are therefore read after the call returns, which is fine for
+    the f-string messages used throughout the bot.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with chat and track context when present."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in ("chat_id", "track_id", "suppressed"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Classic text lines, with the chat ID and suppressed count appended."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        chat_id = getattr(record, "chat_id", None)
+        if chat_id is not None:
+            text += f" [chat {chat_id}]"
+        suppressed = getattr(record, "suppressed", None)
+        if suppressed:
+            text += f" ({suppressed} similar message(s) suppressed)"
+        return text
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "pyrogram=WARNING,handlers=DEBUG" into {logger: level}."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging():
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Configured by LOG_LEVEL, LOG_LEVELS (per-logger overrides), LOG_FORMAT
+    ("json" or "text") and LOG_SAMPLE_BURST/LOG_SAMPLE_WINDOW.
+    """
+    global _listener
+    if _listener:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if Config.LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(TextFormatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(Config.LOG_SAMPLE_BURST, Config.LOG_SAMPLE_WINDOW))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(Config.LOG_LEVEL.upper())
+
+    for name, level in parse_levels(Config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush queued records and stop the background thread."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,49 @@
+import time
+from typing import Dict, Any
+
+# Playback position is derived from two fields of the chat info:
+#   "started_at": wall-clock time at which position 0 of the current track played
+#   "paused_at": wall-clock time the track was paused, or None while playing
+# Pausing and resuming shift "started_at" so the position does not advance while paused.
+
+def mark_started(chat_info: Dict[str, Any], position: float = 0):
+    """Record that the current track started playing at the given position."""
+    chat_info["started_at"] = time.time() - position
+    chat_info["paused_at"] = None
+
+def mark_paused(chat_info: Dict[str, Any]):
+    """Record that the current track was paused."""
+    if chat_info.get("started_at") is not None and not chat_info.get("paused_at"):
+        chat_info["paused_at"] = time.time()
+
+def mark_resumed(chat_info: Dict[str, Any]):
+    """Record that the current track was resumed."""
+    paused_at = chat_info.get("paused_at")
+    if paused_at and chat_info.get("started_at") is not None:
+        chat_info["started_at"] += time.time() - paused_at
+    chat_info["paused_at"] = None
+
+def get_position(chat_info: Dict[str, Any]) -> float:
+    """
+    Get the playback position of the current track.
+
+    Returns:
+        Position in seconds, 0 if nothing is playing
+    """
+    started_at = chat_info.get("started_at")
+    if started_at is None or not chat_info.get("current"):
+        return 0
+    now = chat_info.get("paused_at") or time.time()
+    return max(0, now - started_at)
+
+def get_remaining(chat_info: Dict[str, Any]) -> float:
+    """
+    Get the time left of the current track.
+
+    Returns:
+        Remaining seconds, or None if the track has no known duration
+    """
+    current = chat_info.get("current")
+    if not current or not current.get("duration"):
+        return None
+    return current["duration"] - get_position(chat_info)
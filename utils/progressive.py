@@ -0,0 +1,261 @@
+import os
+import time
+import logging
+import asyncio
+from typing import Optional, Dict, Any
+
+from config import Config
+from utils.youtube import fetch_metadata, make_song_info, download_info, find_local, get_tier, TrackRejected
+from utils.audio_cache import (
+    RAW_FORMAT, RAW_SAMPLE_RATE, RAW_CHANNELS, RAW_BYTES_PER_SECOND,
+    get_cache_path, song_key
+)
+from utils.scheduler import network, PRIORITY_USER
+from utils.position import mark_paused, mark_resumed
+
+logger = logging.getLogger(__name__)
+
+# How long the call's ffmpeg keeps waiting for new data at the end of a growing file
+FOLLOW_TIMEOUT_SECONDS = 5
+
+# Buffer level (in seconds ahead of playback) below which playback is paused
+UNDERRUN_SECONDS = 1
+
+POLL_INTERVAL = 0.25
+
+class ProgressiveDownload:
+    """A track being decoded into a growing raw file while it is played."""
+
+    def __init__(self, song_info: Dict[str, Any], priority: int = PRIORITY_USER,
+                 chat_id: Optional[int] = None):
+        self.song_info = song_info
+        self.priority = priority
+        self.chat_id = chat_id
+        self.path = f"{Config.DOWNLOAD_PATH}{song_key(song_info)}.stream.raw"
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.done = asyncio.Event()
+        self.failed = False
+
+    @property
+    def written_bytes(self) -> int:
+        """Number of bytes decoded so far."""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    async def start(self):
+        """Start decoding the remote stream into the growing file."""
+        headers = "".join(
+            f"{key}: {value}\r\n"
+            for key, value in (self.song_info.get('http_headers') or {}).items()
+        )
+        args = ["ffmpeg", "-y", "-loglevel", "error",
+                "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5"]
+        if headers:
+            args += ["-headers", headers]
+        args += ["-i", self.song_info['stream_url'],
+                 "-f", RAW_FORMAT, "-ar", str(RAW_SAMPLE_RATE), "-ac", str(RAW_CHANNELS),
+                 self.path]
+
+        # The decoder fetches from the network for its whole lifetime
+        await network.acquire(self.priority, self.chat_id)
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except Exception:
+            network.release()
+            raise
+        _active[self.path] = self
+        asyncio.create_task(self._wait())
+
+    async def _wait(self):
+        """Wait for the decoder to exit and publish the finished file."""
+        try:
+            _, stderr = await self.process.communicate()
+            if self.process.returncode != 0:
+                self.failed = True
+                logger.warning(
+                    f"Progressive download of {self.song_info['id']} failed: "
+                    f"{stderr.decode(errors='ignore').strip()}"
+                )
+            elif Config.AUDIO_CACHE and os.path.exists(self.path):
+                # Keep the complete file as the pre-decoded cache entry
+                cache_path = get_cache_path(song_key(self.song_info))
+                os.replace(self.path, cache_path)
+                self.song_info['file_path'] = cache_path
+            else:
+                self.song_info['file_path'] = self.path
+        except Exception as e:
+            self.failed = True
+            logger.error(f"Error finishing progressive download: {e}", exc_info=True)
+        finally:
+            network.release()
+            _active.pop(self.path, None)
+            self.done.set()
+
+    async def wait_for_buffer(self, seconds: float, timeout: float) -> bool:
+        """
+        Wait until enough audio is buffered to start playing.
+
+        Args:
+            seconds: Amount of audio to buffer
+            timeout: Maximum time to wait
+
+        Returns:
+            True if playback can start, False if the download stalled or failed
+        """
+        target = seconds * RAW_BYTES_PER_SECOND
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.done.is_set():
+                return not self.failed
+            if self.written_bytes >= target:
+                return True
+            await asyncio.sleep(POLL_INTERVAL)
+        return False
+
+    def stop(self):
+        """Stop the decoder and remove the partial file."""
+        if self.process and self.process.returncode is None:
+            self.process.kill()
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except OSError:
+            pass
+
+    async def monitor(self, bot, chat_id):
+        """
+        Pause the call when playback catches up with the download.
+
+        Args:
+            bot: The MusicBot instance
+            chat_id: Chat ID the track is playing in
+        """
+        started = time.monotonic()
+        paused_for = 0.0
+        paused_at = None
+        low_mark = UNDERRUN_SECONDS * RAW_BYTES_PER_SECOND
+        resume_mark = Config.PROGRESSIVE_BUFFER_SECONDS * RAW_BYTES_PER_SECOND
+
+        while not self.done.is_set():
+            await asyncio.sleep(POLL_INTERVAL)
+
+            current = bot.active_chats.get(chat_id, {}).get("current")
+            if not current or current.get('file_path') != self.path:
+                # Skipped or stopped, nothing to feed anymore
+                if not os.path.exists(self.path):
+                    self.stop()
+                return
+
+            now = time.monotonic()
+            played = (now - started - paused_for) * RAW_BYTES_PER_SECOND
+            ahead = self.written_bytes - played
+
+            try:
+                if paused_at is None and ahead < low_mark:
+                    logger.warning(f"Buffer underrun in chat {chat_id}, pausing until the download catches up")
+                    await bot.call_py.pause_stream(chat_id)
+                    mark_paused(bot.active_chats[chat_id])
+                    paused_at = now
+                elif paused_at is not None and ahead >= resume_mark:
+                    await bot.call_py.resume_stream(chat_id)
+                    mark_resumed(bot.active_chats[chat_id])
+                    paused_for += now - paused_at
+                    paused_at = None
+            except Exception as e:
+                logger.error(f"Error handling buffer underrun: {e}", exc_info=True)
+                return
+
+        if paused_at is not None:
+            try:
+                await bot.call_py.resume_stream(chat_id)
+                mark_resumed(bot.active_chats[chat_id])
+            except Exception as e:
+                logger.error(f"Error resuming after underrun: {e}", exc_info=True)
+
+# Downloads whose file is still growing, keyed by file path
+_active: Dict[str, ProgressiveDownload] = {}
+
+def is_growing(file_path: Optional[str]) -> bool:
+    """Check whether a file is still being written by a progressive download."""
+    return file_path in _active
+
+def follow_parameters() -> str:
+    """
+    Get the ffmpeg input parameters for reading a growing file.
+
+    Returns:
+        Parameters that make ffmpeg wait for new data at the end of the file
+        instead of treating it as the end of the stream
+    """
+    return f"-follow 1 -rw_timeout {FOLLOW_TIMEOUT_SECONDS * 1000000}"
+
+def start_monitor(bot, chat_id, file_path: str):
+    """Start underrun detection for a growing file that just started playing."""
+    download = _active.get(file_path)
+    if download:
+        asyncio.create_task(download.monitor(bot, chat_id))
+
+async def download_complete(info: Dict[str, Any], priority: int,
+                            chat_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Download the whole track from already extracted metadata."""
+    return await download_info(info, chat_id, priority)
+
+async def download_audio_progressive(url: str, priority: int = PRIORITY_USER,
+                                     chat_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Start downloading audio and return once the initial buffer is filled.
+
+    Falls back to a complete download if the stream cannot be fetched
+    progressively or does not fill the buffer in time.
+
+    Args:
+        url: YouTube URL or search query
+        priority: Scheduling priority class of the download
+        chat_id: Chat the download is for, used for fair queuing
+
+    Returns:
+        Dictionary containing song information or None if download failed
+
+    Raises:
+        TrackRejected: If the video fails the preflight check
+    """
+    try:
+        info = await fetch_metadata(url, chat_id)
+        if not info:
+            return None
+        tier = get_tier(chat_id)
+        local = find_local(info['id'], tier)
+        if local:
+            tier, file_path = local
+            song_info = make_song_info(info, tier=tier)
+            song_info['file_path'] = file_path
+            return song_info
+        song_info = make_song_info(info, tier=tier)
+
+        if not song_info.get('stream_url'):
+            return await download_complete(info, priority, chat_id)
+
+        download = ProgressiveDownload(song_info, priority, chat_id)
+        await download.start()
+        song_info['fetched'] = True
+
+        if await download.wait_for_buffer(Config.PROGRESSIVE_BUFFER_SECONDS, Config.PROGRESSIVE_START_TIMEOUT):
+            if not download.done.is_set():
+                song_info['file_path'] = download.path
+            logger.info(f"Starting {song_info['id']} after buffering {download.written_bytes} bytes")
+            return song_info
+
+        logger.warning(f"Progressive download of {song_info['id']} stalled, waiting for the full download")
+        download.stop()
+        return await download_complete(info, priority, chat_id)
+    except TrackRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error in progressive download: {e}", exc_info=True)
+        return None
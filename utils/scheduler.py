@@ -0,0 +1,116 @@
+import logging
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower runs first
+PRIORITY_NEXT_UP = 0   # Next track of a chat that is currently playing
+PRIORITY_USER = 1      # Track requested with a play command
+PRIORITY_PREFETCH = 2  # Background work nobody is waiting for
+
+PRIORITIES = (PRIORITY_NEXT_UP, PRIORITY_USER, PRIORITY_PREFETCH)
+
+class ResourcePool:
+    """
+    Admission control for a limited resource (network fetches, ffmpeg work).
+
+    Waiters are served by priority class first; within a class, chats are
+    served round-robin so a single chat queueing many jobs cannot starve the
+    others.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.active = 0
+        # {priority: {chat_id: deque of futures}}
+        self._waiters: Dict[int, "OrderedDict[Optional[int], Deque[asyncio.Future]]"] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+
+    @property
+    def waiting(self) -> int:
+        """Number of jobs waiting for a slot."""
+        return sum(
+            len(futures)
+            for chats in self._waiters.values()
+            for futures in chats.values()
+        )
+
+    async def acquire(self, priority: int = PRIORITY_USER, chat_id: Optional[int] = None):
+        """
+        Wait for a free slot.
+
+        Args:
+            priority: Priority class of the job
+            chat_id: Chat the job is for, used for fair queuing
+        """
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].setdefault(chat_id, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as the waiter was cancelled
+                self.release()
+            else:
+                self._remove(priority, chat_id, future)
+            raise
+
+    def release(self):
+        """Free a slot and hand it to the next waiter."""
+        future = self._next_waiter()
+        if future:
+            # The slot passes directly to the waiter, active stays the same
+            future.set_result(None)
+        else:
+            self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_USER, chat_id: Optional[int] = None):
+        """Hold a slot for the duration of a block."""
+        await self.acquire(priority, chat_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pop the next waiter by priority, rotating between chats."""
+        for priority in PRIORITIES:
+            chats = self._waiters[priority]
+            while chats:
+                chat_id, futures = next(iter(chats.items()))
+                future = futures.popleft()
+                if futures:
+                    chats.move_to_end(chat_id)
+                else:
+                    del chats[chat_id]
+                if not future.done():
+                    return future
+        return None
+
+    def _remove(self, priority: int, chat_id: Optional[int], future: asyncio.Future):
+        """Remove a cancelled waiter."""
+        futures = self._waiters[priority].get(chat_id)
+        if futures and future in futures:
+            futures.remove(future)
+            if not futures:
+                del self._waiters[priority][chat_id]
+
+    def stats(self) -> Dict[str, int]:
+        """Current usage of the pool."""
+        return {"active": self.active, "waiting": self.waiting, "limit": self.limit}
+
+# Global pools shared by every chat
+network = ResourcePool("network", Config.MAX_CONCURRENT_DOWNLOADS)
+transcode = ResourcePool("ffmpeg", Config.MAX_CONCURRENT_TRANSCODES)
@@ -0,0 +1,85 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
+
+from utils.track_index import normalize
+
+logger = logging.getLogger(__name__)
+
+class SearchCache:
+    """
+    Search results shared by everyone, keyed by normalized query.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    dropped beyond `size`. Concurrent searches for the same query share a
+    single lookup.
+    """
+
+    def __init__(self, search: Callable[[str], Awaitable[List[Dict[str, Any]]]], size: int, ttl: int):
+        self._search = search
+        self.size = size
+        self.ttl = ttl
+        # {normalized query: (expiry time, results)}
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Get the cached results of a query, or None if not cached."""
+        key = normalize(query)
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def search(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Get the results of a query, searching only if they are not cached.
+
+        Args:
+            query: Search query as typed
+
+        Returns:
+            List of song information dictionaries
+        """
+        cached = self.get(query)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        key = normalize(query)
+        if key in self._inflight:
+            self.hits += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            results = await self._search(query)
+            if results:
+                # Failed searches are not cached, the next keystroke retries
+                self._entries[key] = (time.monotonic() + self.ttl, results)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+            future.set_result(results)
+            return results
+        except Exception as e:
+            future.set_result([])
+            logger.error(f"Error searching for {query}: {e}", exc_info=True)
+            return []
+        finally:
+            if not future.done():
+                # Cancelled: don't leave the other waiters hanging
+                future.set_result([])
+            self._inflight.pop(key, None)
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from typing import Dict, Any, Set
+
+from config import Config
+from utils.audio_cache import RAW_BYTES_PER_SECOND
+from utils.decoder import Decoder, frame_align
+
+logger = logging.getLogger(__name__)
+
+# Bytes decoded per read from the shared decoder, 100 ms of audio
+CHUNK_BYTES = RAW_BYTES_PER_SECOND // 10
+
+# Shared sources still accepting listeners, by file path
+_sources: Dict[str, "SharedSource"] = {}
+
+# Every shared source with listeners
+_active: Set["SharedSource"] = set()
+
+class SharedSource:
+    """
+    One decoder whose output is read by several chats.
+
+    Audio is decoded on demand for the listener furthest ahead and kept
+    until the listener furthest behind has read it. New listeners can join
+    while the source is within SHARED_JOIN_SECONDS of the start of the
+    track; they start from the beginning like everyone else. A listener
+    falling more than SHARED_MAX_LAG_SECONDS behind the others is detached
+    onto a decoder of its own, so the buffer stays bounded.
+    """
+
+    def __init__(self, song: Dict[str, Any]):
+        self.path = song['file_path']
+        self.decoder = Decoder(song)
+        self.readers: Set["SharedReader"] = set()
+        self.buffer = bytearray()
+        # Track offset of the first byte in the buffer
+        self.base = 0
+        self.opened = False
+        self.eof = False
+        self.join_bytes = frame_align(int(Config.SHARED_JOIN_SECONDS * RAW_BYTES_PER_SECOND))
+        self.max_lag_bytes = frame_align(int(Config.SHARED_MAX_LAG_SECONDS * RAW_BYTES_PER_SECOND))
+        self._lock = asyncio.Lock()
+
+    @property
+    def end(self) -> int:
+        """Track offset right after the last decoded byte."""
+        return self.base + len(self.buffer)
+
+    @property
+    def joinable(self) -> bool:
+        """Whether a new listener can still start from the beginning."""
+        return self.base == 0 and self.end <= self.join_bytes and not self.decoder.closed
+
+    async def fill(self, offset: int):
+        """Decode until the byte at `offset` is available or the track ends."""
+        async with self._lock:
+            if not self.opened:
+                self.opened = True
+                await self.decoder.open()
+            while self.end <= offset and not self.eof:
+                chunk = await self.decoder.read(CHUNK_BYTES)
+                if not chunk:
+                    self.eof = True
+                    break
+                self.buffer += chunk
+                if not self.joinable and _sources.get(self.path) is self:
+                    # Late listeners get a source of their own
+                    del _sources[self.path]
+            self.trim()
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Read decoded bytes starting at a track offset."""
+        start = offset - self.base
+        return bytes(self.buffer[start:start + size])
+
+    def trim(self):
+        """Drop audio every listener has read, detaching listeners too far behind."""
+        if self.joinable or not self.readers:
+            return
+
+        for reader in [r for r in self.readers if self.end - r.cursor > self.max_lag_bytes]:
+            logger.info(f"Detaching a listener {(self.end - reader.cursor) / RAW_BYTES_PER_SECOND:.0f}s behind on {self.path}")
+            reader.detach()
+
+        low = min((r.cursor for r in self.readers), default=self.end)
+        if low > self.base:
+            del self.buffer[:low - self.base]
+            self.base = low
+
+    def remove(self, reader: "SharedReader"):
+        """Forget a listener; the decoder stops with the last one."""
+        self.readers.discard(reader)
+        if self.readers:
+            self.trim()
+            return
+        self.decoder.close()
+        self.buffer.clear()
+        _active.discard(self)
+        if _sources.get(self.path) is self:
+            del _sources[self.path]
+
+class SharedReader(Decoder):
+    """A chat's view of a shared source, used like a decoder of its own."""
+
+    def __init__(self, song: Dict[str, Any], source: SharedSource):
+        super().__init__(song)
+        self.source = source
+        self.cursor = 0
+        self.detached = False
+
+    async def open(self):
+        """The shared decoder is opened by the first read."""
+
+    async def _read_source(self, size: int) -> bytes:
+        if self.closed:
+            return b""
+
+        if self.detached:
+            if not self.process and not self.file:
+                # Carry on with a decoder of our own where the shared one left us
+                self.position = self.cursor / RAW_BYTES_PER_SECOND
+                await Decoder.open(self)
+            return await Decoder._read_source(self, size)
+
+        await self.source.fill(self.cursor)
+        if self.detached:
+            return await self._read_source(size)
+        data = self.source.read_at(self.cursor, size)
+        self.cursor += len(data)
+        return data
+
+    def detach(self):
+        """Stop sharing; later reads decode on their own."""
+        self.detached = True
+        self.source.readers.discard(self)
+
+    def close(self):
+        super().close()
+        if not self.detached:
+            self.detached = True
+            self.source.remove(self)
+
+def open_shared(song: Dict[str, Any]) -> SharedReader:
+    """
+    Get a reader for a track, sharing the decoder of a chat that just started it.
+
+    Args:
+        song: Song information dictionary
+
+    Returns:
+        Reader positioned at the start of the track
+    """
+    source = _sources.get(song['file_path'])
+    if not source or not source.joinable:
+        source = SharedSource(song)
+        _sources[song['file_path']] = source
+        _active.add(source)
+    reader = SharedReader(song, source)
+    source.readers.add(reader)
+    return reader
+
+def shared_stats() -> Dict[str, int]:
+    """Number of shared decoders running, of those still joinable, and of chats reading them."""
+    return {
+        "sources": len(_active),
+        "joinable": len(_sources),
+        "listeners": sum(len(source.readers) for source in _active),
+    }
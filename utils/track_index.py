@@ -0,0 +1,280 @@
+import os
+import re
+import json
+import time
+import logging
+import asyncio
+import unicodedata
+from collections import Counter
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Fields of the song information kept in the index
+STORED_FIELDS = ('id', 'title', 'uploader', 'duration', 'thumbnail', 'webpage_url', 'file_path', 'tier')
+
+# Minimum lead of the best match over the runner-up for a confident answer
+MATCH_MARGIN = 0.1
+
+# Typos allowed per this many letters of a query word for it to count as present in a text
+LETTERS_PER_TYPO = 4
+
+# Seconds to wait before writing changes, so bursts of plays cause a single write
+SAVE_DELAY = 5
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+def ngrams(text: str) -> Set[str]:
+    """Character bigrams of every word, padded so word boundaries count."""
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 2] for i in range(len(padded) - 1))
+    return grams
+
+def edit_distance(a: str, b: str) -> int:
+    """Insertions, deletions, substitutions and swaps of adjacent letters turning a into b."""
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1])
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+def word_coverage(query: str, text: str) -> float:
+    """Share of the query's words that appear in a text, allowing a typo every few letters."""
+    words = set(text.split())
+    query_words = query.split()
+    found = 0
+    for query_word in query_words:
+        if query_word in words:
+            found += 1
+            continue
+        typos = max(1, len(query_word) // LETTERS_PER_TYPO)
+        # Words differing more in length cannot be close enough, skip the distance
+        if any(abs(len(query_word) - len(word)) <= typos and edit_distance(query_word, word) <= typos
+               for word in words):
+            found += 1
+    return found / len(query_words)
+
+class TrackIndex:
+    """
+    Persistent history of resolved tracks with a fuzzy lookup index.
+
+    Every query that resolved to a track, and the track's title, are indexed
+    by character bigrams. A new query is scored against them by Dice
+    similarity, weighted twice, and how much of the query the text covers,
+    scaled by the share of the query's words the text contains. Misspellings
+    and most of a title resolve without a YouTube search, while a query with
+    words the text lacks ("believer live") or a single word of a longer
+    title does not.
+    """
+
+    def __init__(self, path: str, max_tracks: int):
+        self.path = path
+        self.max_tracks = max_tracks
+        # {track id: stored song info + "queries" + "last_played"}
+        self.tracks: Dict[str, Dict[str, Any]] = {}
+        # {normalized text: track id}, one entry per query variant and title
+        self._texts: Dict[str, str] = {}
+        # {n-gram: set of normalized texts}
+        self._postings: Dict[str, Set[str]] = {}
+        self._gram_counts: Dict[str, int] = {}
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self.load()
+
+    def load(self):
+        """Load the history from disk."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.tracks = json.load(f)
+            for track_id, entry in self.tracks.items():
+                self._index_track(track_id, entry)
+            logger.info(f"Loaded {len(self.tracks)} tracks into the play history index")
+        except Exception as e:
+            logger.error(f"Error loading play history from {self.path}: {e}", exc_info=True)
+            self.tracks = {}
+
+    def _index_text(self, text: str, track_id: str):
+        """Add a normalized text to the n-gram index."""
+        if not text:
+            return
+        if text in self._texts:
+            self._texts[text] = track_id
+            return
+        self._texts[text] = track_id
+        grams = ngrams(text)
+        self._gram_counts[text] = len(grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(text)
+
+    def _unindex_text(self, text: str):
+        """Remove a normalized text from the n-gram index."""
+        self._texts.pop(text, None)
+        self._gram_counts.pop(text, None)
+        for gram in ngrams(text):
+            texts = self._postings.get(gram)
+            if texts:
+                texts.discard(text)
+                if not texts:
+                    del self._postings[gram]
+
+    def _index_track(self, track_id: str, entry: Dict[str, Any]):
+        """Index the title and every query variant of a track."""
+        self._index_text(normalize(entry['title']), track_id)
+        for query in entry.get('queries', []):
+            self._index_text(query, track_id)
+
+    def record(self, query: str, song_info: Dict[str, Any]):
+        """
+        Remember that a query resolved to a track.
+
+        Args:
+            query: Query as typed by the user
+            song_info: Song information the query resolved to
+        """
+        if not song_info or not song_info.get('id') or not song_info.get('webpage_url'):
+            return
+
+        track_id = song_info['id']
+        entry = self.tracks.setdefault(track_id, {'queries': []})
+        entry.update({field: song_info.get(field) for field in STORED_FIELDS})
+        entry['last_played'] = time.time()
+
+        variant = normalize(query)
+        if variant and variant not in entry['queries']:
+            entry['queries'].append(variant)
+        self._index_track(track_id, entry)
+
+        if len(self.tracks) > self.max_tracks:
+            self._evict()
+        self._schedule_save()
+
+    def _evict(self):
+        """Forget the least recently played tracks beyond the size limit."""
+        by_age = sorted(self.tracks, key=lambda track_id: self.tracks[track_id].get('last_played', 0))
+        for track_id in by_age[:len(self.tracks) - self.max_tracks]:
+            entry = self.tracks.pop(track_id)
+            for text in [normalize(entry['title'])] + entry.get('queries', []):
+                if self._texts.get(text) == track_id:
+                    self._unindex_text(text)
+
+    def search(self, query: str, limit: int = 1, min_score: float = 0.0) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Find the tracks closest to a query.
+
+        Texts are ranked by their bigram score first. The word check only
+        lowers a score, so it runs on the best texts until no remaining one
+        can enter the results, never on the whole index.
+
+        Args:
+            query: Query as typed by the user
+            limit: Maximum number of results
+            min_score: Lowest similarity worth returning
+
+        Returns:
+            List of (similarity between 0 and 1, stored song info), best first
+        """
+        text = normalize(query)
+        if not text:
+            return []
+
+        # Exact repeat of a known query or title
+        if text in self._texts:
+            return [(1.0, self.tracks[self._texts[text]])]
+
+        grams = ngrams(text)
+        shared = Counter()
+        for gram in grams:
+            # Counted in C, the index shares common bigrams between most texts
+            shared.update(self._postings.get(gram, ()))
+
+        scored = []
+        for candidate, count in shared.items():
+            dice = 2 * count / (len(grams) + self._gram_counts[candidate])
+            coverage = count / len(grams)
+            score = (2 * dice + coverage) / 3
+            if score >= min_score:
+                scored.append((score, candidate))
+        scored.sort(reverse=True)
+
+        best: Dict[str, float] = {}
+        for score, candidate in scored:
+            if len(best) >= limit and score <= sorted(best.values(), reverse=True)[limit - 1]:
+                # Ranked by an upper bound of the final score, nothing further can make it
+                break
+            track_id = self._texts[candidate]
+            if score <= best.get(track_id, 0):
+                continue
+            # Bigrams shared across words hide query words the text does not have
+            score *= word_coverage(text, candidate)
+            if score >= min_score and score > best.get(track_id, 0):
+                best[track_id] = score
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(score, self.tracks[track_id]) for track_id, score in ranked]
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a query from history if the match is confident enough.
+
+        Args:
+            query: Query as typed by the user
+
+        Returns:
+            Copy of the stored song information or None to fall back to search
+        """
+        # A runner-up within the margin of a confident match makes it ambiguous
+        results = self.search(query, limit=2, min_score=Config.HISTORY_MATCH_THRESHOLD - MATCH_MARGIN)
+        if not results:
+            return None
+        score, entry = results[0]
+        if score < Config.HISTORY_MATCH_THRESHOLD:
+            return None
+        if len(results) > 1 and score - results[1][0] < MATCH_MARGIN:
+            # Two songs match about equally well, let YouTube decide
+            return None
+        logger.info(f"Resolved '{query}' from play history as {entry['id']} (score {score:.2f})")
+        return {field: entry.get(field) for field in STORED_FIELDS}
+
+    def _schedule_save(self):
+        """Write the history to disk shortly, off the event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(SAVE_DELAY, self._save_soon, loop)
+
+    def _save_soon(self, loop):
+        self._save_handle = None
+        snapshot = json.dumps(self.tracks)
+        loop.run_in_executor(None, self._write, snapshot)
+
+    def save(self):
+        """Write the history to disk."""
+        self._write(json.dumps(self.tracks))
+
+    def _write(self, data: str):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving play history to {self.path}: {e}", exc_info=True)
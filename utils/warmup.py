@@ -0,0 +1,291 @@
+import os
+import re
+import time
+import logging
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Tuple
+
+from config import Config
+from utils.youtube import download_audio, cleanup_file, extractor_breaker, get_tier, TrackRejected
+from utils.audio_cache import track_key
+from utils.history import pin_file, unpin_file, is_pinned, HISTORY_FIELDS
+from utils.chat_settings import meets_tier
+from utils.scheduler import network, PRIORITY_PREFETCH
+
+logger = logging.getLogger(__name__)
+
+# Most video IDs tracked at once, the least popular are forgotten beyond this
+MAX_TRACKED = 5000
+
+# Weight of a search result shown inline, compared to a play request
+SEARCH_WEIGHT = 0.5
+
+VIDEO_ID_PATTERN = re.compile(r"(?:[?&]v=|youtu\.be/|/shorts/|/embed/)([\w-]{11})")
+
+def video_id_from_url(url: str) -> Optional[str]:
+    """Video ID of a YouTube URL, or None if it is not one."""
+    match = VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+class PopularityTracker:
+    """
+    Request frequency of every video over sliding windows.
+
+    A video's score is its request rate per hour averaged over the windows,
+    so a short window lets a wave that just started rank high while a long
+    one keeps steady favourites from dropping out between waves.
+    """
+
+    def __init__(self, windows: List[int]):
+        self.windows = sorted(windows)
+        # {video ID: deque of (time, weight)}, oldest first
+        self._requests: Dict[str, Deque[Tuple[float, float]]] = {}
+        # {video ID: latest song information}
+        self.songs: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, song: Dict[str, Any], weight: float = 1.0):
+        """Count a request for a song."""
+        if not song.get('id') or not song.get('webpage_url'):
+            return
+        self._requests.setdefault(song['id'], deque()).append((time.monotonic(), weight))
+        # The file and its tier are the requester's, the warmer fetches its own
+        self.songs[song['id']] = {key: song[key] for key in HISTORY_FIELDS if key in song and key not in ('file_path', 'tier')}
+
+    def _expire(self, now: float):
+        """Drop requests older than the longest window and forget idle videos."""
+        horizon = now - self.windows[-1]
+        for video_id in list(self._requests):
+            requests = self._requests[video_id]
+            while requests and requests[0][0] < horizon:
+                requests.popleft()
+            if not requests:
+                del self._requests[video_id]
+                self.songs.pop(video_id, None)
+
+    def score(self, video_id: str, now: Optional[float] = None) -> float:
+        """Weighted requests per hour, averaged over the windows."""
+        now = now or time.monotonic()
+        requests = self._requests.get(video_id) or ()
+        rates = [
+            sum(weight for at, weight in requests if at >= now - window) * 3600 / window
+            for window in self.windows
+        ]
+        return sum(rates) / len(rates)
+
+    def top(self, k: int, min_requests: float) -> List[Tuple[str, float]]:
+        """
+        Most popular videos right now.
+
+        Args:
+            k: Number of videos
+            min_requests: Weighted requests needed in the longest window to count as trending
+
+        Returns:
+            (video ID, score) pairs, best first
+        """
+        now = time.monotonic()
+        self._expire(now)
+        ranked = sorted(
+            ((video_id, self.score(video_id, now)) for video_id, requests in self._requests.items()
+             if sum(weight for _, weight in requests) >= min_requests),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        if len(self._requests) > MAX_TRACKED:
+            for video_id in sorted(self._requests, key=lambda v: self.score(v, now))[:len(self._requests) - MAX_TRACKED]:
+                del self._requests[video_id]
+                self.songs.pop(video_id, None)
+        return ranked[:k]
+
+class CacheWarmer:
+    """
+    Downloads trending tracks before anyone asks for them again.
+
+    Requests from play commands and inline searches feed a popularity
+    tracker. Every WARMUP_INTERVAL seconds, when no download is running,
+    the top WARMUP_TOP_K videos are downloaded one at a time at prefetch
+    priority. Warmed files are pinned so playback cleanup keeps them, and
+    the least popular are released when the total goes over
+    WARMUP_BUDGET_MB.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.tracker = PopularityTracker(Config.WARMUP_WINDOWS)
+        self.budget = Config.WARMUP_BUDGET_MB * 1024 * 1024
+        # {video ID: song information of the warmed file}
+        self.warm: Dict[str, Dict[str, Any]] = {}
+        self.sizes: Dict[str, int] = {}
+        # Resolutions counted since startup
+        self.requests = 0
+        self.warm_hits = 0
+        self.cold = 0
+        self.warmed = 0
+
+    @property
+    def warm_bytes(self) -> int:
+        return sum(self.sizes.values())
+
+    def record(self, song: Dict[str, Any], cold: bool):
+        """
+        Count a play request.
+
+        Args:
+            song: Song information the request resolved to
+            cold: Whether it had to be downloaded
+        """
+        self.requests += 1
+        if cold:
+            self.cold += 1
+        elif self.is_warm(song.get('file_path')):
+            # However it was found: warm cache, play history index or on disk
+            self.warm_hits += 1
+        self.tracker.record(song)
+
+    def record_search(self, results: List[Dict[str, Any]]):
+        """Count the top result of an inline search as a weaker signal."""
+        if results:
+            self.tracker.record(results[0], SEARCH_WEIGHT)
+
+    def lookup(self, url: str, tier: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a warmed track for a YouTube URL, without extracting anything.
+
+        Args:
+            url: YouTube URL
+            tier: Quality tier of the requesting chat, lower tier files are not used
+
+        Returns:
+            Song information with the warmed file, or None if not warmed
+        """
+        video_id = video_id_from_url(url)
+        song = self.warm.get(video_id) if video_id else None
+        if not song or not os.path.exists(song['file_path']) or not meets_tier(song.get('tier'), tier):
+            return None
+        logger.info(f"Playing {video_id} from the warm cache")
+        return dict(song)
+
+    def is_warm(self, file_path: Optional[str]) -> bool:
+        """Whether a file was downloaded by the warm-up."""
+        return bool(file_path) and any(song['file_path'] == file_path for song in self.warm.values())
+
+    def is_idle(self) -> bool:
+        """Whether the link is free: no download running or waiting."""
+        return not network.active and not network.waiting and not extractor_breaker.is_open
+
+    def in_use(self, file_path: str) -> bool:
+        """Whether a chat is playing or has queued a file."""
+        for chat_info in list(self.bot.active_chats.values()):
+            current = chat_info.get("current")
+            if current and current.get('file_path') == file_path:
+                return True
+            if any(song.get('file_path') == file_path for song in chat_info.get("queue") or ()):
+                return True
+        return False
+
+    def release(self, video_id: str):
+        """Stop keeping a warmed file; it is removed once nothing else holds it."""
+        song = self.warm.pop(video_id, None)
+        self.sizes.pop(video_id, None)
+        if song and unpin_file(song['file_path']) and not self.in_use(song['file_path']):
+            cleanup_file(song['file_path'])
+
+    async def warm_one(self, video_id: str) -> bool:
+        """
+        Download a trending video and pin it.
+
+        Returns:
+            True if the file is now warm
+        """
+        song = self.tracker.songs.get(video_id)
+        if not song:
+            return False
+
+        # Warmed at the default tier, like any download without a chat
+        tier = get_tier(None)
+        kept_path = f"{Config.DOWNLOAD_PATH}{track_key(video_id, tier)}.mp3"
+        if is_pinned(kept_path) and os.path.exists(kept_path):
+            # Still on disk for a chat's "Previous", keep it a while longer
+            downloaded = dict(song, file_path=kept_path, tier=tier)
+        else:
+            try:
+                downloaded = await download_audio(song['webpage_url'], PRIORITY_PREFETCH)
+            except TrackRejected as e:
+                logger.debug(f"Not warming {video_id}: {e}")
+                return False
+            if not downloaded or not downloaded.get('file_path') or not os.path.exists(downloaded['file_path']):
+                return False
+
+        pin_file(downloaded['file_path'])
+        self.warm[video_id] = {key: downloaded[key] for key in HISTORY_FIELDS if key in downloaded}
+        self.sizes[video_id] = os.path.getsize(downloaded['file_path'])
+        self.warmed += 1
+        return True
+
+    def enforce_budget(self, keep: List[str]):
+        """
+        Release the least popular warm files until the budget is met.
+
+        Args:
+            keep: Trending video IDs, released only after every other one
+        """
+        scores = {video_id: self.tracker.score(video_id) for video_id in self.warm}
+        for video_id in sorted(self.warm, key=lambda v: (v in keep, scores[v])):
+            if self.warm_bytes <= self.budget:
+                break
+            self.release(video_id)
+
+    async def warm_up(self):
+        """Warm the trending tracks that are not warm yet, while the link is idle."""
+        trending = self.tracker.top(Config.WARMUP_TOP_K, Config.WARMUP_MIN_REQUESTS)
+        keep = [video_id for video_id, _ in trending]
+
+        # Out of every window: nobody asked for it in a long time
+        for video_id in [v for v in self.warm if self.tracker.score(v) == 0]:
+            self.release(video_id)
+
+        for video_id, score in trending:
+            if video_id in self.warm:
+                continue
+            if not self.is_idle():
+                logger.debug("Warm-up paused, downloads are running")
+                return
+            if not await self.warm_one(video_id):
+                continue
+            self.enforce_budget(keep)
+            if video_id not in self.warm:
+                # Less popular than everything kept, the rest would not fit either
+                return
+            logger.info(f"Warmed {video_id} (score {score:.1f}/h), {self.format_report()}")
+
+    async def run(self):
+        """Warm the cache periodically."""
+        while True:
+            await asyncio.sleep(Config.WARMUP_INTERVAL)
+            try:
+                await self.warm_up()
+            except Exception as e:
+                logger.error(f"Error warming the cache: {e}", exc_info=True)
+
+    def report(self) -> Dict[str, Any]:
+        """Hit rates since startup and the warm cache usage."""
+        return {
+            "requests": self.requests,
+            "warm_hits": self.warm_hits,
+            "cold": self.cold,
+            "hit_rate": (self.requests - self.cold) / self.requests if self.requests else 0.0,
+            "warm_hit_rate": self.warm_hits / self.requests if self.requests else 0.0,
+            "warm_tracks": len(self.warm),
+            "warm_bytes": self.warm_bytes,
+            "warmed": self.warmed,
+        }
+
+    def format_report(self) -> str:
+        """Human-readable version of the report."""
+        report = self.report()
+        return (
+            f"{report['requests']} request(s), {report['hit_rate']:.0%} served without downloading, "
+            f"{report['warm_hit_rate']:.0%} from the warm cache; "
+            f"{report['warm_tracks']} warm track(s), {report['warm_bytes'] / 1024 / 1024:.0f} of {Config.WARMUP_BUDGET_MB} MB"
+        )
@@ -1,16 +1,53 @@
 import os
 import logging
 import asyncio
-from typing import Optional, Dict, Any
+from functools import partial
+from typing import Optional, Dict, Any, List, Tuple
 import yt_dlp
 
 from config import Config
+from utils.audio_cache import get_cached_path, is_raw_file, track_key
+from utils.scheduler import network, transcode, PRIORITY_USER
+from utils.circuit_breaker import CircuitBreaker
+from utils.history import is_pinned
+from utils.chat_settings import QUALITY_TIERS, get_settings, tiers_at_least
 
 logger = logging.getLogger(__name__)
 
+def audio_bitrate(fmt: Dict[str, Any]) -> float:
+    """Audio bitrate of a format in kbps, 0 if unknown."""
+    return fmt.get('abr') or fmt.get('tbr') or 0
+
+def select_audio_format(ctx: Dict[str, Any], target_bitrate: Optional[int] = None):
+    """
+    yt-dlp format selector picking the cheapest format good enough for the call.
+    
+    The call re-encodes to a lossy voice codec, so anything above the target
+    bitrate (TARGET_AUDIO_BITRATE unless a quality tier sets another one) is
+    wasted bandwidth. Picks the smallest audio-only format at or above the
+    target, or the best audio-only format below it. Formats with video are
+    only used when there is no audio-only one.
+    """
+    target_bitrate = target_bitrate or Config.TARGET_AUDIO_BITRATE
+    formats = ctx.get('formats') or []
+    with_audio = [f for f in formats if f.get('acodec') != 'none']
+    audio_only = [f for f in with_audio if f.get('vcodec') == 'none']
+    
+    if audio_only:
+        good_enough = [f for f in audio_only if audio_bitrate(f) >= target_bitrate]
+        if good_enough:
+            yield min(good_enough, key=audio_bitrate)
+        else:
+            yield max(audio_only, key=audio_bitrate)
+    elif with_audio:
+        # Smallest known total bitrate, formats of unknown size last
+        yield min(with_audio, key=lambda f: (not f.get('tbr'), f.get('tbr') or 0))
+    elif formats:
+        yield formats[-1]
+
 # Configure yt-dlp
 ytdl_format_options = {
-    'format': 'bestaudio/best',
+    'format': select_audio_format,
     'outtmpl': f'{Config.DOWNLOAD_PATH}%(id)s.%(ext)s',
     'restrictfilenames': True,
     'noplaylist': True,
@@ -21,26 +58,146 @@ ytdl_format_options = {
     'no_warnings': True,
     'default_search': 'auto',
     'source_address': '0.0.0.0',
-    'postprocessors': [{
-        'key': 'FFmpegExtractAudio',
-        'preferredcodec': 'mp3',
-        'preferredquality': '192',
-    }]
 }
 
-ytdl = yt_dlp.YoutubeDL(ytdl_format_options)
+# One extractor per quality tier, created on first use
+_ytdl_by_tier: Dict[str, yt_dlp.YoutubeDL] = {}
 
-async def extract_info(url: str, download: bool = False) -> Optional[Dict[str, Any]]:
+def get_ytdl(tier: str) -> yt_dlp.YoutubeDL:
     """
-    Extract information from a YouTube URL.
+    Get the extractor fetching audio at the source bitrate of a quality tier.
+    
+    Args:
+        tier: Quality tier name, unknown tiers get the standard one
+    
+    Returns:
+        YoutubeDL instance shared by every chat on the tier
+    """
+    if tier not in QUALITY_TIERS:
+        tier = "standard"
+    ytdl = _ytdl_by_tier.get(tier)
+    if not ytdl:
+        source_bitrate, _ = QUALITY_TIERS[tier]
+        ytdl = yt_dlp.YoutubeDL(dict(
+            ytdl_format_options,
+            format=partial(select_audio_format, target_bitrate=source_bitrate),
+            # One file per tier, converted to make_song_info's file_path afterwards
+            outtmpl=f'{Config.DOWNLOAD_PATH}%(id)s_{tier}.source.%(ext)s'
+        ))
+        _ytdl_by_tier[tier] = ytdl
+    return ytdl
+
+# Search only lists the results, without resolving each video's formats
+ytdl_search = yt_dlp.YoutubeDL({
+    'extract_flat': 'in_playlist',
+    'quiet': True,
+    'no_warnings': True,
+    'source_address': '0.0.0.0',
+})
+
+# Fails fast while YouTube is erroring or rate-limiting us
+extractor_breaker = CircuitBreaker(
+    "extractor",
+    failure_threshold=Config.EXTRACTOR_FAILURE_THRESHOLD,
+    reset_timeout=Config.EXTRACTOR_RESET_TIMEOUT
+)
+
+# Errors about a single video rather than the extractor as a whole
+VIDEO_ERROR_MARKERS = (
+    "video unavailable",
+    "private video",
+    "not available",
+    "has been removed",
+    "age-restricted",
+    "copyright",
+)
+
+def is_video_error(error: Exception) -> bool:
+    """Check whether an extraction error concerns only the requested video."""
+    if isinstance(error, (IndexError, KeyError)):
+        # Search without results or incomplete metadata
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in VIDEO_ERROR_MARKERS)
+
+class TrackRejected(Exception):
+    """A track that will not be played; the message is shown to the user."""
+
+def check_playable(info: Dict[str, Any], duration_limit: Optional[int] = None) -> Optional[str]:
+    """
+    Preflight check on extracted metadata, before anything is downloaded.
+    
+    Args:
+        info: yt-dlp info dictionary
+        duration_limit: Longest playable track in minutes, DURATION_LIMIT if not given
+    
+    Returns:
+        Reason the track cannot be played, or None if it can
+    """
+    if info.get('is_live') or info.get('live_status') in ('is_live', 'is_upcoming'):
+        return "Live streams are not supported."
+    
+    duration_limit = duration_limit or Config.DURATION_LIMIT
+    duration = info.get('duration') or 0
+    if duration > duration_limit * 60:
+        return (
+            f"**{info.get('title', 'This track')}** is {duration // 60} minutes long, "
+            f"the limit is {duration_limit} minutes."
+        )
+    return None
+
+def get_tier(chat_id: Optional[int]) -> str:
+    """Quality tier files are fetched at for a chat, the standard one if unknown."""
+    tier = get_settings(chat_id)['tier']
+    return tier if tier in QUALITY_TIERS else "standard"
+
+def make_song_info(info: Dict[str, Any], downloaded: bool = False,
+                   tier: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Create the standardized song info from yt-dlp's info dictionary.
+    
+    Args:
+        info: yt-dlp info dictionary
+        downloaded: Whether the file was downloaded, sets the file path
+        tier: Quality tier the audio was fetched at
+    """
+    return {
+        'id': info['id'],
+        'title': info['title'],
+        'uploader': info.get('uploader', 'Unknown'),
+        'duration': info.get('duration', 0),
+        'thumbnail': info.get('thumbnail', None),
+        'webpage_url': info.get('webpage_url', None),
+        'stream_url': info.get('url', None),
+        'http_headers': info.get('http_headers', {}),
+        'tier': tier,
+        'file_path': f"{Config.DOWNLOAD_PATH}{track_key(info['id'], tier)}.mp3" if downloaded else None
+    }
+
+async def fetch_metadata(url: str, chat_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Resolve a URL or search query to yt-dlp's info dictionary, without downloading.
+    
+    The format is chosen for the chat's quality tier and the duration is
+    checked against the chat's limit.
     
     Args:
         url: YouTube URL or search query
-        download: Whether to download the audio or just extract info
+        chat_id: Chat the track is for, None for the default settings
     
     Returns:
-        Dictionary containing song information or None if extraction failed
+        yt-dlp info dictionary of the video or None if extraction failed
+    
+    Raises:
+        TrackRejected: If the video fails the preflight check
     """
+    if not extractor_breaker.allow():
+        logger.warning(f"Extractor circuit is open, not looking up {url}")
+        return None
+    
+    settings = get_settings(chat_id)
+    ytdl = get_ytdl(get_tier(chat_id))
+    
     try:
         # Run yt-dlp in a separate process to avoid blocking
         loop = asyncio.get_event_loop()
@@ -51,7 +208,7 @@ async def extract_info(url: str, download: bool = False) -> Optional[Dict[str, A
         
         # Extract info
         info_extraction = await loop.run_in_executor(
-            None, lambda: ytdl.extract_info(url, download=download)
+            None, lambda: ytdl.extract_info(url, download=False)
         )
         
         # For search queries, get the first result
@@ -59,36 +216,223 @@ async def extract_info(url: str, download: bool = False) -> Optional[Dict[str, A
             info = info_extraction['entries'][0]
         else:
             info = info_extraction
-            
-        # Create a standardized format for song info
-        song_info = {
-            'id': info['id'],
-            'title': info['title'],
-            'uploader': info.get('uploader', 'Unknown'),
-            'duration': info.get('duration', 0),
-            'thumbnail': info.get('thumbnail', None),
-            'webpage_url': info.get('webpage_url', None),
-            'file_path': f"{Config.DOWNLOAD_PATH}{info['id']}.mp3" if download else None
-        }
         
-        return song_info
+        extractor_breaker.record_success()
+    except asyncio.CancelledError:
+        # No verdict on the extractor, a cancelled trial must not keep the circuit shut
+        extractor_breaker.cancel_trial()
+        raise
+    except Exception as e:
+        if is_video_error(e):
+            # The extractor answered, the video itself is the problem
+            extractor_breaker.record_success()
+            logger.warning(f"Could not extract {url}: {e}")
+        else:
+            extractor_breaker.record_failure()
+            logger.error(f"Error extracting info from YouTube: {e}", exc_info=True)
+        return None
+    
+    reason = check_playable(info, settings['duration_limit'])
+    if reason:
+        logger.info(f"Rejected {info.get('id')} before downloading: {reason}")
+        raise TrackRejected(reason)
+    return info
+
+async def search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Search YouTube for several candidates, without extracting any of them.
+    
+    Args:
+        query: Search query
+        limit: Maximum number of results
+    
+    Returns:
+        List of song information dictionaries without stream URLs
+    """
+    if not extractor_breaker.allow():
+        logger.warning(f"Extractor circuit is open, not searching for {query}")
+        return []
+    
+    try:
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(
+            None, lambda: ytdl_search.extract_info(f"ytsearch{limit}:{query}", download=False)
+        )
+        extractor_breaker.record_success()
+    except asyncio.CancelledError:
+        extractor_breaker.cancel_trial()
+        raise
+    except Exception as e:
+        extractor_breaker.record_failure()
+        logger.error(f"Error searching YouTube for {query}: {e}", exc_info=True)
+        return []
+    
+    results = []
+    for entry in result.get('entries') or []:
+        if not entry or not entry.get('id') or entry.get('live_status') == 'is_live':
+            continue
+        thumbnails = entry.get('thumbnails') or [{}]
+        results.append({
+            'id': entry['id'],
+            'title': entry.get('title') or entry['id'],
+            'uploader': entry.get('uploader') or entry.get('channel') or 'Unknown',
+            'duration': int(entry.get('duration') or 0),
+            'thumbnail': thumbnails[-1].get('url'),
+            'webpage_url': f"https://www.youtube.com/watch?v={entry['id']}",
+        })
+    return results
+
+async def extract_info(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract information from a YouTube URL.
+    
+    Args:
+        url: YouTube URL or search query
+    
+    Returns:
+        Dictionary containing song information or None if extraction failed
+    
+    Raises:
+        TrackRejected: If the video fails the preflight check
+    """
+    info = await fetch_metadata(url)
+    return make_song_info(info) if info else None
+
+async def convert_to_mp3(source_path: str, file_path: str, bitrate: int) -> bool:
+    """
+    Convert a downloaded file to MP3, removing the source.
+    
+    Args:
+        source_path: Path of the file as downloaded
+        file_path: Destination of the MP3 file
+        bitrate: MP3 bitrate in kbps
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    temp_path = f"{file_path}.part"
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", source_path,
+            "-vn", "-codec:a", "libmp3lame", "-b:a", f"{bitrate}k",
+            "-f", "mp3", temp_path,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            logger.warning(f"ffmpeg failed to convert {source_path}: {stderr.decode(errors='ignore').strip()}")
+            return False
         
+        os.replace(temp_path, file_path)
+        return True
     except Exception as e:
-        logger.error(f"Error extracting info from YouTube: {e}", exc_info=True)
+        logger.error(f"Error converting {source_path}: {e}", exc_info=True)
+        return False
+    finally:
+        for path in (temp_path, source_path):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                pass
+
+async def download_info(info: Dict[str, Any], chat_id: Optional[int] = None,
+                        priority: int = PRIORITY_USER) -> Optional[Dict[str, Any]]:
+    """
+    Download the format chosen during extraction, without extracting again.
+    
+    The transfer holds a network slot and the MP3 conversion an ffmpeg one,
+    so a slow conversion never keeps another chat's download waiting.
+    
+    Args:
+        info: yt-dlp info dictionary from fetch_metadata
+        chat_id: Chat the track is for, its quality tier sets the conversion bitrate
+        priority: Scheduling priority class of the download
+    
+    Returns:
+        Dictionary containing song information or None if download failed
+    """
+    tier = get_tier(chat_id)
+    ytdl = get_ytdl(tier)
+    try:
+        # Wait for a network slot so downloads cannot saturate the link
+        async with network.slot(priority, chat_id):
+            loop = asyncio.get_event_loop()
+            downloaded = await loop.run_in_executor(
+                None, lambda: ytdl.process_ie_result(info, download=True)
+            )
+        
+        song_info = make_song_info(info, downloaded=True, tier=tier)
+        _, mp3_bitrate = QUALITY_TIERS[tier]
+        async with transcode.slot(priority, chat_id):
+            converted = await convert_to_mp3(ytdl.prepare_filename(downloaded), song_info['file_path'], mp3_bitrate)
+        if not converted:
+            return None
+        
+        # Fetched from the network this time, for the cache hit rates
+        song_info['fetched'] = True
+        return song_info
+    except Exception as e:
+        logger.error(f"Error downloading {info.get('id')}: {e}", exc_info=True)
         return None
 
-async def download_audio(url: str) -> Optional[Dict[str, Any]]:
+def find_local(video_id: str, tier: str) -> Optional[Tuple[str, str]]:
+    """
+    Look up a copy of a video on disk good enough for a tier.
+    
+    The pre-decoded copy is preferred, then a download kept for a replay,
+    the warm cache or a chat still playing it.
+    
+    Returns:
+        Tier and path of the copy, the closest tier first, or None
+    """
+    for candidate in tiers_at_least(tier):
+        key = track_key(video_id, candidate)
+        cached_path = get_cached_path(key)
+        if cached_path:
+            return candidate, cached_path
+        file_path = f"{Config.DOWNLOAD_PATH}{key}.mp3"
+        if os.path.exists(file_path):
+            return candidate, file_path
+    return None
+
+async def download_audio(url: str, priority: int = PRIORITY_USER,
+                         chat_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
     """
     Download audio from a YouTube URL.
     
     Args:
         url: YouTube URL or search query
+        priority: Scheduling priority class of the download
+        chat_id: Chat the download is for, used for fair queuing
     
     Returns:
         Dictionary containing song information or None if download failed
+    
+    Raises:
+        TrackRejected: If the video fails the preflight check
     """
     try:
-        return await extract_info(url, download=True)
+        # Resolve the metadata first: rejected tracks are never downloaded
+        info = await fetch_metadata(url, chat_id)
+        if not info:
+            return None
+        
+        # A copy at the chat's tier or a better one can be played without downloading
+        local = find_local(info['id'], get_tier(chat_id))
+        if local:
+            tier, file_path = local
+            logger.info(f"Using {tier} audio of {info['id']} from {file_path}")
+            song_info = make_song_info(info, tier=tier)
+            song_info['file_path'] = file_path
+            return song_info
+        
+        return await download_info(info, chat_id, priority)
+    except TrackRejected:
+        raise
     except Exception as e:
         logger.error(f"Error downloading from YouTube: {e}", exc_info=True)
         return None
@@ -104,6 +448,18 @@ def cleanup_file(file_path: str) -> bool:
         True if successful, False otherwise
     """
     try:
+        # Only files we downloaded ourselves, never the local library
+        if not os.path.abspath(file_path).startswith(os.path.abspath(Config.DOWNLOAD_PATH)):
+            return False
+        
+        # Pre-decoded files are kept for replays and evicted by the cache itself
+        if Config.AUDIO_CACHE and is_raw_file(file_path):
+            return False
+        
+        # Still in a chat's history for "Previous"
+        if is_pinned(file_path):
+            return False
+
         if os.path.exists(file_path):
             os.remove(file_path)
             return True